@@ -1,16 +1,57 @@
-from flask import Flask, request, jsonify
+from functools import partial
+import inspect
+
+from flask import Flask, Response, g, request, jsonify
 import requests
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import grpc
 from flask_jwt_extended import JWTManager, get_jwt_identity
 
 from config import Config
-from utils.validators import CreatePostSchema, UpdatePostSchema, ListPostsSchema
+from utils.validators import (
+    validate_create_post,
+    validate_list_posts,
+    update_post_schema,
+    batch_get_posts_schema,
+    stream_posts_schema,
+    record_views_schema,
+)
 from utils.utils import (
-    proto_timestamp_to_datetime,
     token_required,
+    get_client_key,
     get_post_service_stub,
     proto_post_to_dict,
+    proto_comment_to_dict,
+    comments_page_to_dict,
+    post_details_to_dict,
+    list_posts_to_dict,
+    COUNT_MODES,
+    batch_result_to_dict,
+    view_result_to_dict,
+    split_ids_arg,
+    posts_to_ndjson,
+    post_etag,
+    comments_etag,
+    etag_matches,
+    proto_timestamp_to_datetime,
+)
+from utils.channels import init_channel_pool
+from utils.http_client import create_user_service_session, forwarded_headers
+from utils.admission import (
+    USER_SERVICE,
+    backend_for_path,
+    create_admission_controller,
 )
+from utils.compression import create_response_compressor, weak_etag
+from utils.cache import create_post_cache, create_token_cache
+from utils.metrics import (
+    UNMATCHED_HANDLER,
+    GatewayMetrics,
+    MetricsInterceptor,
+)
+from utils.hedging import hedging_stats
+from utils.fanout import create_fanout_executor, fan_out
+from utils.single_flight import SingleFlight, get_post_coalesced
 
 import post_service_pb2
 
@@ -19,6 +60,120 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     jwt = JWTManager(app)
+    metrics = app.extensions["metrics"] = GatewayMetrics()
+    channel_pool = init_channel_pool(
+        app.config, interceptors=[MetricsInterceptor(metrics)]
+    )
+    app.extensions["post_service_policy"] = channel_pool.policy
+    app.extensions["post_service_balancer"] = channel_pool.balancer
+    app.extensions["post_service_hedging"] = channel_pool.hedging
+    app.extensions["user_service_session"] = create_user_service_session(app.config)
+    app.extensions["post_cache"] = create_post_cache(app.config)
+    app.extensions["jwt_token_cache"] = create_token_cache(app.config)
+    app.extensions["admission"] = create_admission_controller(app.config)
+    app.extensions["response_compressor"] = create_response_compressor(app.config)
+    app.extensions["post_service_fanout"] = create_fanout_executor(app.config)
+    post_cache = app.extensions["post_cache"]
+    post_reads = SingleFlight()
+    metrics.register_stats(
+        post_cache=lambda: app.extensions["post_cache"],
+        token_cache=lambda: app.extensions["jwt_token_cache"],
+        admission=lambda: app.extensions["admission"],
+        post_service_policy=lambda: app.extensions["post_service_policy"],
+        post_service_balancer=lambda: app.extensions["post_service_balancer"],
+        post_service_hedging=lambda: app.extensions["post_service_hedging"],
+    )
+
+    # Регистрируется первым, чтобы учитывать и запросы, отклоненные при допуске
+    @app.before_request
+    def start_request_timer():
+        g.request_started = metrics.request_started()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+
+        finish = partial(
+            metrics.request_finished,
+            request.endpoint or UNMATCHED_HANDLER,
+            request.method,
+            response.status_code,
+            started,
+        )
+        if inspect.isgenerator(response.response):
+            # Тело из генератора отдается после after_request: запрос
+            # считается завершенным по закрытии ответа, как в ASGI-режиме
+            response.call_on_close(finish)
+        else:
+            finish()
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exc):
+        # after_request не вызывается, если исключение ушло из приложения
+        started = g.pop("request_started", None)
+        if started is not None:
+            metrics.request_finished(
+                request.endpoint or UNMATCHED_HANDLER, request.method, 500, started
+            )
+
+    @app.before_request
+    def admit_request():
+        backend = backend_for_path(request.path)
+        if backend is None:
+            return None
+
+        admission = app.extensions["admission"]
+        rejection = admission.admit(get_client_key(), backend)
+        if rejection is not None:
+            response = jsonify({"message": rejection.message})
+            return response, rejection.status_code, rejection.headers()
+        g.admitted_backend = backend
+        return None
+
+    @app.teardown_request
+    def release_admission(exc):
+        backend = g.pop("admitted_backend", None)
+        if backend is not None:
+            app.extensions["admission"].release(backend)
+
+    @app.after_request
+    def compress_response(response):
+        compressor = app.extensions["response_compressor"]
+        if (
+            response.is_streamed
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or not compressor.is_compressible(request.endpoint, response.content_type)
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        encoding = compressor.choose_encoding(
+            request.endpoint,
+            request.headers.get("Accept-Encoding"),
+            response.content_type,
+            len(body),
+        )
+        if encoding is None:
+            return response
+
+        response.set_data(compressor.compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        if "ETag" in response.headers:
+            response.headers["ETag"] = weak_etag(response.headers["ETag"])
+        return response
+
+    def conditional_json(etag, make_data):
+        # Тело собирается и сериализуется, только если у клиента устаревшая версия
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return Response(status=304, headers={"ETag": etag})
+        response = jsonify(make_data())
+        response.headers["ETag"] = etag
+        return response, 200
 
     @app.route("/api/users/register", methods=["POST"])
     def register():
@@ -38,17 +193,42 @@ def create_app(config_class=Config):
 
     def proxy_request(method, path):
         url = f"{app.config['USER_SERVICE_URL']}{path}"
+        session = app.extensions["user_service_session"]
+        timeout = (
+            app.config["USER_SERVICE_CONNECT_TIMEOUT"],
+            app.config["USER_SERVICE_READ_TIMEOUT"],
+        )
 
-        headers = {key: value for key, value in request.headers if key != "Host"}
+        headers = forwarded_headers(request.headers)
+        operation = f"{method} {path}"
 
-        if method == "GET":
-            response = requests.get(url, headers=headers)
-        elif method == "POST":
-            response = requests.post(url, json=request.get_json(), headers=headers)
-        elif method == "PUT":
-            response = requests.put(url, json=request.get_json(), headers=headers)
-
-        return jsonify(response.json()), response.status_code
+        started = metrics.upstream_started(USER_SERVICE)
+        try:
+            if method == "GET":
+                response = session.get(url, headers=headers, timeout=timeout)
+            elif method == "POST":
+                response = session.post(
+                    url, data=request.get_data(), headers=headers, timeout=timeout
+                )
+            elif method == "PUT":
+                response = session.put(
+                    url, data=request.get_data(), headers=headers, timeout=timeout
+                )
+        except requests.Timeout:
+            metrics.upstream_finished(USER_SERVICE, operation, "timeout", started)
+            return jsonify({"message": "User service timed out"}), 504
+        except requests.RequestException as e:
+            metrics.upstream_finished(USER_SERVICE, operation, "error", started)
+            return jsonify({"message": f"User service unavailable: {str(e)}"}), 502
+        metrics.upstream_finished(
+            USER_SERVICE, operation, response.status_code, started
+        )
+
+        return Response(
+            response.content,
+            status=response.status_code,
+            content_type=response.headers.get("Content-Type", "application/json"),
+        )
 
     @app.route("/api/posts", methods=["POST"])
     @token_required
@@ -57,7 +237,7 @@ def create_app(config_class=Config):
             user_id = get_jwt_identity()
 
             data = request.get_json()
-            errors = CreatePostSchema().validate(data)
+            errors = validate_create_post(data)
             if errors:
                 return jsonify({"message": "Validation error", "errors": errors}), 400
 
@@ -72,6 +252,7 @@ def create_app(config_class=Config):
             )
 
             response = stub.CreatePost(grpc_request)
+            post_cache.invalidate_lists()
             post_data = proto_post_to_dict(response)
 
             return jsonify(post_data), 201
@@ -89,17 +270,36 @@ def create_app(config_class=Config):
     def get_post(post_id):
         try:
             user_id = get_jwt_identity()
+
+            post_data = post_cache.get_post(post_id, user_id)
+            if post_data is not None:
+                etag = post_etag(post_id, post_data.get("updated_at"))
+                return conditional_json(etag, lambda: post_data)
+
             stub = get_post_service_stub()
 
-            grpc_request = post_service_pb2.GetPostRequest(
-                post_id=post_id, requester_id=user_id
-            )
+            if request.headers.get("If-None-Match"):
+                # Дешевая проверка версии без загрузки текста и тегов поста
+                version = stub.GetPostVersion(
+                    post_service_pb2.GetPostRequest(
+                        post_id=post_id, requester_id=user_id
+                    )
+                )
+                etag = post_etag(
+                    post_id, proto_timestamp_to_datetime(version.updated_at)
+                )
+                if etag_matches(request.headers.get("If-None-Match"), etag):
+                    return Response(status=304, headers={"ETag": etag})
 
-            response = stub.GetPost(grpc_request)
+            response = get_post_coalesced(post_reads, stub, post_id, user_id)
 
             post_data = proto_post_to_dict(response)
+            post_cache.set_post(
+                post_id, post_data, response.is_private, response.creator_id
+            )
 
-            return jsonify(post_data), 200
+            etag = post_etag(post_id, post_data.get("updated_at"))
+            return conditional_json(etag, lambda: post_data)
         except grpc.RpcError as e:
             status_code = e.code().value[0]
             if e.code() == grpc.StatusCode.NOT_FOUND:
@@ -113,6 +313,120 @@ def create_app(config_class=Config):
         except Exception as e:
             return jsonify({"message": f"Error: {str(e)}"}), 500
 
+    @app.route("/api/posts/<int:post_id>/full", methods=["GET"])
+    @token_required
+    def get_post_full(post_id):
+        try:
+            user_id = get_jwt_identity()
+            per_page = request.args.get("per_page", 10, type=int)
+
+            if per_page < 1 or per_page > 100:
+                return jsonify({"message": "per_page must be between 1 and 100"}), 400
+
+            stub = get_post_service_stub()
+
+            def load_post():
+                post_data = post_cache.get_post(post_id, user_id)
+                if post_data is None:
+                    response = get_post_coalesced(post_reads, stub, post_id, user_id)
+                    post_data = proto_post_to_dict(response)
+                    post_cache.set_post(
+                        post_id, post_data, response.is_private, response.creator_id
+                    )
+                return post_data
+
+            # Задержка страницы - самый медленный из вызовов, а не их сумма
+            post_data, comments, counts = fan_out(
+                app.extensions["post_service_fanout"],
+                load_post,
+                lambda: stub.GetComments(
+                    post_service_pb2.GetCommentsRequest(
+                        post_id=post_id,
+                        page=1,
+                        per_page=per_page,
+                        requester_id=user_id,
+                        count_mode=post_service_pb2.COUNT_NONE,
+                    )
+                ),
+                lambda: stub.GetPostCounts(
+                    post_service_pb2.GetPostRequest(
+                        post_id=post_id, requester_id=user_id
+                    )
+                ),
+            )
+
+            return (
+                jsonify(post_details_to_dict(post_data, comments, counts, per_page)),
+                200,
+            )
+        except grpc.RpcError as e:
+            status_code = e.code().value[0]
+            if e.code() == grpc.StatusCode.NOT_FOUND:
+                return jsonify({"message": "Post not found"}), 404
+            elif e.code() == grpc.StatusCode.PERMISSION_DENIED:
+                return jsonify({"message": "Access denied to private post"}), 403
+            return (
+                jsonify({"message": f"Error getting post: {e.details()}"}),
+                status_code,
+            )
+        except Exception as e:
+            return jsonify({"message": f"Error: {str(e)}"}), 500
+
+    @app.route("/api/posts/batch", methods=["GET"])
+    @token_required
+    def batch_get_posts():
+        try:
+            user_id = get_jwt_identity()
+
+            args = {"ids": split_ids_arg(request.args.getlist("ids"))}
+            errors = batch_get_posts_schema.validate(args)
+            if errors:
+                return jsonify({"message": "Validation error", "errors": errors}), 400
+
+            post_ids = list(dict.fromkeys(int(post_id) for post_id in args["ids"]))
+
+            results = {}
+            missing = []
+            for post_id in post_ids:
+                post_data = post_cache.get_post(post_id, user_id)
+                if post_data is None:
+                    missing.append(post_id)
+                else:
+                    results[post_id] = {
+                        "id": post_id,
+                        "status": "ok",
+                        "post": post_data,
+                    }
+
+            if missing:
+                stub = get_post_service_stub()
+
+                grpc_request = post_service_pb2.BatchGetPostsRequest(
+                    post_ids=missing, requester_id=user_id
+                )
+
+                response = stub.BatchGetPosts(grpc_request)
+
+                for result in response.results:
+                    results[result.post_id] = batch_result_to_dict(result)
+                    if result.HasField("post"):
+                        post_cache.set_post(
+                            result.post_id,
+                            results[result.post_id]["post"],
+                            result.post.is_private,
+                            result.post.creator_id,
+                        )
+
+            return jsonify({"posts": [results[post_id] for post_id in post_ids]}), 200
+        except grpc.RpcError as e:
+            status_code = e.code().value[0]
+            return (
+                jsonify({"message": f"Error getting posts: {e.details()}"}),
+                status_code,
+            )
+        except Exception as e:
+            return jsonify({"message": f"Error: {str(e)}"}), 500
+
     @app.route("/api/posts", methods=["GET"])
     @token_required
     def list_posts():
@@ -129,11 +443,21 @@ def create_app(config_class=Config):
 
             if "tags" in request.args:
                 args["tags"] = request.args.getlist("tags")
+            if "cursor" in request.args:
+                args["cursor"] = request.args["cursor"]
+            if "count" in request.args:
+                args["count"] = request.args["count"]
 
-            errors = ListPostsSchema().validate(args)
+            errors = validate_list_posts(args)
             if errors:
                 return jsonify({"message": "Validation error", "errors": errors}), 400
 
+            result = post_cache.get_list(args, user_id)
+            if result is not None:
+                return jsonify(result), 200
+
+            count = args.get("count", app.config["POST_SERVICE_COUNT_MODE"])
+
             stub = get_post_service_stub()
 
             grpc_request = post_service_pb2.ListPostsRequest(
@@ -142,21 +466,20 @@ def create_app(config_class=Config):
                 requester_id=user_id,
                 only_own=args.get("only_own", False),
                 tags=args.get("tags", []),
+                cursor=args.get("cursor", ""),
+                count_mode=COUNT_MODES[count],
             )
 
             response = stub.ListPosts(grpc_request)
 
-            result = {
-                "posts": [proto_post_to_dict(post) for post in response.posts],
-                "total_count": response.total_count,
-                "total_pages": response.total_pages,
-                "page": args.get("page", 1),
-                "per_page": args.get("per_page", 10),
-            }
+            result = list_posts_to_dict(response, args, counted=count != "none")
+            post_cache.set_list(args, user_id, result)
 
             return jsonify(result), 200
         except grpc.RpcError as e:
             status_code = e.code().value[0]
+            if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+                return jsonify({"message": "Invalid cursor"}), 400
             return (
                 jsonify({"message": f"Error listing posts: {e.details()}"}),
                 status_code,
@@ -164,6 +487,60 @@ def create_app(config_class=Config):
         except Exception as e:
             return jsonify({"message": f"Error: {str(e)}"}), 500
 
+    @app.route("/api/posts/stream", methods=["GET"])
+    @token_required
+    def stream_posts():
+        try:
+            user_id = get_jwt_identity()
+
+            args = {}
+            if "only_own" in request.args:
+                args["only_own"] = request.args.get("only_own", "").lower() == "true"
+            if "limit" in request.args:
+                args["limit"] = int(request.args.get("limit", 0))
+            if "tags" in request.args:
+                args["tags"] = request.args.getlist("tags")
+
+            errors = stream_posts_schema.validate(args)
+            if errors:
+                return jsonify({"message": "Validation error", "errors": errors}), 400
+
+            stub = get_post_service_stub()
+
+            grpc_request = post_service_pb2.StreamPostsRequest(
+                requester_id=user_id,
+                only_own=args.get("only_own", False),
+                tags=args.get("tags", []),
+                limit=args.get("limit", 0),
+            )
+
+            posts = stub.StreamPosts(
+                grpc_request, timeout=app.config["POST_SERVICE_STREAM_DEADLINE"]
+            )
+            # Ошибку до первого поста еще можно вернуть обычным статусом
+            first = next(posts, None)
+
+            response = Response(
+                posts_to_ndjson(first, posts, app.json.dumps),
+                mimetype="application/x-ndjson",
+            )
+            # teardown_request срабатывает до отдачи тела, а поток занимает
+            # воркер Post Service до конца: слот освобождается по закрытии ответа
+            backend = g.pop("admitted_backend", None)
+            if backend is not None:
+                response.call_on_close(
+                    lambda: app.extensions["admission"].release(backend)
+                )
+            return response
+        except grpc.RpcError as e:
+            status_code = e.code().value[0]
+            return (
+                jsonify({"message": f"Error streaming posts: {e.details()}"}),
+                status_code,
+            )
+        except Exception as e:
+            return jsonify({"message": f"Error: {str(e)}"}), 500
+
     @app.route("/api/posts/<int:post_id>", methods=["PUT"])
     @token_required
     def update_post(post_id):
@@ -171,7 +548,7 @@ def create_app(config_class=Config):
             user_id = get_jwt_identity()
 
             data = request.get_json()
-            errors = UpdatePostSchema().validate(data)
+            errors = update_post_schema.validate(data)
             if errors:
                 return jsonify({"message": "Validation error", "errors": errors}), 400
 
@@ -190,7 +567,10 @@ def create_app(config_class=Config):
             if "tags" in data:
                 grpc_request.tags.extend(data["tags"])
 
-            response = stub.UpdatePost(grpc_request)
+            try:
+                response = stub.UpdatePost(grpc_request)
+            finally:
+                post_cache.invalidate_post(post_id)
 
             post_data = proto_post_to_dict(response)
 
@@ -223,7 +603,10 @@ def create_app(config_class=Config):
                 post_id=post_id, requester_id=user_id
             )
 
-            stub.DeletePost(grpc_request)
+            try:
+                stub.DeletePost(grpc_request)
+            finally:
+                post_cache.invalidate_post(post_id)
 
             return jsonify({"message": "Post deleted successfully"}), 200
         except grpc.RpcError as e:
@@ -272,6 +655,38 @@ def create_app(config_class=Config):
         except Exception as e:
             return jsonify({"message": f"Error: {str(e)}"}), 500
 
+    @app.route("/api/posts/views", methods=["POST"])
+    @token_required
+    def record_views():
+        try:
+            user_id = get_jwt_identity()
+
+            data = request.get_json()
+            errors = record_views_schema.validate(data)
+            if errors:
+                return jsonify({"message": "Validation error", "errors": errors}), 400
+
+            stub = get_post_service_stub()
+
+            grpc_request = post_service_pb2.RecordViewsRequest(
+                post_ids=data["post_ids"], viewer_id=user_id
+            )
+
+            response = stub.RecordViews(grpc_request)
+
+            return (
+                jsonify({"views": [view_result_to_dict(r) for r in response.results]}),
+                200,
+            )
+        except grpc.RpcError as e:
+            status_code = e.code().value[0]
+            return (
+                jsonify({"message": f"Error recording views: {e.details()}"}),
+                status_code,
+            )
+        except Exception as e:
+            return jsonify({"message": f"Error: {str(e)}"}), 500
+
     @app.route("/api/posts/<int:post_id>/like", methods=["POST"])
     @token_required
     def like_post(post_id):
@@ -320,20 +735,7 @@ def create_app(config_class=Config):
 
             response = stub.AddComment(grpc_request)
 
-            created_at = proto_timestamp_to_datetime(response.created_at)
-
-            return (
-                jsonify(
-                    {
-                        "id": response.id,
-                        "post_id": response.post_id,
-                        "user_id": response.user_id,
-                        "text": response.text,
-                        "created_at": created_at,
-                    }
-                ),
-                201,
-            )
+            return jsonify(proto_comment_to_dict(response)), 201
         except grpc.RpcError as e:
             status_code = e.code().value[0]
             if e.code() == grpc.StatusCode.NOT_FOUND:
@@ -349,45 +751,40 @@ def create_app(config_class=Config):
     @token_required
     def get_comments(post_id):
         try:
+            user_id = get_jwt_identity()
             page = request.args.get("page", 1, type=int)
             per_page = request.args.get("per_page", 10, type=int)
+            count = request.args.get("count", app.config["POST_SERVICE_COUNT_MODE"])
 
             if page < 1:
                 return jsonify({"message": "Page must be a positive integer"}), 400
             if per_page < 1 or per_page > 100:
                 return jsonify({"message": "per_page must be between 1 and 100"}), 400
+            if count not in COUNT_MODES:
+                return (
+                    jsonify(
+                        {"message": f"count must be one of: {', '.join(COUNT_MODES)}"}
+                    ),
+                    400,
+                )
 
             stub = get_post_service_stub()
 
             grpc_request = post_service_pb2.GetCommentsRequest(
-                post_id=post_id, page=page, per_page=per_page
+                post_id=post_id,
+                page=page,
+                per_page=per_page,
+                requester_id=user_id,
+                count_mode=COUNT_MODES[count],
             )
 
             response = stub.GetComments(grpc_request)
 
-            comments = []
-            for comment in response.comments:
-                comments.append(
-                    {
-                        "id": comment.id,
-                        "post_id": comment.post_id,
-                        "user_id": comment.user_id,
-                        "text": comment.text,
-                        "created_at": proto_timestamp_to_datetime(comment.created_at),
-                    }
-                )
-
-            return (
-                jsonify(
-                    {
-                        "comments": comments,
-                        "total_count": response.total_count,
-                        "total_pages": response.total_pages,
-                        "page": page,
-                        "per_page": per_page,
-                    }
+            return conditional_json(
+                comments_etag(post_id, page, per_page, response),
+                lambda: comments_page_to_dict(
+                    response, page, per_page, counted=count != "none"
                 ),
-                200,
             )
         except grpc.RpcError as e:
             status_code = e.code().value[0]
@@ -402,11 +799,39 @@ def create_app(config_class=Config):
 
     @app.route("/health", methods=["GET"])
     def health_check():
-        return jsonify({"status": "healthy", "message": "API Gateway is up"}), 200
+        return (
+            jsonify(
+                {
+                    "status": "healthy",
+                    "message": "API Gateway is up",
+                    "admission": app.extensions["admission"].stats(),
+                    "post_service": {
+                        **app.extensions["post_service_policy"].stats(),
+                        **app.extensions["post_service_balancer"].stats(),
+                        "hedging": hedging_stats(
+                            app.extensions["post_service_hedging"]
+                        ),
+                    },
+                }
+            ),
+            200,
+        )
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        return Response(
+            generate_latest(metrics.registry), content_type=CONTENT_TYPE_LATEST
+        )
 
     return app
 
 
 if __name__ == "__main__":
-    app = create_app()
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    if Config.GATEWAY_SERVER_MODE == "asgi":
+        import uvicorn
+        from asgi import create_asgi_app
+
+        uvicorn.run(create_asgi_app(), host="0.0.0.0", port=5000)
+    else:
+        app = create_app()
+        app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,994 @@
+import contextlib
+import json
+from functools import wraps
+
+import grpc
+import httpx
+import jwt
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from config import Config
+from utils.channels import AsyncChannelPool, build_channel_pool
+from utils.http_client import forwarded_headers
+from utils.admission import (
+    USER_SERVICE,
+    AsyncBackendLimiter,
+    backend_for_path,
+    create_admission_controller,
+)
+from utils.resilience import create_rpc_policy
+from utils.balancing import create_load_balancer
+from utils.hedging import create_hedging_policy, hedging_stats
+from utils.fanout import async_fan_out
+from utils.compression import create_response_compressor, weak_etag
+from utils.cache import create_post_cache, create_token_cache
+from utils.metrics import (
+    UNMATCHED_HANDLER,
+    AsyncMetricsInterceptor,
+    GatewayMetrics,
+)
+from utils.single_flight import AsyncSingleFlight, get_post_coalesced_async
+from utils.validators import (
+    validate_create_post,
+    validate_list_posts,
+    update_post_schema,
+    batch_get_posts_schema,
+    stream_posts_schema,
+    record_views_schema,
+)
+from utils.utils import (
+    proto_post_to_dict,
+    proto_comment_to_dict,
+    comments_page_to_dict,
+    post_details_to_dict,
+    list_posts_to_dict,
+    COUNT_MODES,
+    batch_result_to_dict,
+    view_result_to_dict,
+    split_ids_arg,
+    post_etag,
+    comments_etag,
+    etag_matches,
+    proto_timestamp_to_datetime,
+)
+
+import post_service_pb2
+
+
+class GatewayConfig(dict):
+    @classmethod
+    def from_object(cls, config_class):
+        return cls(
+            (key, getattr(config_class, key))
+            for key in dir(config_class)
+            if key.isupper()
+        )
+
+
+def create_user_service_client(config):
+    """Асинхронный HTTP-клиент с keep-alive пулом соединений к User Service"""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=config["USER_SERVICE_POOL_MAXSIZE"],
+            max_keepalive_connections=config["USER_SERVICE_POOL_MAXSIZE"],
+        ),
+        timeout=httpx.Timeout(
+            config["USER_SERVICE_READ_TIMEOUT"],
+            connect=config["USER_SERVICE_CONNECT_TIMEOUT"],
+        ),
+    )
+
+
+def get_identity(request):
+    """Проверяет access-токен так же, как verify_jwt_in_request в Flask-режиме"""
+    config = request.app.state.config
+
+    token_cache = request.app.state.token_cache
+
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        raise jwt.InvalidTokenError("Missing Authorization Header")
+    token = auth_header[len("Bearer ") :]
+
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached[1]["sub"]
+
+    claims = jwt.decode(
+        token,
+        config["JWT_SECRET_KEY"],
+        algorithms=[config.get("JWT_ALGORITHM", "HS256")],
+        options={"verify_sub": config["JWT_VERIFY_SUB"]},
+    )
+    if claims.get("type", "access") != "access":
+        raise jwt.InvalidTokenError("Only non-refresh tokens are allowed")
+
+    token_cache.set(token, {}, claims)
+    return claims["sub"]
+
+
+def token_required(f):
+    @wraps(f)
+    async def decorated(request):
+        try:
+            # Токен мог быть уже проверен в AdmissionMiddleware
+            if getattr(request.state, "user_id", None) is None:
+                request.state.user_id = get_identity(request)
+        except Exception as e:
+            return JSONResponse(
+                {"message": "Authentication required", "error": str(e)}, 401
+            )
+        return await f(request)
+
+    return decorated
+
+
+def get_client_key(request):
+    """Ключ пользовательского rate limit: проверенный пользователь или адрес клиента"""
+    if request.headers.get("Authorization", "").startswith("Bearer "):
+        try:
+            request.state.user_id = get_identity(request)
+            return f"user:{request.state.user_id}"
+        except Exception:
+            pass
+    return f"ip:{request.client.host if request.client else None}"
+
+
+class MetricsMiddleware:
+    """Метрики запросов (utils.metrics), как before_request и after_request
+    в Flask-режиме. Стоит первым, чтобы учитывать и отклоненные при допуске
+    запросы; для потоковых ответов время считается до конца отдачи тела
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = scope["app"].state.metrics
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = metrics.request_started()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            handler = getattr(scope.get("endpoint"), "__name__", UNMATCHED_HANDLER)
+            metrics.request_finished(handler, scope["method"], status_code, started)
+
+
+class AdmissionMiddleware:
+    """Допуск запросов (utils.admission) до маршрутизации, как before_request
+    в Flask-режиме"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        backend = backend_for_path(scope["path"]) if scope["type"] == "http" else None
+        if backend is None:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        admission = request.app.state.admission
+        rejection = await admission.admit_async(get_client_key(request), backend)
+        if rejection is not None:
+            response = JSONResponse(
+                {"message": rejection.message},
+                rejection.status_code,
+                headers=rejection.headers(),
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release(backend)
+
+
+def conditional_json(request, etag, make_data):
+    # Тело собирается и сериализуется, только если у клиента устаревшая версия
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(make_data(), 200, headers={"ETag": etag})
+
+
+class CompressionMiddleware:
+    """Сжатие ответов по той же политике, что after_request в Flask-режиме.
+
+    Потоковые ответы (несколько сообщений http.response.body) не сжимаются
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        compressor = scope["app"].state.response_compressor
+        accept_encoding = Headers(scope=scope).get("Accept-Encoding")
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            endpoint = getattr(scope.get("endpoint"), "__name__", None)
+            if (
+                message.get("more_body", False)
+                or "Content-Encoding" in headers
+                or not compressor.is_compressible(endpoint, headers.get("Content-Type"))
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            encoding = compressor.choose_encoding(
+                endpoint, accept_encoding, headers.get("Content-Type"), len(body)
+            )
+            if encoding is not None:
+                body = compressor.compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                if "ETag" in headers:
+                    headers["ETag"] = weak_etag(headers["ETag"])
+
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def get_post_service_stub(request):
+    return request.app.state.channel_pool.get_stub()
+
+
+def query_int(request, name, default):
+    try:
+        return int(request.query_params.get(name, default))
+    except ValueError:
+        return default
+
+
+async def get_json(request):
+    body = await request.body()
+    if not body:
+        return None
+    return await request.json()
+
+
+async def proxy_request(request, method, path):
+    config = request.app.state.config
+    client = request.app.state.user_service_client
+    url = f"{config['USER_SERVICE_URL']}{path}"
+
+    # ASGI-сервер отдает имена заголовков в нижнем регистре
+    headers = forwarded_headers(
+        (key.title(), value) for key, value in request.headers.items()
+    )
+    metrics = request.app.state.metrics
+    operation = f"{method} {path}"
+
+    started = metrics.upstream_started(USER_SERVICE)
+    try:
+        if method == "GET":
+            for attempt in range(config["USER_SERVICE_GET_RETRIES"] + 1):
+                try:
+                    response = await client.get(url, headers=headers)
+                    break
+                except httpx.TransportError:
+                    if attempt == config["USER_SERVICE_GET_RETRIES"]:
+                        raise
+        elif method == "POST":
+            response = await client.post(
+                url, content=await request.body(), headers=headers
+            )
+        elif method == "PUT":
+            response = await client.put(
+                url, content=await request.body(), headers=headers
+            )
+    except httpx.TimeoutException:
+        metrics.upstream_finished(USER_SERVICE, operation, "timeout", started)
+        return JSONResponse({"message": "User service timed out"}, 504)
+    except httpx.HTTPError as e:
+        metrics.upstream_finished(USER_SERVICE, operation, "error", started)
+        return JSONResponse({"message": f"User service unavailable: {str(e)}"}, 502)
+    metrics.upstream_finished(USER_SERVICE, operation, response.status_code, started)
+
+    return Response(
+        response.content,
+        status_code=response.status_code,
+        media_type=response.headers.get("Content-Type", "application/json"),
+    )
+
+
+async def register(request):
+    return await proxy_request(request, "POST", "/api/users/register")
+
+
+async def login(request):
+    return await proxy_request(request, "POST", "/api/users/login")
+
+
+async def get_profile(request):
+    return await proxy_request(request, "GET", "/api/users/profile")
+
+
+async def update_profile(request):
+    return await proxy_request(request, "PUT", "/api/users/profile")
+
+
+@token_required
+async def create_post(request):
+    try:
+        user_id = request.state.user_id
+
+        data = await get_json(request)
+        errors = validate_create_post(data)
+        if errors:
+            return JSONResponse({"message": "Validation error", "errors": errors}, 400)
+
+        stub = get_post_service_stub(request)
+
+        grpc_request = post_service_pb2.CreatePostRequest(
+            title=data["title"],
+            description=data["description"],
+            creator_id=user_id,
+            is_private=data.get("is_private", False),
+            tags=data.get("tags", []),
+        )
+
+        response = await stub.CreatePost(grpc_request)
+        request.app.state.post_cache.invalidate_lists()
+
+        return JSONResponse(proto_post_to_dict(response), 201)
+    except grpc.RpcError as e:
+        return JSONResponse(
+            {"message": f"Error creating post: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+@token_required
+async def get_post(request):
+    try:
+        user_id = request.state.user_id
+        post_id = request.path_params["post_id"]
+        post_cache = request.app.state.post_cache
+
+        post_data = post_cache.get_post(post_id, user_id)
+        if post_data is not None:
+            etag = post_etag(post_id, post_data.get("updated_at"))
+            return conditional_json(request, etag, lambda: post_data)
+
+        stub = get_post_service_stub(request)
+
+        if request.headers.get("If-None-Match"):
+            # Дешевая проверка версии без загрузки текста и тегов поста
+            version = await stub.GetPostVersion(
+                post_service_pb2.GetPostRequest(post_id=post_id, requester_id=user_id)
+            )
+            etag = post_etag(post_id, proto_timestamp_to_datetime(version.updated_at))
+            if etag_matches(request.headers.get("If-None-Match"), etag):
+                return Response(status_code=304, headers={"ETag": etag})
+
+        response = await get_post_coalesced_async(
+            request.app.state.post_reads, stub, post_id, user_id
+        )
+
+        post_data = proto_post_to_dict(response)
+        post_cache.set_post(
+            post_id, post_data, response.is_private, response.creator_id
+        )
+
+        etag = post_etag(post_id, post_data.get("updated_at"))
+        return conditional_json(request, etag, lambda: post_data)
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return JSONResponse({"message": "Post not found"}, 404)
+        elif e.code() == grpc.StatusCode.PERMISSION_DENIED:
+            return JSONResponse({"message": "Access denied to private post"}, 403)
+        return JSONResponse(
+            {"message": f"Error getting post: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+@token_required
+async def get_post_full(request):
+    try:
+        user_id = request.state.user_id
+        post_id = request.path_params["post_id"]
+        per_page = query_int(request, "per_page", 10)
+        post_cache = request.app.state.post_cache
+
+        if per_page < 1 or per_page > 100:
+            return JSONResponse({"message": "per_page must be between 1 and 100"}, 400)
+
+        stub = get_post_service_stub(request)
+
+        async def load_post():
+            post_data = post_cache.get_post(post_id, user_id)
+            if post_data is None:
+                response = await get_post_coalesced_async(
+                    request.app.state.post_reads, stub, post_id, user_id
+                )
+                post_data = proto_post_to_dict(response)
+                post_cache.set_post(
+                    post_id, post_data, response.is_private, response.creator_id
+                )
+            return post_data
+
+        # Задержка страницы - самый медленный из вызовов, а не их сумма
+        post_data, comments, counts = await async_fan_out(
+            load_post(),
+            stub.GetComments(
+                post_service_pb2.GetCommentsRequest(
+                    post_id=post_id,
+                    page=1,
+                    per_page=per_page,
+                    requester_id=user_id,
+                    count_mode=post_service_pb2.COUNT_NONE,
+                )
+            ),
+            stub.GetPostCounts(
+                post_service_pb2.GetPostRequest(post_id=post_id, requester_id=user_id)
+            ),
+        )
+
+        return JSONResponse(post_details_to_dict(post_data, comments, counts, per_page))
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return JSONResponse({"message": "Post not found"}, 404)
+        elif e.code() == grpc.StatusCode.PERMISSION_DENIED:
+            return JSONResponse({"message": "Access denied to private post"}, 403)
+        return JSONResponse(
+            {"message": f"Error getting post: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+@token_required
+async def batch_get_posts(request):
+    try:
+        user_id = request.state.user_id
+        post_cache = request.app.state.post_cache
+
+        args = {"ids": split_ids_arg(request.query_params.getlist("ids"))}
+        errors = batch_get_posts_schema.validate(args)
+        if errors:
+            return JSONResponse({"message": "Validation error", "errors": errors}, 400)
+
+        post_ids = list(dict.fromkeys(int(post_id) for post_id in args["ids"]))
+
+        results = {}
+        missing = []
+        for post_id in post_ids:
+            post_data = post_cache.get_post(post_id, user_id)
+            if post_data is None:
+                missing.append(post_id)
+            else:
+                results[post_id] = {"id": post_id, "status": "ok", "post": post_data}
+
+        if missing:
+            stub = get_post_service_stub(request)
+
+            grpc_request = post_service_pb2.BatchGetPostsRequest(
+                post_ids=missing, requester_id=user_id
+            )
+
+            response = await stub.BatchGetPosts(grpc_request)
+
+            for result in response.results:
+                results[result.post_id] = batch_result_to_dict(result)
+                if result.HasField("post"):
+                    post_cache.set_post(
+                        result.post_id,
+                        results[result.post_id]["post"],
+                        result.post.is_private,
+                        result.post.creator_id,
+                    )
+
+        return JSONResponse({"posts": [results[post_id] for post_id in post_ids]}, 200)
+    except grpc.RpcError as e:
+        return JSONResponse(
+            {"message": f"Error getting posts: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+@token_required
+async def list_posts(request):
+    try:
+        user_id = request.state.user_id
+
+        args = {}
+        for param in ["page", "per_page", "only_own"]:
+            if param in request.query_params:
+                if param in ["page", "per_page"]:
+                    args[param] = int(request.query_params.get(param, 1))
+                elif param == "only_own":
+                    args[param] = request.query_params.get(param, "").lower() == "true"
+
+        if "tags" in request.query_params:
+            args["tags"] = request.query_params.getlist("tags")
+        if "cursor" in request.query_params:
+            args["cursor"] = request.query_params["cursor"]
+        if "count" in request.query_params:
+            args["count"] = request.query_params["count"]
+
+        errors = validate_list_posts(args)
+        if errors:
+            return JSONResponse({"message": "Validation error", "errors": errors}, 400)
+
+        post_cache = request.app.state.post_cache
+        result = post_cache.get_list(args, user_id)
+        if result is not None:
+            return JSONResponse(result, 200)
+
+        count = args.get("count", request.app.state.config["POST_SERVICE_COUNT_MODE"])
+
+        stub = get_post_service_stub(request)
+
+        grpc_request = post_service_pb2.ListPostsRequest(
+            page=args.get("page", 1),
+            per_page=args.get("per_page", 10),
+            requester_id=user_id,
+            only_own=args.get("only_own", False),
+            tags=args.get("tags", []),
+            cursor=args.get("cursor", ""),
+            count_mode=COUNT_MODES[count],
+        )
+
+        response = await stub.ListPosts(grpc_request)
+
+        result = list_posts_to_dict(response, args, counted=count != "none")
+        post_cache.set_list(args, user_id, result)
+
+        return JSONResponse(result, 200)
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            return JSONResponse({"message": "Invalid cursor"}, 400)
+        return JSONResponse(
+            {"message": f"Error listing posts: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+async def read_stream(call):
+    # В grpcio 1.53 read() вызова, прошедшего через interceptor, в конце
+    # потока бросает StopAsyncIteration вместо EOF
+    try:
+        return await call.read()
+    except StopAsyncIteration:
+        return grpc.aio.EOF
+
+
+async def stream_posts_ndjson(first, call):
+    """Асинхронный аналог utils.utils.posts_to_ndjson для grpc.aio"""
+    try:
+        post = first
+        while post is not grpc.aio.EOF:
+            yield json.dumps(proto_post_to_dict(post)) + "\n"
+            post = await read_stream(call)
+    except grpc.RpcError as e:
+        yield json.dumps({"error": e.details()}) + "\n"
+    finally:
+        call.cancel()
+
+
+@token_required
+async def stream_posts(request):
+    try:
+        user_id = request.state.user_id
+
+        args = {}
+        if "only_own" in request.query_params:
+            args["only_own"] = (
+                request.query_params.get("only_own", "").lower() == "true"
+            )
+        if "limit" in request.query_params:
+            args["limit"] = int(request.query_params.get("limit", 0))
+        if "tags" in request.query_params:
+            args["tags"] = request.query_params.getlist("tags")
+
+        errors = stream_posts_schema.validate(args)
+        if errors:
+            return JSONResponse({"message": "Validation error", "errors": errors}, 400)
+
+        stub = get_post_service_stub(request)
+
+        grpc_request = post_service_pb2.StreamPostsRequest(
+            requester_id=user_id,
+            only_own=args.get("only_own", False),
+            tags=args.get("tags", []),
+            limit=args.get("limit", 0),
+        )
+
+        call = stub.StreamPosts(
+            grpc_request,
+            timeout=request.app.state.config["POST_SERVICE_STREAM_DEADLINE"],
+        )
+        # Ошибку до первого поста еще можно вернуть обычным статусом
+        first = await read_stream(call)
+
+        return StreamingResponse(
+            stream_posts_ndjson(first, call), media_type="application/x-ndjson"
+        )
+    except grpc.RpcError as e:
+        return JSONResponse(
+            {"message": f"Error streaming posts: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+@token_required
+async def update_post(request):
+    try:
+        user_id = request.state.user_id
+        post_id = request.path_params["post_id"]
+
+        data = await get_json(request)
+        errors = update_post_schema.validate(data)
+        if errors:
+            return JSONResponse({"message": "Validation error", "errors": errors}, 400)
+
+        stub = get_post_service_stub(request)
+
+        grpc_request = post_service_pb2.UpdatePostRequest(
+            post_id=post_id, updater_id=user_id
+        )
+
+        if "title" in data:
+            grpc_request.title = data["title"]
+        if "description" in data:
+            grpc_request.description = data["description"]
+        if "is_private" in data:
+            grpc_request.is_private = data["is_private"]
+        if "tags" in data:
+            grpc_request.tags.extend(data["tags"])
+
+        try:
+            response = await stub.UpdatePost(grpc_request)
+        finally:
+            request.app.state.post_cache.invalidate_post(post_id)
+
+        return JSONResponse(proto_post_to_dict(response), 200)
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return JSONResponse({"message": "Post not found"}, 404)
+        elif e.code() == grpc.StatusCode.PERMISSION_DENIED:
+            return JSONResponse(
+                {"message": "Only the creator can update this post"}, 403
+            )
+        return JSONResponse(
+            {"message": f"Error updating post: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+@token_required
+async def delete_post(request):
+    try:
+        user_id = request.state.user_id
+        post_id = request.path_params["post_id"]
+        stub = get_post_service_stub(request)
+
+        grpc_request = post_service_pb2.DeletePostRequest(
+            post_id=post_id, requester_id=user_id
+        )
+
+        try:
+            await stub.DeletePost(grpc_request)
+        finally:
+            request.app.state.post_cache.invalidate_post(post_id)
+
+        return JSONResponse({"message": "Post deleted successfully"}, 200)
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return JSONResponse({"message": "Post not found"}, 404)
+        elif e.code() == grpc.StatusCode.PERMISSION_DENIED:
+            return JSONResponse(
+                {"message": "Only the creator can delete this post"}, 403
+            )
+        return JSONResponse(
+            {"message": f"Error deleting post: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+@token_required
+async def view_post(request):
+    try:
+        user_id = request.state.user_id
+        post_id = request.path_params["post_id"]
+        stub = get_post_service_stub(request)
+
+        grpc_request = post_service_pb2.ViewPostRequest(
+            post_id=post_id, viewer_id=user_id
+        )
+
+        response = await stub.ViewPost(grpc_request)
+
+        return JSONResponse(
+            {"success": response.success, "views_count": response.views_count}, 200
+        )
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return JSONResponse({"message": "Post not found"}, 404)
+        return JSONResponse(
+            {"message": f"Error viewing post: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+@token_required
+async def record_views(request):
+    try:
+        user_id = request.state.user_id
+
+        data = await get_json(request)
+        errors = record_views_schema.validate(data)
+        if errors:
+            return JSONResponse({"message": "Validation error", "errors": errors}, 400)
+
+        stub = get_post_service_stub(request)
+
+        grpc_request = post_service_pb2.RecordViewsRequest(
+            post_ids=data["post_ids"], viewer_id=user_id
+        )
+
+        response = await stub.RecordViews(grpc_request)
+
+        return JSONResponse(
+            {"views": [view_result_to_dict(r) for r in response.results]}, 200
+        )
+    except grpc.RpcError as e:
+        return JSONResponse(
+            {"message": f"Error recording views: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+@token_required
+async def like_post(request):
+    try:
+        user_id = request.state.user_id
+        post_id = request.path_params["post_id"]
+        stub = get_post_service_stub(request)
+
+        grpc_request = post_service_pb2.LikePostRequest(
+            post_id=post_id, user_id=user_id
+        )
+
+        response = await stub.LikePost(grpc_request)
+
+        return JSONResponse(
+            {"success": response.success, "likes_count": response.likes_count}, 200
+        )
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return JSONResponse({"message": "Post not found"}, 404)
+        return JSONResponse(
+            {"message": f"Error liking post: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+@token_required
+async def add_comment(request):
+    try:
+        user_id = request.state.user_id
+        post_id = request.path_params["post_id"]
+
+        data = await get_json(request)
+        if not data or not "text" in data or not data["text"].strip():
+            return JSONResponse({"message": "Comment text is required"}, 400)
+
+        stub = get_post_service_stub(request)
+
+        grpc_request = post_service_pb2.AddCommentRequest(
+            post_id=post_id, user_id=user_id, text=data["text"]
+        )
+
+        response = await stub.AddComment(grpc_request)
+
+        return JSONResponse(proto_comment_to_dict(response), 201)
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return JSONResponse({"message": "Post not found"}, 404)
+        return JSONResponse(
+            {"message": f"Error adding comment: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+@token_required
+async def get_comments(request):
+    try:
+        user_id = request.state.user_id
+        post_id = request.path_params["post_id"]
+        page = query_int(request, "page", 1)
+        per_page = query_int(request, "per_page", 10)
+        count = request.query_params.get(
+            "count", request.app.state.config["POST_SERVICE_COUNT_MODE"]
+        )
+
+        if page < 1:
+            return JSONResponse({"message": "Page must be a positive integer"}, 400)
+        if per_page < 1 or per_page > 100:
+            return JSONResponse({"message": "per_page must be between 1 and 100"}, 400)
+        if count not in COUNT_MODES:
+            return JSONResponse(
+                {"message": f"count must be one of: {', '.join(COUNT_MODES)}"}, 400
+            )
+
+        stub = get_post_service_stub(request)
+
+        grpc_request = post_service_pb2.GetCommentsRequest(
+            post_id=post_id,
+            page=page,
+            per_page=per_page,
+            requester_id=user_id,
+            count_mode=COUNT_MODES[count],
+        )
+
+        response = await stub.GetComments(grpc_request)
+
+        return conditional_json(
+            request,
+            comments_etag(post_id, page, per_page, response),
+            lambda: comments_page_to_dict(
+                response, page, per_page, counted=count != "none"
+            ),
+        )
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return JSONResponse({"message": "Post not found"}, 404)
+        return JSONResponse(
+            {"message": f"Error getting comments: {e.details()}"}, e.code().value[0]
+        )
+    except Exception as e:
+        return JSONResponse({"message": f"Error: {str(e)}"}, 500)
+
+
+async def health_check(request):
+    return JSONResponse(
+        {
+            "status": "healthy",
+            "message": "API Gateway is up",
+            "admission": request.app.state.admission.stats(),
+            "post_service": {
+                **request.app.state.post_service_policy.stats(),
+                **request.app.state.post_service_balancer.stats(),
+                "hedging": hedging_stats(request.app.state.post_service_hedging),
+            },
+        },
+        200,
+    )
+
+
+async def metrics_endpoint(request):
+    return Response(
+        generate_latest(request.app.state.metrics.registry),
+        media_type=CONTENT_TYPE_LATEST,
+    )
+
+
+routes = [
+    Route("/api/users/register", register, methods=["POST"]),
+    Route("/api/users/login", login, methods=["POST"]),
+    Route("/api/users/profile", get_profile, methods=["GET"]),
+    Route("/api/users/profile", update_profile, methods=["PUT"]),
+    Route("/api/posts", create_post, methods=["POST"]),
+    Route("/api/posts/batch", batch_get_posts, methods=["GET"]),
+    Route("/api/posts/{post_id:int}", get_post, methods=["GET"]),
+    Route("/api/posts/{post_id:int}/full", get_post_full, methods=["GET"]),
+    Route("/api/posts", list_posts, methods=["GET"]),
+    Route("/api/posts/stream", stream_posts, methods=["GET"]),
+    Route("/api/posts/{post_id:int}", update_post, methods=["PUT"]),
+    Route("/api/posts/{post_id:int}", delete_post, methods=["DELETE"]),
+    Route("/api/posts/{post_id:int}/view", view_post, methods=["POST"]),
+    Route("/api/posts/views", record_views, methods=["POST"]),
+    Route("/api/posts/{post_id:int}/like", like_post, methods=["POST"]),
+    Route("/api/posts/{post_id:int}/comments", add_comment, methods=["POST"]),
+    Route("/api/posts/{post_id:int}/comments", get_comments, methods=["GET"]),
+    Route("/health", health_check, methods=["GET"]),
+    Route("/metrics", metrics_endpoint, methods=["GET"]),
+]
+
+
+def create_asgi_app(config_class=Config):
+    """ASGI-версия гейтвея: те же роуты, что и в create_app(), на grpc.aio и httpx"""
+    config = GatewayConfig.from_object(config_class)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        app.state.channel_pool = build_channel_pool(
+            config,
+            AsyncChannelPool,
+            app.state.post_service_policy,
+            [AsyncMetricsInterceptor(app.state.metrics)],
+            app.state.post_service_balancer,
+            app.state.post_service_hedging,
+        )
+        app.state.channel_pool.start_health_checks()
+        app.state.user_service_client = create_user_service_client(config)
+        yield
+        await app.state.user_service_client.aclose()
+        await app.state.channel_pool.close()
+
+    app = Starlette(
+        routes=routes,
+        lifespan=lifespan,
+        middleware=[
+            Middleware(MetricsMiddleware),
+            Middleware(AdmissionMiddleware),
+            Middleware(CompressionMiddleware),
+        ],
+    )
+    app.state.config = config
+    app.state.post_cache = create_post_cache(config)
+    app.state.token_cache = create_token_cache(config)
+    app.state.post_reads = AsyncSingleFlight()
+    app.state.admission = create_admission_controller(config, AsyncBackendLimiter)
+    app.state.post_service_policy = create_rpc_policy(config)
+    app.state.post_service_balancer = create_load_balancer(config)
+    app.state.post_service_hedging = create_hedging_policy(config)
+    app.state.response_compressor = create_response_compressor(config)
+    app.state.metrics = GatewayMetrics()
+    app.state.metrics.register_stats(
+        post_cache=lambda: app.state.post_cache,
+        token_cache=lambda: app.state.token_cache,
+        admission=lambda: app.state.admission,
+        post_service_policy=lambda: app.state.post_service_policy,
+        post_service_balancer=lambda: app.state.post_service_balancer,
+        post_service_hedging=lambda: app.state.post_service_hedging,
+    )
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(create_asgi_app(), host="0.0.0.0", port=5000)
@@ -0,0 +1,107 @@
+"""Бенчмарк сжатия: байты на проводе и CPU на ответ.
+
+Сравнивает JSON-ответы гейтвея (gzip/deflate разных уровней) и сообщения
+gRPC между гейтвеем и Post Service (gRPC сжимает сериализованное сообщение
+целиком тем же gzip/deflate).
+
+Запуск из каталога api-gateway:
+    python -m benchmarks.bench_compression
+"""
+
+import datetime
+import json
+import random
+import timeit
+
+import post_service_pb2
+from utils.compression import compress_body
+from utils.utils import proto_comments_to_dicts, proto_posts_to_dicts
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua gateway grpc kafka "
+    "posts comments python flask service latency cache"
+).split()
+
+
+def text(rng, length):
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)[:length]
+
+
+def make_posts(rng, count):
+    response = post_service_pb2.ListPostsResponse(total_count=1000, total_pages=10)
+    base = datetime.datetime(2024, 1, 1)
+    for i in range(count):
+        post = response.posts.add(
+            id=i + 1,
+            title=text(rng, 60),
+            description=text(rng, 2000),
+            creator_id=rng.randint(1, 500),
+            tags=rng.sample(WORDS, 3),
+        )
+        post.created_at.FromDatetime(base + datetime.timedelta(minutes=i))
+        post.updated_at.FromDatetime(base + datetime.timedelta(minutes=i))
+    return response
+
+
+def make_comments(rng, count):
+    response = post_service_pb2.GetCommentsResponse(total_count=500, total_pages=5)
+    base = datetime.datetime(2024, 1, 1)
+    for i in range(count):
+        comment = response.comments.add(
+            id=i + 1, post_id=1, user_id=rng.randint(1, 500), text=text(rng, 200)
+        )
+        comment.created_at.FromDatetime(base + datetime.timedelta(seconds=i))
+    return response
+
+
+def bench(name, raw, encoding, level, number):
+    compressed = compress_body(raw, encoding, level)
+    seconds = min(
+        timeit.repeat(
+            lambda: compress_body(raw, encoding, level), number=number, repeat=3
+        )
+    )
+    print(
+        f"  {name:<14} {len(compressed):>9} B  "
+        f"{len(compressed) / len(raw):6.1%}  {seconds / number * 1e6:9.1f} us"
+    )
+
+
+def report(title, raw, number):
+    print(f"{title}: {len(raw)} B uncompressed")
+    for encoding in ("gzip", "deflate"):
+        for level in (1, 6, 9):
+            bench(f"{encoding}-{level}", raw, encoding, level, number)
+    print()
+
+
+def main(number=50):
+    rng = random.Random(42)
+    posts = make_posts(rng, 100)
+    comments = make_comments(rng, 100)
+
+    report(
+        "GET /api/posts, per_page=100, JSON",
+        json.dumps({"posts": proto_posts_to_dicts(posts.posts)}).encode(),
+        number,
+    )
+    report(
+        "GET /api/posts/<id>/comments, per_page=100, JSON",
+        json.dumps({"comments": proto_comments_to_dicts(comments.comments)}).encode(),
+        number,
+    )
+    # gRPC всегда сжимает с уровнем по умолчанию, уровни даны для сравнения
+    report("ListPostsResponse, 100 posts, protobuf", posts.SerializeToString(), number)
+    report(
+        "GetCommentsResponse, 100 comments, protobuf",
+        comments.SerializeToString(),
+        number,
+    )
+
+
+if __name__ == "__main__":
+    main()
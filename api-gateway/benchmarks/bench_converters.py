@@ -0,0 +1,88 @@
+"""Микробенчмарк конвертации proto -> JSON-совместимый dict.
+
+Запуск из каталога api-gateway (нужны сгенерированные post_service_pb2*):
+    python -m benchmarks.bench_converters
+"""
+
+import datetime
+import timeit
+
+from google.protobuf.json_format import MessageToDict
+
+import post_service_pb2
+from utils.utils import _timestamp_isoformat, proto_posts_to_dicts
+
+
+def legacy_timestamp_to_datetime(timestamp):
+    dt = datetime.datetime.fromtimestamp(
+        timestamp.seconds + timestamp.nanos / 1e9, tz=datetime.timezone.utc
+    )
+    return dt.isoformat()
+
+
+def legacy_post_to_dict(post):
+    post_dict = MessageToDict(post, preserving_proto_field_name=True)
+
+    if "created_at" in post_dict:
+        post_dict["created_at"] = legacy_timestamp_to_datetime(post.created_at)
+    if "updated_at" in post_dict:
+        post_dict["updated_at"] = legacy_timestamp_to_datetime(post.updated_at)
+
+    return post_dict
+
+
+def make_page(per_page, offset=0):
+    response = post_service_pb2.ListPostsResponse(total_count=1000, total_pages=10)
+    base = datetime.datetime(2024, 1, 1)
+    for i in range(per_page):
+        post = response.posts.add(
+            id=offset + i + 1,
+            title=f"Post {i}",
+            description="Lorem ipsum dolor sit amet " * 20,
+            creator_id=i % 7 + 1,
+            is_private=i % 5 == 0,
+            tags=["news", "python", "grpc"][: i % 4],
+        )
+        created_at = base + datetime.timedelta(seconds=offset + i, microseconds=i)
+        post.created_at.FromDatetime(created_at)
+        post.updated_at.FromDatetime(created_at)
+    return response
+
+
+def bench(name, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5))
+    print(f"{name:<40} {seconds / number * 1e6:10.1f} us/page")
+    return seconds
+
+
+def main(per_page=100, number=200):
+    page = make_page(per_page)
+    assert [legacy_post_to_dict(post) for post in page.posts] == proto_posts_to_dicts(
+        page.posts
+    )
+
+    print(f"ListPostsResponse, {per_page} posts per page")
+    legacy = bench(
+        "MessageToDict + float timestamps",
+        lambda: [legacy_post_to_dict(post) for post in page.posts],
+        number,
+    )
+    fast = bench(
+        "proto_posts_to_dicts", lambda: proto_posts_to_dicts(page.posts), number
+    )
+
+    # Худший случай для кеша таймстемпов: все страницы с новыми значениями
+    pages = [make_page(per_page, offset=i * per_page) for i in range(number)]
+    pages_iter = iter(pages * 5)
+
+    def uncached():
+        _timestamp_isoformat.cache_clear()
+        return proto_posts_to_dicts(next(pages_iter).posts)
+
+    cold = bench("proto_posts_to_dicts, cold timestamps", uncached, number)
+
+    print(f"speedup: {legacy / fast:.1f}x (warm), {legacy / cold:.1f}x (cold)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Микробенчмарк валидации тела и параметров запросов.
+
+Запуск из каталога api-gateway:
+    python -m benchmarks.bench_validators
+"""
+
+import timeit
+
+from utils.validators import (
+    CreatePostSchema,
+    ListPostsSchema,
+    create_post_schema,
+    list_posts_schema,
+    validate_create_post,
+    validate_list_posts,
+)
+
+CREATE_POST = {
+    "title": "Benchmark post",
+    "description": "Lorem ipsum dolor sit amet " * 20,
+    "is_private": False,
+    "tags": ["news", "python", "grpc", "soa", "gateway"],
+}
+LIST_POSTS = {"page": 3, "per_page": 20, "only_own": False, "tags": ["python"]}
+INVALID_POST = {**CREATE_POST, "tags": ["bad tag"]}
+
+
+def bench(name, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5))
+    print(f"{name:<40} {seconds / number * 1e6:10.1f} us/request")
+    return seconds
+
+
+def compare(title, data, schema_class, schema, fast, number):
+    assert schema_class().validate(data) == schema.validate(data) == fast(data)
+
+    print(title)
+    per_request = bench(
+        "new schema per request", lambda: schema_class().validate(data), number
+    )
+    shared = bench("shared schema", lambda: schema.validate(data), number)
+    fast_path = bench("fast path", lambda: fast(data), number)
+    print(
+        f"speedup: {per_request / shared:.1f}x (shared), "
+        f"{per_request / fast_path:.1f}x (fast path)\n"
+    )
+
+
+def main(number=20000):
+    compare(
+        "CreatePostSchema",
+        CREATE_POST,
+        CreatePostSchema,
+        create_post_schema,
+        validate_create_post,
+        number,
+    )
+    compare(
+        "ListPostsSchema",
+        LIST_POSTS,
+        ListPostsSchema,
+        list_posts_schema,
+        validate_list_posts,
+        number,
+    )
+    # Невалидный запрос проходит через схему, чтобы сохранить тексты ошибок
+    compare(
+        "CreatePostSchema, invalid tags",
+        INVALID_POST,
+        CreatePostSchema,
+        create_post_schema,
+        validate_create_post,
+        number // 4,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -13,4 +13,125 @@ class Config:
     JWT_VERIFY_SUB = False
 
     USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://user-service:5001")
+    # Реплики Post Service через запятую; dns:///имя:порт - все адреса имени
     POST_SERVICE_GRPC = os.getenv("POST_SERVICE_GRPC", "post-service:50051")
+    # Каналов на каждую реплику
+    POST_SERVICE_CHANNEL_POOL_SIZE = int(os.getenv("POST_SERVICE_CHANNEL_POOL_SIZE", 4))
+    # least_requests или round_robin
+    POST_SERVICE_LB_POLICY = os.getenv("POST_SERVICE_LB_POLICY", "least_requests")
+    # 0 отключает health check и перерезолвинг dns:///
+    POST_SERVICE_HEALTH_CHECK_INTERVAL = float(
+        os.getenv("POST_SERVICE_HEALTH_CHECK_INTERVAL", 5)
+    )
+    POST_SERVICE_HEALTH_CHECK_TIMEOUT = float(
+        os.getenv("POST_SERVICE_HEALTH_CHECK_TIMEOUT", 1)
+    )
+    GRPC_KEEPALIVE_TIME_MS = int(os.getenv("GRPC_KEEPALIVE_TIME_MS", 30000))
+    GRPC_KEEPALIVE_TIMEOUT_MS = int(os.getenv("GRPC_KEEPALIVE_TIMEOUT_MS", 10000))
+    GRPC_KEEPALIVE_PERMIT_WITHOUT_CALLS = (
+        os.getenv("GRPC_KEEPALIVE_PERMIT_WITHOUT_CALLS", "true").lower() == "true"
+    )
+
+    USER_SERVICE_POOL_CONNECTIONS = int(os.getenv("USER_SERVICE_POOL_CONNECTIONS", 4))
+    USER_SERVICE_POOL_MAXSIZE = int(os.getenv("USER_SERVICE_POOL_MAXSIZE", 32))
+    USER_SERVICE_POOL_BLOCK = (
+        os.getenv("USER_SERVICE_POOL_BLOCK", "false").lower() == "true"
+    )
+    USER_SERVICE_CONNECT_TIMEOUT = float(os.getenv("USER_SERVICE_CONNECT_TIMEOUT", 2.0))
+    USER_SERVICE_READ_TIMEOUT = float(os.getenv("USER_SERVICE_READ_TIMEOUT", 10.0))
+    USER_SERVICE_GET_RETRIES = int(os.getenv("USER_SERVICE_GET_RETRIES", 2))
+    USER_SERVICE_RETRY_BACKOFF = float(os.getenv("USER_SERVICE_RETRY_BACKOFF", 0.1))
+
+    # "wsgi" - Flask, "asgi" - Starlette + grpc.aio (asgi.py)
+    GATEWAY_SERVER_MODE = os.getenv("GATEWAY_SERVER_MODE", "wsgi")
+
+    POST_CACHE_ENABLED = os.getenv("POST_CACHE_ENABLED", "true").lower() == "true"
+    POST_CACHE_MAX_SIZE = int(os.getenv("POST_CACHE_MAX_SIZE", 1024))
+    POST_CACHE_TTL = float(os.getenv("POST_CACHE_TTL", 30))
+
+    JWT_CACHE_ENABLED = os.getenv("JWT_CACHE_ENABLED", "true").lower() == "true"
+    JWT_CACHE_MAX_SIZE = int(os.getenv("JWT_CACHE_MAX_SIZE", 10000))
+    JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL", 300))
+
+    # Допуск запросов: rate <= 0 или max_in_flight <= 0 отключают ограничение
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_GLOBAL_RATE = float(os.getenv("ADMISSION_GLOBAL_RATE", 1000))
+    ADMISSION_GLOBAL_BURST = int(os.getenv("ADMISSION_GLOBAL_BURST", 2000))
+    ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", 20))
+    ADMISSION_USER_BURST = int(os.getenv("ADMISSION_USER_BURST", 40))
+    ADMISSION_USER_BUCKETS_MAX = int(os.getenv("ADMISSION_USER_BUCKETS_MAX", 10000))
+    # Post Service обслуживает MAX_WORKERS = 10 запросов одновременно
+    POST_SERVICE_MAX_IN_FLIGHT = int(os.getenv("POST_SERVICE_MAX_IN_FLIGHT", 10))
+    USER_SERVICE_MAX_IN_FLIGHT = int(os.getenv("USER_SERVICE_MAX_IN_FLIGHT", 32))
+    ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 20))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 0.5))
+
+    # Дедлайн вызова Post Service по умолчанию и для отдельных RPC, секунды:
+    # POST_SERVICE_DEADLINES="GetPost=1,ListPosts=2"
+    POST_SERVICE_DEADLINE = float(os.getenv("POST_SERVICE_DEADLINE", 5.0))
+    POST_SERVICE_DEADLINES = os.getenv(
+        "POST_SERVICE_DEADLINES",
+        "GetPost=2,GetPostVersion=1,GetPostCounts=2,BatchGetPosts=3,ListPosts=3,"
+        "GetComments=3",
+    )
+    # total_count списков, если клиент не передал count: exact, cached
+    # (кеш на стороне Post Service), estimate (оценка планировщика) или none
+    POST_SERVICE_COUNT_MODE = os.getenv("POST_SERVICE_COUNT_MODE", "exact")
+    POST_SERVICE_READ_RETRIES = int(os.getenv("POST_SERVICE_READ_RETRIES", 2))
+    POST_SERVICE_RETRY_BACKOFF = float(os.getenv("POST_SERVICE_RETRY_BACKOFF", 0.05))
+    POST_SERVICE_RETRY_BUDGET_RATIO = float(
+        os.getenv("POST_SERVICE_RETRY_BUDGET_RATIO", 0.2)
+    )
+    POST_SERVICE_RETRY_MIN_PER_SECOND = float(
+        os.getenv("POST_SERVICE_RETRY_MIN_PER_SECOND", 5)
+    )
+    # 0 отключает circuit breaker
+    POST_SERVICE_CIRCUIT_FAILURE_THRESHOLD = int(
+        os.getenv("POST_SERVICE_CIRCUIT_FAILURE_THRESHOLD", 5)
+    )
+    POST_SERVICE_CIRCUIT_RESET_TIMEOUT = float(
+        os.getenv("POST_SERVICE_CIRCUIT_RESET_TIMEOUT", 10)
+    )
+    # StreamPosts отдает всю выборку, поэтому его дедлайн больше, чем у unary-вызовов
+    POST_SERVICE_STREAM_DEADLINE = float(os.getenv("POST_SERVICE_STREAM_DEADLINE", 300))
+    # Хеджирование чтений: повтор в другую реплику, если ответа нет дольше
+    # перцентиля POST_SERVICE_HEDGE_PERCENTILE обычной задержки этого RPC
+    POST_SERVICE_HEDGING_ENABLED = (
+        os.getenv("POST_SERVICE_HEDGING_ENABLED", "false").lower() == "true"
+    )
+    POST_SERVICE_HEDGED_RPCS = os.getenv(
+        "POST_SERVICE_HEDGED_RPCS", "GetPost,GetComments"
+    )
+    POST_SERVICE_HEDGE_PERCENTILE = float(
+        os.getenv("POST_SERVICE_HEDGE_PERCENTILE", 95)
+    )
+    POST_SERVICE_HEDGE_MIN_DELAY = float(
+        os.getenv("POST_SERVICE_HEDGE_MIN_DELAY", 0.01)
+    )
+    # Задержка, пока не накоплено 100 замеров
+    POST_SERVICE_HEDGE_INITIAL_DELAY = float(
+        os.getenv("POST_SERVICE_HEDGE_INITIAL_DELAY", 0.05)
+    )
+    # Не больше такой доли хеджированных чтений
+    POST_SERVICE_HEDGE_BUDGET_RATIO = float(
+        os.getenv("POST_SERVICE_HEDGE_BUDGET_RATIO", 0.05)
+    )
+    # Потоки для одновременных вызовов GET /api/posts/<id>/full во Flask-режиме:
+    # по два на запрос (пост читается в потоке самого запроса)
+    POST_SERVICE_FANOUT_WORKERS = int(os.getenv("POST_SERVICE_FANOUT_WORKERS", 20))
+
+    RESPONSE_COMPRESSION_ENABLED = (
+        os.getenv("RESPONSE_COMPRESSION_ENABLED", "true").lower() == "true"
+    )
+    RESPONSE_COMPRESSION_MIN_SIZE = int(
+        os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", 1024)
+    )
+    # Уровень 1 сжимает JSON до ~24% против ~17% у уровня 6, но в 4-5 раз
+    # быстрее (python -m benchmarks.bench_compression)
+    RESPONSE_COMPRESSION_LEVEL = int(os.getenv("RESPONSE_COMPRESSION_LEVEL", 1))
+    # Порог для отдельных роутов (имя обработчика), "off" отключает сжатие роута
+    RESPONSE_COMPRESSION_ROUTES = os.getenv(
+        "RESPONSE_COMPRESSION_ROUTES", "list_posts=512,get_comments=512"
+    )
+    # Сжатие сообщений gRPC между гейтвеем и Post Service: none, gzip, deflate
+    POST_SERVICE_GRPC_COMPRESSION = os.getenv("POST_SERVICE_GRPC_COMPRESSION", "none")
@@ -1,6 +1,17 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
+from starlette.testclient import TestClient
 from app import create_app
+from asgi import create_asgi_app
+
+
+class ASGITestClient(TestClient):
+    # Ответы httpx отдают тело через .content, а тесты пишутся под Flask (.data)
+    def request(self, *args, **kwargs):
+        response = super().request(*args, **kwargs)
+        response.data = response.content
+        return response
+
 
 @pytest.fixture
 def app():
@@ -12,16 +23,43 @@ def app():
     return app
 
 @pytest.fixture
-def client(app):
-    return app.test_client()
+def asgi_app():
+    app = create_asgi_app()
+    app.state.config.update({
+        'JWT_SECRET_KEY': 'test-jwt-secret-key',
+        'USER_SERVICE_URL': 'http://mock-user-service:5001'
+    })
+    return app
+
+@pytest.fixture(params=['wsgi', 'asgi'])
+def gateway_mode(request):
+    return request.param
+
+@pytest.fixture
+def client(gateway_mode, request):
+    if gateway_mode == 'asgi':
+        return ASGITestClient(request.getfixturevalue('asgi_app'))
+    return request.getfixturevalue('app').test_client()
 
 @pytest.fixture
-def mock_requests():
-    with patch('app.requests') as mock_requests:
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"message": "Mock response"}
-        mock_requests.get.return_value = mock_response
-        mock_requests.post.return_value = mock_response
-        mock_requests.put.return_value = mock_response
-        yield mock_requests
+def mock_requests(gateway_mode, request):
+    mock_session = MagicMock()
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.content = b'{"message": "Mock response"}'
+    mock_response.headers = {"Content-Type": "application/json"}
+
+    if gateway_mode == 'asgi':
+        for method in ['get', 'post', 'put']:
+            setattr(mock_session, method, AsyncMock(return_value=mock_response))
+        state = request.getfixturevalue('asgi_app').state
+        state.user_service_client = mock_session
+        yield mock_session
+        return
+
+    mock_session.get.return_value = mock_response
+    mock_session.post.return_value = mock_response
+    mock_session.put.return_value = mock_response
+    app = request.getfixturevalue('app')
+    with patch.dict(app.extensions, {'user_service_session': mock_session}):
+        yield mock_session
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+
+from utils.admission import (
+    AsyncBackendLimiter,
+    BackendLimiter,
+    KeyedTokenBuckets,
+    TokenBucket,
+    AdmissionController,
+    POST_SERVICE,
+    USER_SERVICE,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_controller(
+    global_rate=0, user_rate=0, max_in_flight=0, limiter_class=BackendLimiter
+):
+    return AdmissionController(
+        TokenBucket(global_rate, 1),
+        KeyedTokenBuckets(user_rate, 1),
+        {
+            USER_SERVICE: limiter_class(max_in_flight, 0, 0.01),
+            POST_SERVICE: limiter_class(max_in_flight, 0, 0.01),
+        },
+    )
+
+
+@pytest.fixture
+def install_admission(gateway_mode, request):
+    def install(**kwargs):
+        if gateway_mode == "asgi":
+            controller = make_controller(limiter_class=AsyncBackendLimiter, **kwargs)
+            request.getfixturevalue("asgi_app").state.admission = controller
+        else:
+            controller = make_controller(**kwargs)
+            request.getfixturevalue("app").extensions["admission"] = controller
+        return controller
+
+    return install
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    clock.now = 0.5
+    assert bucket.try_acquire() == 0
+
+
+def test_keyed_token_buckets_are_independent_and_bounded():
+    buckets = KeyedTokenBuckets(rate=1, burst=1, max_keys=2, clock=FakeClock())
+
+    assert buckets.try_acquire("a") == 0
+    assert buckets.try_acquire("a") > 0
+    assert buckets.try_acquire("b") == 0
+    assert buckets.try_acquire("c") == 0
+    assert len(buckets) == 2
+
+
+def test_backend_limiter_rejects_when_queue_is_full():
+    limiter = BackendLimiter(max_in_flight=1, max_queue=0, queue_timeout=1)
+
+    assert limiter.acquire()
+    assert not limiter.acquire()
+    limiter.release()
+    assert limiter.acquire()
+    assert limiter.in_flight == 1
+
+
+def test_backend_limiter_gives_up_after_queue_timeout():
+    limiter = BackendLimiter(max_in_flight=1, max_queue=1, queue_timeout=0.01)
+
+    assert limiter.acquire()
+    assert not limiter.acquire()
+    assert limiter.queued == 0
+
+
+def test_async_backend_limiter_waits_for_released_slot():
+    async def scenario():
+        limiter = AsyncBackendLimiter(max_in_flight=1, max_queue=1, queue_timeout=1)
+        assert await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release()
+        return await waiter, limiter.in_flight
+
+    assert asyncio.run(scenario()) == (True, 1)
+
+
+def test_rate_limited_request_gets_429_with_retry_after(
+    client, mock_requests, install_admission
+):
+    admission = install_admission(user_rate=1)
+
+    assert client.post("/api/users/login", json={}).status_code == 200
+    response = client.post("/api/users/login", json={})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert mock_requests.post.call_count == 1
+    assert admission.stats()["rejected"]["user_rate"] == 1
+
+
+def test_busy_backend_gets_503_and_health_is_not_limited(
+    client, mock_requests, install_admission
+):
+    admission = install_admission(max_in_flight=1)
+    limiter = admission.backends[USER_SERVICE]
+    if isinstance(limiter, AsyncBackendLimiter):
+        assert asyncio.run(limiter.acquire())
+    else:
+        assert limiter.acquire()
+
+    response = client.post("/api/users/login", json={})
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    mock_requests.post.assert_not_called()
+
+    health = client.get("/health")
+    assert health.status_code == 200
+    assert json.loads(health.data)["admission"]["rejected"]["backend_busy"] == 1
@@ -0,0 +1,254 @@
+import asyncio
+import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import grpc
+import jwt
+import pytest
+
+import post_service_pb2
+from tests.conftest import ASGITestClient
+from utils.channels import AsyncChannelPool
+
+
+@pytest.fixture
+def token_header():
+    token = jwt.encode(
+        {
+            "sub": 1,
+            "type": "access",
+            "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+        },
+        "test-jwt-secret-key",
+        algorithm="HS256",
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def mock_stub(asgi_app):
+    stub = MagicMock()
+    asgi_app.state.channel_pool = MagicMock()
+    asgi_app.state.channel_pool.get_stub.return_value = stub
+    return stub
+
+
+class FakeRpcError(grpc.RpcError):
+    def __init__(self, code, details=""):
+        self._code = code
+        self._details = details
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._details
+
+
+def private_post_comments(creator_id):
+    """GetComments, как в Post Service: комментарии приватного поста видны
+    только его автору
+    """
+    comments = post_service_pb2.GetCommentsResponse(total_count=1, total_pages=1)
+    comments.comments.add(id=5, post_id=1, user_id=2, text="Nice")
+
+    def get_comments(request):
+        if request.requester_id != creator_id:
+            raise FakeRpcError(grpc.StatusCode.PERMISSION_DENIED)
+        return comments
+
+    return get_comments
+
+
+def test_post_routes_require_token(asgi_app):
+    client = ASGITestClient(asgi_app)
+
+    response = client.get("/api/posts/1")
+
+    assert response.status_code == 401
+    assert response.json()["message"] == "Authentication required"
+
+
+def test_get_post_awaits_aio_stub(asgi_app, mock_stub, token_header):
+    mock_stub.GetPost = AsyncMock(
+        return_value=post_service_pb2.Post(id=1, title="Title", creator_id=1)
+    )
+    client = ASGITestClient(asgi_app)
+
+    response = client.get("/api/posts/1", headers=token_header)
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "Title"
+    grpc_request = mock_stub.GetPost.await_args[0][0]
+    assert grpc_request.post_id == 1
+    assert grpc_request.requester_id == 1
+
+
+def test_get_post_maps_not_found(asgi_app, mock_stub, token_header):
+    mock_stub.GetPost = AsyncMock(side_effect=FakeRpcError(grpc.StatusCode.NOT_FOUND))
+    client = ASGITestClient(asgi_app)
+
+    response = client.get("/api/posts/1", headers=token_header)
+
+    assert response.status_code == 404
+    assert response.json()["message"] == "Post not found"
+
+
+def test_lifespan_opens_and_closes_aio_pool(asgi_app):
+    with ASGITestClient(asgi_app) as client:
+        pool = asgi_app.state.channel_pool
+        assert isinstance(pool, AsyncChannelPool)
+        assert client.get("/health").status_code == 200
+
+    assert pool._closed
+
+
+class FakeStreamCall:
+    def __init__(self, posts):
+        self._posts = list(posts)
+        self.cancelled = False
+
+    async def read(self):
+        if self._posts:
+            return self._posts.pop(0)
+        return grpc.aio.EOF
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def test_stream_posts_accepts_intercepted_call_end(asgi_app, mock_stub, token_header):
+    call = FakeStreamCall([post_service_pb2.Post(id=1, title="Title")])
+    read = call.read
+
+    async def read_intercepted():
+        post = await read()
+        if post is grpc.aio.EOF:
+            raise StopAsyncIteration
+        return post
+
+    call.read = read_intercepted
+    mock_stub.StreamPosts = MagicMock(return_value=call)
+    client = ASGITestClient(asgi_app)
+
+    response = client.get("/api/posts/stream", headers=token_header)
+
+    assert response.text.splitlines() == ['{"id": 1, "title": "Title"}']
+
+
+def test_stream_posts_reads_aio_stream_as_ndjson(asgi_app, mock_stub, token_header):
+    call = FakeStreamCall(
+        [post_service_pb2.Post(id=post_id, title="Title") for post_id in (2, 1)]
+    )
+    mock_stub.StreamPosts = MagicMock(return_value=call)
+    client = ASGITestClient(asgi_app)
+
+    response = client.get("/api/posts/stream?only_own=true", headers=token_header)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [line for line in response.text.splitlines()] == [
+        '{"id": 2, "title": "Title"}',
+        '{"id": 1, "title": "Title"}',
+    ]
+    assert call.cancelled
+    assert mock_stub.StreamPosts.call_args[0][0].only_own
+
+
+def test_get_post_returns_304_for_current_version(asgi_app, mock_stub, token_header):
+    post = post_service_pb2.Post(id=1, title="Title", creator_id=1)
+    post.updated_at.FromDatetime(datetime.datetime(2024, 1, 2))
+    version = post_service_pb2.PostVersion(post_id=1)
+    version.updated_at.CopyFrom(post.updated_at)
+    mock_stub.GetPost = AsyncMock(return_value=post)
+    mock_stub.GetPostVersion = AsyncMock(return_value=version)
+    client = ASGITestClient(asgi_app)
+
+    etag = client.get("/api/posts/1", headers=token_header).headers["ETag"]
+    asgi_app.state.post_cache.invalidate_post(1)
+    response = client.get(
+        "/api/posts/1", headers={**token_header, "If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+    assert mock_stub.GetPost.await_count == 1
+
+
+def test_large_responses_are_compressed(asgi_app, mock_stub, token_header):
+    posts = [
+        post_service_pb2.Post(id=post_id, description="Lorem ipsum dolor " * 50)
+        for post_id in range(1, 11)
+    ]
+    mock_stub.ListPosts = AsyncMock(
+        return_value=post_service_pb2.ListPostsResponse(posts=posts, total_count=10)
+    )
+    client = ASGITestClient(asgi_app)
+
+    response = client.get(
+        "/api/posts", headers={**token_header, "Accept-Encoding": "gzip"}
+    )
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert len(response.json()["posts"]) == 10
+    assert "content-encoding" not in small.headers
+
+
+def test_full_post_awaits_calls_together(asgi_app, mock_stub, token_header):
+    started = []
+
+    def answer(name, response):
+        async def call(request):
+            started.append(name)
+            await asyncio.sleep(0.01)
+            # Пока первый вызов ждет ответа, остальные уже отправлены
+            assert len(started) == 3
+            return response
+
+        return call
+
+    mock_stub.GetPost = answer("post", post_service_pb2.Post(id=1, creator_id=1))
+    mock_stub.GetComments = answer(
+        "comments", post_service_pb2.GetCommentsResponse(total_count=0)
+    )
+    mock_stub.GetPostCounts = answer(
+        "counts", post_service_pb2.PostCounts(post_id=1, likes_count=2)
+    )
+    client = ASGITestClient(asgi_app)
+
+    response = client.get("/api/posts/1/full", headers=token_header)
+
+    assert response.status_code == 200
+    assert response.json()["post"]["id"] == 1
+    assert response.json()["likes_count"] == 2
+    assert response.json()["comments"]["total_count"] == 0
+
+
+def test_private_post_comments_are_visible_to_creator(
+    asgi_app, mock_stub, token_header
+):
+    mock_stub.GetComments = AsyncMock(side_effect=private_post_comments(1))
+    client = ASGITestClient(asgi_app)
+
+    response = client.get("/api/posts/1/comments", headers=token_header)
+
+    assert response.status_code == 200
+    assert response.headers["etag"]
+    assert response.json()["comments"][0]["text"] == "Nice"
+
+
+def test_record_views_awaits_aio_stub(asgi_app, mock_stub, token_header):
+    response = post_service_pb2.RecordViewsResponse()
+    response.results.add(post_id=1, views_count=2, recorded=False)
+    mock_stub.RecordViews = AsyncMock(return_value=response)
+    client = ASGITestClient(asgi_app)
+
+    result = client.post(
+        "/api/posts/views", json={"post_ids": [1]}, headers=token_header
+    )
+
+    assert result.status_code == 200
+    assert result.json()["views"] == [
+        {"id": 1, "status": "ok", "views_count": 2, "recorded": False}
+    ]
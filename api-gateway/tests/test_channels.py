@@ -0,0 +1,192 @@
+from concurrent import futures
+
+import grpc
+import pytest
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
+
+import post_service_pb2
+import post_service_pb2_grpc
+from tests.test_resilience import FlakyPostService
+from utils import channels
+from utils.balancing import HEALTH_SERVICE, ROUND_ROBIN, LoadBalancer, resolve_targets
+from utils.channels import ChannelPool
+from utils.resilience import RpcPolicy
+
+
+@pytest.fixture
+def pool():
+    pool = ChannelPool("localhost:50051", size=3)
+    yield pool
+    pool.close()
+
+
+def test_pool_reuses_stubs_round_robin(pool):
+    stubs = [pool.get_stub() for _ in range(6)]
+
+    assert len({id(stub) for stub in stubs}) == 3
+    assert stubs[:3] == stubs[3:]
+
+
+def test_pool_sets_keepalive_options(pool):
+    options = dict(pool.options)
+
+    assert options["grpc.keepalive_time_ms"] == 30000
+    assert options["grpc.keepalive_permit_without_calls"] == 1
+
+
+def test_closed_pool_rejects_stub_requests(pool):
+    pool.close()
+
+    with pytest.raises(RuntimeError):
+        pool.get_stub()
+
+
+def test_app_stub_comes_from_shared_pool(app):
+    from utils.utils import get_post_service_stub
+
+    (replica,) = channels.get_channel_pool().balancer.replicas
+    assert get_post_service_stub() in replica.stubs
+    assert (
+        channels.get_channel_pool().size == app.config["POST_SERVICE_CHANNEL_POOL_SIZE"]
+    )
+
+
+def test_pool_uses_configured_grpc_compression(app):
+    import grpc
+
+    pool = channels.build_channel_pool(
+        {**app.config, "POST_SERVICE_GRPC_COMPRESSION": "gzip"}
+    )
+    try:
+        assert pool.compression == grpc.Compression.Gzip
+    finally:
+        pool.close()
+
+
+def fake_resolver(*addresses):
+    def resolve(host, port, type=0):
+        return [(2, 1, 6, "", (address, int(port))) for address in addresses]
+
+    return resolve
+
+
+def test_resolve_targets_expands_dns_names():
+    targets = resolve_targets(
+        "a:50051, dns:///post-service:50051",
+        resolve=fake_resolver("10.0.0.2", "10.0.0.1", "10.0.0.2"),
+    )
+
+    assert targets == ["a:50051", "10.0.0.1:50051", "10.0.0.2:50051"]
+
+
+@pytest.fixture
+def replicated_pool():
+    pool = ChannelPool("localhost:50051,localhost:50052", size=2)
+    yield pool
+    pool.close()
+
+
+def test_least_requests_prefers_idle_healthy_replica(replicated_pool):
+    first, second = replicated_pool.balancer.replicas
+    first.started()
+
+    assert all(replicated_pool.get_stub() in second.stubs for _ in range(4))
+
+    second.healthy = False
+    assert replicated_pool.get_stub() in first.stubs
+
+    first.finished(grpc.StatusCode.OK)
+    first.healthy = False
+    # Без здоровых реплик вызовы распределяются по всем
+    stubs = {id(replicated_pool.get_stub()) for _ in range(8)}
+    assert stubs & {id(stub) for stub in first.stubs}
+    assert stubs & {id(stub) for stub in second.stubs}
+
+
+def test_round_robin_alternates_replicas():
+    pool = ChannelPool(
+        "localhost:50051,localhost:50052",
+        size=1,
+        balancer=LoadBalancer(ROUND_ROBIN),
+    )
+    try:
+        first, second = pool.balancer.replicas
+        first.started()
+
+        stubs = [pool.get_stub() for _ in range(4)]
+    finally:
+        pool.close()
+
+    assert stubs == first.stubs + second.stubs + first.stubs + second.stubs
+
+
+def test_refresh_keeps_known_replicas_and_retires_missing(replicated_pool):
+    first, second = replicated_pool.balancer.replicas
+    second.started()
+
+    idle = replicated_pool._apply_targets(["localhost:50051", "localhost:50053"])
+
+    replicas = replicated_pool.balancer.replicas
+    assert replicas[0] is first
+    assert replicas[1].target == "localhost:50053"
+    # Реплика с незавершенным вызовом закрывается позже
+    assert idle == []
+    second.finished(grpc.StatusCode.OK)
+    assert replicated_pool._apply_targets([r.target for r in replicas]) == [second]
+
+
+@pytest.fixture
+def health_servers():
+    servers, healths, targets = [], [], []
+    for _ in range(2):
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+        health_servicer = health.HealthServicer()
+        health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        health_servicer.set(HEALTH_SERVICE, health_pb2.HealthCheckResponse.SERVING)
+        servers.append(server)
+        healths.append(health_servicer)
+        targets.append(f"127.0.0.1:{port}")
+    yield healths, ",".join(targets)
+    for server in servers:
+        server.stop(None)
+
+
+def test_health_check_ejects_not_serving_replica(health_servers):
+    healths, target = health_servers
+    healths[1].set(HEALTH_SERVICE, health_pb2.HealthCheckResponse.NOT_SERVING)
+    pool = ChannelPool(target, size=1)
+
+    try:
+        for replica in pool.balancer.replicas:
+            pool.check_health(replica, timeout=1)
+        first, second = pool.balancer.replicas
+
+        assert first.healthy and not second.healthy
+        assert all(pool.get_stub() in first.stubs for _ in range(4))
+    finally:
+        pool.close()
+
+
+def test_replica_load_counts_calls_and_failures():
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    post_service_pb2_grpc.add_PostServiceServicer_to_server(
+        FlakyPostService(failures=1), server
+    )
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    pool = ChannelPool(f"127.0.0.1:{port}", size=1, policy=RpcPolicy(backoff=0))
+
+    try:
+        pool.get_stub().GetPost(post_service_pb2.GetPostRequest(post_id=1))
+    finally:
+        pool.close()
+        server.stop(None)
+
+    assert pool.balancer.stats()["replicas"][f"127.0.0.1:{port}"] == {
+        "healthy": True,
+        "in_flight": 0,
+        "calls": 2,
+        "failures": 1,
+    }
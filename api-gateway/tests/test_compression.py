@@ -0,0 +1,110 @@
+import gzip
+import json
+import zlib
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+import post_service_pb2
+from utils.compression import (
+    ResponseCompressor,
+    negotiate_encoding,
+    parse_route_min_sizes,
+)
+
+
+@pytest.fixture
+def headers(app):
+    with app.app_context():
+        token = create_access_token(identity=1)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def stub():
+    stub = MagicMock()
+    with patch("app.get_post_service_stub", return_value=stub):
+        yield stub
+
+
+def make_post(post_id):
+    post = post_service_pb2.Post(
+        id=post_id,
+        title=f"Post {post_id}",
+        description="Lorem ipsum dolor sit amet " * 40,
+        creator_id=1,
+    )
+    post.updated_at.GetCurrentTime()
+    return post
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, None),
+        ("gzip, deflate", "gzip"),
+        ("deflate", "deflate"),
+        ("gzip;q=0.5, deflate", "deflate"),
+        ("gzip;q=0, br", None),
+        ("*", "gzip"),
+        ("identity", None),
+    ],
+)
+def test_negotiate_encoding(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_route_thresholds_override_global_threshold():
+    compressor = ResponseCompressor(
+        min_size=1000,
+        route_min_sizes=parse_route_min_sizes("list_posts=10,health_check=off"),
+    )
+
+    assert compressor.choose_encoding("list_posts", "gzip", "application/json", 20)
+    assert not compressor.choose_encoding("get_post", "gzip", "application/json", 20)
+    assert not compressor.choose_encoding(
+        "health_check", "gzip", "application/json", 10**6
+    )
+    assert not compressor.choose_encoding("list_posts", "gzip", "image/png", 10**6)
+
+
+def test_large_list_is_gzipped(app, stub, headers):
+    stub.ListPosts.return_value = post_service_pb2.ListPostsResponse(
+        posts=[make_post(post_id) for post_id in range(1, 11)], total_count=10
+    )
+    client = app.test_client()
+
+    response = client.get("/api/posts", headers={**headers, "Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    body = json.loads(gzip.decompress(response.data))
+    assert len(body["posts"]) == 10
+    assert int(response.headers["Content-Length"]) == len(response.data)
+
+
+def test_compressed_post_gets_weak_etag_that_still_matches(app, stub, headers):
+    stub.GetPost.return_value = make_post(1)
+    client = app.test_client()
+    headers = {**headers, "Accept-Encoding": "deflate"}
+
+    response = client.get("/api/posts/1", headers=headers)
+    etag = response.headers["ETag"]
+    not_modified = client.get(
+        "/api/posts/1", headers={**headers, "If-None-Match": etag}
+    )
+
+    assert response.headers["Content-Encoding"] == "deflate"
+    assert json.loads(zlib.decompress(response.data))["id"] == 1
+    assert etag.startswith('W/"')
+    assert not_modified.status_code == 304
+
+
+def test_small_or_unaccepted_responses_are_not_compressed(app):
+    client = app.test_client()
+
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in small.headers
+    assert small.get_json()["status"] == "healthy"
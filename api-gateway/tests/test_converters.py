@@ -0,0 +1,89 @@
+import datetime
+
+import pytest
+from google.protobuf.json_format import MessageToDict
+
+import post_service_pb2
+from utils.utils import (
+    proto_comment_to_dict,
+    proto_comments_to_dicts,
+    proto_post_to_dict,
+    proto_posts_to_dicts,
+)
+
+
+def reference_post_to_dict(post):
+    post_dict = MessageToDict(post, preserving_proto_field_name=True)
+    for field in ["created_at", "updated_at"]:
+        if field in post_dict:
+            dt = datetime.datetime.fromtimestamp(
+                getattr(post, field).seconds + getattr(post, field).nanos / 1e9,
+                tz=datetime.timezone.utc,
+            )
+            post_dict[field] = dt.isoformat()
+    return post_dict
+
+
+def make_post(**kwargs):
+    post = post_service_pb2.Post(**kwargs)
+    post.created_at.FromDatetime(datetime.datetime(2024, 1, 1, 12, 30, 0, 123456))
+    post.updated_at.FromDatetime(datetime.datetime(2024, 1, 2))
+    return post
+
+
+@pytest.mark.parametrize(
+    "post",
+    [
+        make_post(
+            id=1,
+            title="Title",
+            description="Description",
+            creator_id=2,
+            is_private=True,
+            tags=["a", "b"],
+        ),
+        make_post(id=1, title="Title", description="Description", creator_id=2),
+        post_service_pb2.Post(id=3, title="No timestamps"),
+        post_service_pb2.Post(),
+    ],
+)
+def test_post_to_dict_matches_message_to_dict(post):
+    assert proto_post_to_dict(post) == reference_post_to_dict(post)
+    assert list(proto_post_to_dict(post)) == list(reference_post_to_dict(post))
+
+
+def test_post_to_dict_omits_counters():
+    post = make_post(id=1, views_count=10, likes_count=2, comments_count=3)
+
+    assert "views_count" not in proto_post_to_dict(post)
+    assert proto_post_to_dict(post) == proto_post_to_dict(make_post(id=1))
+
+
+def test_posts_to_dicts_converts_list_response():
+    response = post_service_pb2.ListPostsResponse(
+        posts=[make_post(id=1), make_post(id=2, tags=["x"])]
+    )
+
+    assert proto_posts_to_dicts(response.posts) == [
+        reference_post_to_dict(post) for post in response.posts
+    ]
+
+
+def test_comment_to_dict_keeps_all_fields():
+    response = post_service_pb2.GetCommentsResponse(
+        comments=[post_service_pb2.Comment(id=1, post_id=2, user_id=0, text="Hi")]
+    )
+    response.comments[0].created_at.FromDatetime(datetime.datetime(2024, 1, 1))
+
+    assert proto_comments_to_dicts(response.comments) == [
+        {
+            "id": 1,
+            "post_id": 2,
+            "user_id": 0,
+            "text": "Hi",
+            "created_at": "2024-01-01T00:00:00+00:00",
+        }
+    ]
+    assert proto_comment_to_dict(post_service_pb2.Comment())["created_at"] == (
+        "1970-01-01T00:00:00+00:00"
+    )
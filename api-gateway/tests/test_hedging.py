@@ -0,0 +1,163 @@
+import asyncio
+import threading
+from concurrent import futures
+
+import grpc
+import pytest
+
+import post_service_pb2
+import post_service_pb2_grpc
+from utils.balancing import LoadBalancer, Replica
+from utils.channels import ChannelPool
+from utils.hedging import AsyncHedgedStub, HedgingPolicy, LatencyTracker
+from utils.resilience import CircuitBreaker, RetryBudget, RpcPolicy
+
+
+def test_latency_tracker_reports_percentile_after_enough_samples():
+    tracker = LatencyTracker(percentile=90, window=100, min_samples=10)
+    for i in range(9):
+        tracker.observe(i / 100)
+    assert tracker.value() is None
+
+    tracker.observe(0.09)
+    assert tracker.value() == 0.09
+
+    for _ in range(90):
+        tracker.observe(0.01)
+    # В окне 100 замеров, из них 91 по 10 мс
+    assert tracker.value() == 0.01
+
+
+def test_hedging_policy_respects_budget():
+    policy = HedgingPolicy({"GetPost"}, budget_ratio=0.1)
+    for _ in range(20):
+        policy.budget.record_request()
+
+    assert [policy.try_hedge("GetPost") for _ in range(3)] == [True, True, False]
+    assert policy.stats()["hedged"] == {"GetPost": 2}
+    assert policy.stats()["budget_exhausted"] == 1
+
+
+def test_retry_budget_without_reserve_depends_on_ratio_only():
+    budget = RetryBudget(ratio=0.5, min_per_second=0)
+    assert not budget.try_spend()
+
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+
+def test_breaker_ignores_cancelled_calls():
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record(grpc.StatusCode.CANCELLED)
+
+    assert breaker.stats()["state"] == "closed"
+
+
+class SlowPostService(post_service_pb2_grpc.PostServiceServicer):
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = threading.Event()
+
+    def GetPost(self, request, context):
+        self.calls += 1
+        context.add_callback(self.cancelled.set)
+        if self.delay and not self.cancelled.wait(self.delay):
+            self.cancelled.clear()
+        return post_service_pb2.Post(id=request.post_id, title=f"delay {self.delay}")
+
+
+@pytest.fixture
+def slow_and_fast_servers():
+    servicers = [SlowPostService(delay=5), SlowPostService(delay=0)]
+    servers, targets = [], []
+    for servicer in servicers:
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        post_service_pb2_grpc.add_PostServiceServicer_to_server(servicer, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        servers.append(server)
+        targets.append(f"127.0.0.1:{port}")
+    yield servicers, ",".join(targets)
+    for server in servers:
+        server.stop(None)
+
+
+def test_slow_read_is_hedged_to_another_replica(slow_and_fast_servers):
+    (slow, fast), target = slow_and_fast_servers
+    policy = HedgingPolicy({"GetPost"}, initial_delay=0.05, budget_ratio=1)
+    pool = ChannelPool(target, size=1, policy=RpcPolicy(backoff=0), hedging=policy)
+    slow_replica = pool.balancer.replicas[0]
+    # Первая попытка уходит в медленную реплику
+    pool.balancer.replicas[1].started()
+
+    try:
+        post = pool.get_stub().GetPost(post_service_pb2.GetPostRequest(post_id=3))
+        assert post.title == "delay 0"
+        # Проигравший вызов отменен, сервер узнает об этом
+        assert slow.cancelled.wait(2)
+    finally:
+        pool.balancer.replicas[1].finished(grpc.StatusCode.OK)
+        pool.close()
+
+    assert (slow.calls, fast.calls) == (1, 1)
+    assert policy.stats()["hedged"] == {"GetPost": 1}
+    assert policy.stats()["hedge_wins"] == {"GetPost": 1}
+    assert slow_replica.failures == 0
+    assert pool.policy.stats()["circuit"]["state"] == "closed"
+
+
+def test_fast_read_is_not_hedged(slow_and_fast_servers):
+    (slow, fast), target = slow_and_fast_servers
+    policy = HedgingPolicy({"GetPost"}, initial_delay=1, budget_ratio=1)
+    pool = ChannelPool(target, size=1, hedging=policy)
+    pool.balancer.replicas[0].started()
+
+    try:
+        post = pool.get_stub().GetPost(post_service_pb2.GetPostRequest(post_id=3))
+    finally:
+        pool.balancer.replicas[0].finished(grpc.StatusCode.OK)
+        pool.close()
+
+    assert post.title == "delay 0"
+    assert (slow.calls, fast.calls) == (0, 1)
+    assert policy.stats()["hedged"] == {}
+
+
+class FakeStub:
+    def __init__(self, delay, result):
+        self.delay = delay
+        self.result = result
+        self.cancelled = False
+
+    async def GetPost(self, request):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.result
+
+
+def async_balancer(*stubs):
+    balancer = LoadBalancer()
+    for i, stub in enumerate(stubs):
+        replica = Replica(f"replica-{i}")
+        replica.stubs = [stub]
+        balancer.replicas.append(replica)
+    return balancer
+
+
+def test_async_hedged_stub_takes_first_answer_and_cancels_other():
+    slow, fast = FakeStub(5, "slow"), FakeStub(0, "fast")
+    policy = HedgingPolicy({"GetPost"}, initial_delay=0.01, budget_ratio=1)
+    stub = AsyncHedgedStub(async_balancer(slow, fast), policy)
+
+    async def call():
+        return await stub.GetPost(None)
+
+    assert asyncio.run(call()) == "fast"
+    assert slow.cancelled
+    assert policy.stats()["hedge_wins"] == {"GetPost": 1}
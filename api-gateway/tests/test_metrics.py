@@ -0,0 +1,173 @@
+import asyncio
+from concurrent import futures
+from types import SimpleNamespace
+
+import grpc
+import pytest
+import requests
+
+import post_service_pb2
+import post_service_pb2_grpc
+from tests.test_resilience import FlakyPostService, call_details
+from utils.channels import ChannelPool
+from utils.metrics import AsyncMetricsInterceptor, GatewayMetrics, MetricsInterceptor
+from utils.resilience import RpcPolicy
+
+
+@pytest.fixture
+def metrics(gateway_mode, request):
+    if gateway_mode == "asgi":
+        return request.getfixturevalue("asgi_app").state.metrics
+    return request.getfixturevalue("app").extensions["metrics"]
+
+
+def sample(metrics, name, **labels):
+    return metrics.registry.get_sample_value(name, labels) or 0
+
+
+def test_requests_and_user_service_calls_are_recorded(client, mock_requests, metrics):
+    client.post("/api/users/login", json={"username": "user"})
+    client.post("/api/users/login", json={"username": "user"})
+
+    labels = {"handler": "login", "method": "POST"}
+    assert sample(metrics, "gateway_requests_total", status="200", **labels) == 2
+    assert sample(metrics, "gateway_request_duration_seconds_count", **labels) == 2
+    assert sample(metrics, "gateway_requests_in_flight") == 0
+    assert (
+        sample(
+            metrics,
+            "gateway_upstream_requests_total",
+            upstream="user_service",
+            operation="POST /api/users/login",
+            status="200",
+        )
+        == 2
+    )
+
+
+def test_upstream_failures_count_as_errors(
+    client, mock_requests, metrics, gateway_mode
+):
+    if gateway_mode == "asgi":
+        import httpx
+
+        mock_requests.get.side_effect = httpx.ConnectTimeout("timed out")
+    else:
+        mock_requests.get.side_effect = requests.Timeout("timed out")
+
+    response = client.get("/api/users/profile")
+
+    assert response.status_code == 504
+    assert (
+        sample(
+            metrics,
+            "gateway_request_errors_total",
+            handler="get_profile",
+            method="GET",
+        )
+        == 1
+    )
+    assert (
+        sample(
+            metrics,
+            "gateway_upstream_requests_total",
+            upstream="user_service",
+            operation="GET /api/users/profile",
+            status="timeout",
+        )
+        == 1
+    )
+
+
+def test_unmatched_requests_share_one_handler_label(client, metrics):
+    client.get("/api/nowhere")
+    client.get("/api/elsewhere")
+
+    assert (
+        sample(
+            metrics,
+            "gateway_requests_total",
+            handler="unmatched",
+            method="GET",
+            status="404",
+        )
+        == 2
+    )
+
+
+def test_metrics_endpoint_exports_prometheus_text(client):
+    client.get("/health")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    body = response.data.decode()
+    assert 'gateway_request_duration_seconds_bucket{handler="health_check"' in body
+    assert 'gateway_post_service_circuit_state{state="closed"} 1.0' in body
+    assert "gateway_admission_admitted_total" in body
+    assert "gateway_jwt_cache_hits_total" in body
+
+
+@pytest.fixture
+def flaky_server():
+    servicer = FlakyPostService(failures=1)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    post_service_pb2_grpc.add_PostServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    yield f"127.0.0.1:{port}"
+    server.stop(None)
+
+
+def test_interceptor_records_every_rpc_attempt(flaky_server):
+    metrics = GatewayMetrics()
+    pool = ChannelPool(
+        flaky_server,
+        size=1,
+        policy=RpcPolicy(backoff=0),
+        interceptors=[MetricsInterceptor(metrics)],
+    )
+
+    try:
+        pool.get_stub().GetPost(post_service_pb2.GetPostRequest(post_id=7))
+    finally:
+        pool.close()
+
+    labels = {"upstream": "post_service", "operation": "GetPost"}
+    assert (
+        sample(metrics, "gateway_upstream_requests_total", status="OK", **labels) == 1
+    )
+    assert (
+        sample(
+            metrics, "gateway_upstream_requests_total", status="UNAVAILABLE", **labels
+        )
+        == 1
+    )
+    assert sample(metrics, "gateway_upstream_duration_seconds_count", **labels) == 2
+    assert sample(metrics, "gateway_upstream_in_flight", upstream="post_service") == 0
+
+
+def test_async_interceptor_records_status_of_awaited_call():
+    metrics = GatewayMetrics()
+
+    async def continuation(details, request):
+        async def get_code():
+            return grpc.StatusCode.NOT_FOUND
+
+        return SimpleNamespace(code=get_code)
+
+    interceptor = AsyncMetricsInterceptor(metrics)
+    asyncio.run(
+        interceptor.intercept_unary_unary(continuation, call_details("GetPost"), None)
+    )
+
+    assert (
+        sample(
+            metrics,
+            "gateway_upstream_requests_total",
+            upstream="post_service",
+            operation="GetPost",
+            status="NOT_FOUND",
+        )
+        == 1
+    )
@@ -0,0 +1,631 @@
+import datetime
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import grpc
+import pytest
+from flask_jwt_extended import create_access_token, verify_jwt_in_request
+
+import post_service_pb2
+from tests.test_asgi import FakeRpcError, private_post_comments
+from utils.cache import TTLCache, VerifiedTokenCache
+from utils.single_flight import SingleFlight, get_post_coalesced
+from utils.utils import etag_matches
+
+
+@pytest.fixture
+def auth_headers(app):
+    def make(user_id=1):
+        with app.app_context():
+            token = create_access_token(identity=user_id)
+        return {"Authorization": f"Bearer {token}"}
+
+    return make
+
+
+@pytest.fixture
+def mock_stub():
+    stub = MagicMock()
+    with patch("app.get_post_service_stub", return_value=stub):
+        yield stub
+
+
+def make_post(post_id=1, creator_id=1, is_private=False):
+    post = post_service_pb2.Post(
+        id=post_id,
+        title="Test post",
+        description="Test post description",
+        creator_id=creator_id,
+        is_private=is_private,
+        tags=["news"],
+    )
+    post.created_at.FromDatetime(datetime.datetime(2024, 1, 1))
+    post.updated_at.FromDatetime(datetime.datetime(2024, 1, 2))
+    return post
+
+
+def test_get_post_is_served_from_cache(app, mock_stub, auth_headers):
+    mock_stub.GetPost.return_value = make_post()
+    client = app.test_client()
+
+    first = client.get("/api/posts/1", headers=auth_headers(2))
+    second = client.get("/api/posts/1", headers=auth_headers(3))
+
+    assert first.get_json() == second.get_json()
+    mock_stub.GetPost.assert_called_once()
+    assert app.extensions["post_cache"].stats()["hits"]["get_post"] == 1
+
+
+def test_private_post_is_cached_only_for_creator(app, mock_stub, auth_headers):
+    mock_stub.GetPost.return_value = make_post(creator_id=1, is_private=True)
+    client = app.test_client()
+
+    client.get("/api/posts/1", headers=auth_headers(1))
+    client.get("/api/posts/1", headers=auth_headers(2))
+
+    assert mock_stub.GetPost.call_count == 2
+    assert mock_stub.GetPost.call_args[0][0].requester_id == 2
+
+
+def test_update_post_invalidates_cached_post(app, mock_stub, auth_headers):
+    mock_stub.GetPost.return_value = make_post()
+    mock_stub.UpdatePost.return_value = make_post()
+    client = app.test_client()
+
+    client.get("/api/posts/1", headers=auth_headers(1))
+    client.put("/api/posts/1", json={"title": "New title"}, headers=auth_headers(1))
+    client.get("/api/posts/1", headers=auth_headers(1))
+
+    assert mock_stub.GetPost.call_count == 2
+
+
+def test_list_posts_cache_key_ignores_tag_order(app, mock_stub, auth_headers):
+    mock_stub.ListPosts.return_value = post_service_pb2.ListPostsResponse(
+        posts=[make_post()], total_count=1, total_pages=1
+    )
+    client = app.test_client()
+
+    client.get("/api/posts?tags=a1&tags=b2", headers=auth_headers(1))
+    client.get("/api/posts?tags=b2&tags=a1", headers=auth_headers(1))
+    client.get("/api/posts?tags=b2&tags=a1", headers=auth_headers(2))
+
+    assert mock_stub.ListPosts.call_count == 2
+
+
+def test_list_posts_cursor_mode(app, mock_stub, auth_headers):
+    mock_stub.ListPosts.return_value = post_service_pb2.ListPostsResponse(
+        posts=[make_post()], total_count=3, total_pages=3, next_cursor="next"
+    )
+    client = app.test_client()
+
+    first = client.get("/api/posts?per_page=1", headers=auth_headers(1))
+    second = client.get(
+        f"/api/posts?per_page=1&cursor={first.get_json()['next_cursor']}",
+        headers=auth_headers(1),
+    )
+
+    assert first.get_json()["page"] == 1
+    assert "page" not in second.get_json()
+    assert mock_stub.ListPosts.call_args[0][0].cursor == "next"
+    # Страницы по курсору кешируются отдельно от обычных
+    assert mock_stub.ListPosts.call_count == 2
+
+
+def test_list_posts_without_count(app, mock_stub, auth_headers):
+    mock_stub.ListPosts.return_value = post_service_pb2.ListPostsResponse(
+        posts=[make_post()], has_more=True
+    )
+    client = app.test_client()
+
+    response = client.get("/api/posts?count=none", headers=auth_headers(1))
+
+    data = response.get_json()
+    assert (data["total_count"], data["total_pages"], data["has_more"]) == (
+        None,
+        None,
+        True,
+    )
+    assert mock_stub.ListPosts.call_args[0][0].count_mode == (
+        post_service_pb2.COUNT_NONE
+    )
+
+
+def test_default_count_mode_comes_from_config(app, mock_stub, auth_headers):
+    app.config["POST_SERVICE_COUNT_MODE"] = "cached"
+    mock_stub.GetComments.return_value = post_service_pb2.GetCommentsResponse()
+    client = app.test_client()
+
+    client.get("/api/posts/1/comments", headers=auth_headers(1))
+    invalid = client.get("/api/posts/1/comments?count=all", headers=auth_headers(1))
+
+    assert mock_stub.GetComments.call_args[0][0].count_mode == (
+        post_service_pb2.COUNT_CACHED
+    )
+    assert invalid.status_code == 400
+
+
+def test_list_posts_rejects_invalid_cursor(app, mock_stub, auth_headers):
+    mock_stub.ListPosts.side_effect = FakeRpcError(
+        grpc.StatusCode.INVALID_ARGUMENT, "Invalid cursor"
+    )
+    client = app.test_client()
+
+    response = client.get("/api/posts?cursor=broken", headers=auth_headers(1))
+
+    assert response.status_code == 400
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    now = [0.0]
+    cache = TTLCache(max_size=2, ttl=10, clock=lambda: now[0])
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.evictions == 1
+
+
+def test_verified_token_is_not_decoded_again(app, mock_stub, auth_headers):
+    mock_stub.GetPost.return_value = make_post()
+    client = app.test_client()
+    headers = auth_headers(1)
+
+    with patch(
+        "utils.utils.verify_jwt_in_request", wraps=verify_jwt_in_request
+    ) as verify:
+        client.get("/api/posts/1", headers=headers)
+        response = client.get("/api/posts/1", headers=headers)
+
+    assert response.status_code == 200
+    verify.assert_called_once()
+    assert app.extensions["jwt_token_cache"].stats()["hit_rate"] == 0.5
+
+
+def test_invalid_token_is_rejected_and_not_cached(app, mock_stub):
+    client = app.test_client()
+
+    response = client.get("/api/posts/1", headers={"Authorization": "Bearer bad"})
+
+    assert response.status_code == 401
+    assert app.extensions["jwt_token_cache"].stats()["size"] == 0
+
+
+def test_verified_token_cache_entry_expires_with_token():
+    now = [1000.0]
+    cache = VerifiedTokenCache(max_ttl=300, clock=lambda: now[0])
+
+    cache.set("token", {}, {"sub": 1, "exp": 1010})
+    assert cache.get("token") == ({}, {"sub": 1, "exp": 1010})
+
+    now[0] = 1010
+    assert cache.get("token") is None
+
+
+def run_concurrently(calls, started, release):
+    results = [None] * len(calls)
+
+    def run(index, call):
+        results[index] = call()
+
+    threads = [threading.Thread(target=run, args=item) for item in enumerate(calls)]
+    threads[0].start()
+    started.wait(timeout=1)
+    for thread in threads[1:]:
+        thread.start()
+    # Даем ведомым потокам встать в ожидание вызова лидера
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=1)
+    return results
+
+
+def blocking_get_post(post, started, release):
+    def get_post(request):
+        started.set()
+        release.wait(timeout=1)
+        return post
+
+    return get_post
+
+
+def test_concurrent_get_post_is_coalesced():
+    started, release = threading.Event(), threading.Event()
+    stub = MagicMock()
+    stub.GetPost.side_effect = blocking_get_post(make_post(), started, release)
+    flights = SingleFlight()
+
+    results = run_concurrently(
+        [
+            lambda user_id=user_id: get_post_coalesced(flights, stub, 1, user_id)
+            for user_id in range(1, 6)
+        ],
+        started,
+        release,
+    )
+
+    assert stub.GetPost.call_count == 1
+    assert all(result.id == 1 for result in results)
+    assert flights.shared == 4
+
+
+def test_coalesced_private_post_is_refetched_for_other_requesters():
+    started, release = threading.Event(), threading.Event()
+    stub = MagicMock()
+    stub.GetPost.side_effect = blocking_get_post(
+        make_post(creator_id=1, is_private=True), started, release
+    )
+    flights = SingleFlight()
+
+    run_concurrently(
+        [
+            lambda: get_post_coalesced(flights, stub, 1, 1),
+            lambda: get_post_coalesced(flights, stub, 1, 2),
+        ],
+        started,
+        release,
+    )
+
+    assert stub.GetPost.call_count == 2
+    assert stub.GetPost.call_args[0][0].requester_id == 2
+
+
+def test_batch_get_posts_reports_per_item_status(app, mock_stub, auth_headers):
+    Result = post_service_pb2.BatchGetPostsResult
+    mock_stub.BatchGetPosts.return_value = post_service_pb2.BatchGetPostsResponse(
+        results=[
+            Result(post_id=1, status=Result.OK, post=make_post(post_id=1)),
+            Result(post_id=2, status=Result.NOT_FOUND),
+            Result(post_id=3, status=Result.PERMISSION_DENIED),
+        ]
+    )
+    client = app.test_client()
+
+    response = client.get("/api/posts/batch?ids=1,2&ids=3,1", headers=auth_headers(2))
+
+    assert response.status_code == 200
+    posts = response.get_json()["posts"]
+    assert [(post["id"], post["status"]) for post in posts] == [
+        (1, "ok"),
+        (2, "not_found"),
+        (3, "forbidden"),
+    ]
+    assert posts[0]["post"]["title"] == "Test post"
+    assert list(mock_stub.BatchGetPosts.call_args[0][0].post_ids) == [1, 2, 3]
+
+
+def test_batch_get_posts_fetches_only_uncached_posts(app, mock_stub, auth_headers):
+    Result = post_service_pb2.BatchGetPostsResult
+    mock_stub.GetPost.return_value = make_post(post_id=1)
+    mock_stub.BatchGetPosts.return_value = post_service_pb2.BatchGetPostsResponse(
+        results=[Result(post_id=2, status=Result.OK, post=make_post(post_id=2))]
+    )
+    client = app.test_client()
+
+    client.get("/api/posts/1", headers=auth_headers(1))
+    response = client.get("/api/posts/batch?ids=1,2", headers=auth_headers(1))
+
+    assert [post["status"] for post in response.get_json()["posts"]] == ["ok", "ok"]
+    assert list(mock_stub.BatchGetPosts.call_args[0][0].post_ids) == [2]
+
+
+def test_batch_get_posts_validates_ids(app, mock_stub, auth_headers):
+    client = app.test_client()
+
+    assert client.get("/api/posts/batch", headers=auth_headers(1)).status_code == 400
+    assert (
+        client.get("/api/posts/batch?ids=1,abc", headers=auth_headers(1)).status_code
+        == 400
+    )
+    mock_stub.BatchGetPosts.assert_not_called()
+
+
+class FakeStream:
+    """Ответ server-streaming вызова: итератор постов с cancel()"""
+
+    def __init__(self, posts, error=None):
+        self._posts = iter(posts)
+        self._error = error
+        self.cancelled = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._posts)
+        except StopIteration:
+            if self._error is not None:
+                raise self._error
+            raise
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class StreamError(grpc.RpcError):
+    def code(self):
+        return grpc.StatusCode.INTERNAL
+
+    def details(self):
+        return "Database error"
+
+
+def test_stream_posts_returns_ndjson(app, mock_stub, auth_headers):
+    stream = FakeStream([make_post(post_id) for post_id in (3, 2, 1)])
+    mock_stub.StreamPosts.return_value = stream
+    client = app.test_client()
+
+    response = client.get(
+        "/api/posts/stream?limit=3&tags=news", headers=auth_headers(1)
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [3, 2, 1]
+    assert stream.cancelled
+
+    grpc_request = mock_stub.StreamPosts.call_args[0][0]
+    assert grpc_request.limit == 3
+    assert list(grpc_request.tags) == ["news"]
+    assert grpc_request.requester_id == 1
+
+
+def test_stream_posts_reports_mid_stream_error_as_last_line(
+    app, mock_stub, auth_headers
+):
+    mock_stub.StreamPosts.return_value = FakeStream([make_post()], StreamError())
+    client = app.test_client()
+
+    response = client.get("/api/posts/stream", headers=auth_headers(1))
+
+    lines = response.get_data(as_text=True).splitlines()
+    assert response.status_code == 200
+    assert json.loads(lines[-1]) == {"error": "Database error"}
+
+
+def test_stream_posts_holds_admission_slot_until_body_is_sent(
+    app, mock_stub, auth_headers
+):
+    mock_stub.StreamPosts.return_value = FakeStream([make_post(1), make_post(2)])
+    admission = app.extensions["admission"]
+
+    def in_flight():
+        return admission.stats()["backends"]["post_service"]["in_flight"]
+
+    response = app.test_client().get(
+        "/api/posts/stream", headers=auth_headers(1), buffered=False
+    )
+    assert in_flight() == 1
+
+    lines = response.get_data(as_text=True).splitlines()
+    response.close()
+
+    assert len(lines) == 2
+    assert in_flight() == 0
+
+
+def test_stream_posts_request_is_measured_until_body_is_sent(
+    app, mock_stub, auth_headers
+):
+    mock_stub.StreamPosts.return_value = FakeStream([make_post(1)])
+    registry = app.extensions["metrics"].registry
+
+    def sample(name, **labels):
+        return registry.get_sample_value(name, labels) or 0
+
+    response = app.test_client().get(
+        "/api/posts/stream", headers=auth_headers(1), buffered=False
+    )
+    labels = {"handler": "stream_posts", "method": "GET"}
+    assert sample("gateway_requests_in_flight") == 1
+    assert sample("gateway_request_duration_seconds_count", **labels) == 0
+
+    response.get_data()
+    response.close()
+
+    assert sample("gateway_requests_in_flight") == 0
+    assert sample("gateway_requests_total", status="200", **labels) == 1
+
+
+def test_stream_posts_validates_limit(app, mock_stub, auth_headers):
+    client = app.test_client()
+
+    response = client.get("/api/posts/stream?limit=-1", headers=auth_headers(1))
+
+    assert response.status_code == 400
+    mock_stub.StreamPosts.assert_not_called()
+
+
+def make_version(post):
+    version = post_service_pb2.PostVersion(post_id=post.id)
+    version.updated_at.CopyFrom(post.updated_at)
+    return version
+
+
+def test_get_post_returns_etag_and_304_from_cache(app, mock_stub, auth_headers):
+    mock_stub.GetPost.return_value = make_post()
+    client = app.test_client()
+
+    first = client.get("/api/posts/1", headers=auth_headers(1))
+    etag = first.headers["ETag"]
+    second = client.get(
+        "/api/posts/1", headers={**auth_headers(1), "If-None-Match": etag}
+    )
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.data == b""
+    assert second.headers["ETag"] == etag
+    mock_stub.GetPostVersion.assert_not_called()
+
+
+def test_get_post_validates_etag_with_version_rpc(app, mock_stub, auth_headers):
+    post = make_post()
+    mock_stub.GetPost.return_value = post
+    mock_stub.GetPostVersion.return_value = make_version(post)
+    client = app.test_client()
+    etag = client.get("/api/posts/1", headers=auth_headers(1)).headers["ETag"]
+    app.extensions["post_cache"].invalidate_post(1)
+    mock_stub.GetPost.reset_mock()
+
+    response = client.get(
+        "/api/posts/1", headers={**auth_headers(1), "If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+    mock_stub.GetPostVersion.assert_called_once()
+    mock_stub.GetPost.assert_not_called()
+
+
+def test_get_post_with_stale_etag_returns_new_body(app, mock_stub, auth_headers):
+    post = make_post()
+    mock_stub.GetPost.return_value = post
+    mock_stub.GetPostVersion.return_value = make_version(post)
+    client = app.test_client()
+
+    response = client.get(
+        "/api/posts/1", headers={**auth_headers(1), "If-None-Match": '"stale"'}
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["id"] == 1
+    assert response.headers["ETag"] != '"stale"'
+
+
+def test_comments_page_etag(app, mock_stub, auth_headers):
+    comments = post_service_pb2.GetCommentsResponse(total_count=1, total_pages=1)
+    comment = comments.comments.add(id=5, post_id=1, user_id=2, text="Nice")
+    comment.created_at.FromDatetime(datetime.datetime(2024, 1, 3))
+    mock_stub.GetComments.return_value = comments
+    client = app.test_client()
+
+    headers = auth_headers(1)
+
+    etag = client.get("/api/posts/1/comments", headers=headers).headers["ETag"]
+    headers["If-None-Match"] = etag
+    cached = client.get("/api/posts/1/comments", headers=headers)
+    comments.comments.add(id=6, post_id=1, user_id=3, text="Thanks")
+    changed = client.get("/api/posts/1/comments", headers=headers)
+
+    assert cached.status_code == 304
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_private_post_comments_are_visible_to_creator(app, mock_stub, auth_headers):
+    mock_stub.GetComments.side_effect = private_post_comments(1)
+    client = app.test_client()
+
+    response = client.get("/api/posts/1/comments", headers=auth_headers(1))
+
+    assert response.status_code == 200
+    assert response.headers["ETag"]
+    assert response.get_json()["comments"][0]["text"] == "Nice"
+
+
+def test_etag_matches_lists_weak_tags_and_wildcard():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_full_post_calls_post_service_concurrently(app, mock_stub, auth_headers):
+    # Все три вызова ждут друг друга: последовательно они бы не завершились
+    barrier = threading.Barrier(3, timeout=2)
+
+    def answer(response):
+        def call(request):
+            barrier.wait()
+            return response
+
+        return call
+
+    comments = post_service_pb2.GetCommentsResponse(total_count=1, total_pages=1)
+    comments.comments.add(id=5, post_id=1, user_id=2, text="Nice")
+    mock_stub.GetPost.side_effect = answer(make_post())
+    mock_stub.GetComments.side_effect = answer(comments)
+    mock_stub.GetPostCounts.side_effect = answer(
+        post_service_pb2.PostCounts(
+            post_id=1, likes_count=3, views_count=7, comments_count=1
+        )
+    )
+    client = app.test_client()
+
+    response = client.get("/api/posts/1/full?per_page=5", headers=auth_headers(2))
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["post"]["title"] == "Test post"
+    assert data["comments"]["comments"][0]["text"] == "Nice"
+    assert data["comments"]["per_page"] == 5
+    assert (data["likes_count"], data["views_count"], data["comments_count"]) == (
+        3,
+        7,
+        1,
+    )
+    assert mock_stub.GetComments.call_args[0][0].requester_id == 2
+    # Число комментариев берется из GetPostCounts, отдельно не считается
+    assert mock_stub.GetComments.call_args[0][0].count_mode == (
+        post_service_pb2.COUNT_NONE
+    )
+    assert data["comments"]["total_count"] == 1
+    assert data["comments"]["total_pages"] == 1
+
+
+def test_full_post_maps_errors_of_any_call(app, mock_stub, auth_headers):
+    mock_stub.GetPost.return_value = make_post()
+    mock_stub.GetComments.return_value = post_service_pb2.GetCommentsResponse()
+    mock_stub.GetPostCounts.side_effect = FakeRpcError(
+        grpc.StatusCode.PERMISSION_DENIED
+    )
+    client = app.test_client()
+
+    response = client.get("/api/posts/1/full", headers=auth_headers(2))
+
+    assert response.status_code == 403
+
+
+def test_record_views_returns_status_per_post(app, mock_stub, auth_headers):
+    Result = post_service_pb2.RecordViewsResult
+    response = post_service_pb2.RecordViewsResponse()
+    response.results.add(post_id=3, status=Result.OK, views_count=4, recorded=True)
+    response.results.add(post_id=9, status=Result.NOT_FOUND)
+    mock_stub.RecordViews.return_value = response
+    client = app.test_client()
+
+    result = client.post(
+        "/api/posts/views", json={"post_ids": [3, 9]}, headers=auth_headers(2)
+    )
+
+    assert result.status_code == 200
+    assert result.get_json() == {
+        "views": [
+            {"id": 3, "status": "ok", "views_count": 4, "recorded": True},
+            {"id": 9, "status": "not_found"},
+        ]
+    }
+    grpc_request = mock_stub.RecordViews.call_args[0][0]
+    assert list(grpc_request.post_ids) == [3, 9]
+    assert grpc_request.viewer_id == 2
+
+
+@pytest.mark.parametrize("body", [{}, {"post_ids": []}, {"post_ids": ["x"]}])
+def test_record_views_validates_post_ids(app, mock_stub, auth_headers, body):
+    client = app.test_client()
+
+    result = client.post("/api/posts/views", json=body, headers=auth_headers(2))
+
+    assert result.status_code == 400
+    mock_stub.RecordViews.assert_not_called()
@@ -1,13 +1,17 @@
 import json
 
+import pytest
+
 
 def test_register_proxy(client, mock_requests):
-    mock_requests.post.return_value.json.return_value = {
-        "message": "User registered successfully",
-        "user_id": 1,
-        "username": "testuser",
-        "access_token": "mock_token",
-    }
+    mock_requests.post.return_value.content = json.dumps(
+        {
+            "message": "User registered successfully",
+            "user_id": 1,
+            "username": "testuser",
+            "access_token": "mock_token",
+        }
+    ).encode()
     mock_requests.post.return_value.status_code = 201
 
     response = client.post(
@@ -29,12 +33,14 @@ def test_register_proxy(client, mock_requests):
 
 
 def test_login_proxy(client, mock_requests):
-    mock_requests.post.return_value.json.return_value = {
-        "message": "Login successful",
-        "user_id": 1,
-        "username": "testuser",
-        "access_token": "mock_token",
-    }
+    mock_requests.post.return_value.content = json.dumps(
+        {
+            "message": "Login successful",
+            "user_id": 1,
+            "username": "testuser",
+            "access_token": "mock_token",
+        }
+    ).encode()
     mock_requests.post.return_value.status_code = 200
 
     response = client.post(
@@ -49,13 +55,15 @@ def test_login_proxy(client, mock_requests):
 
 
 def test_get_profile_proxy(client, mock_requests):
-    mock_requests.get.return_value.json.return_value = {
-        "id": 1,
-        "username": "testuser",
-        "email": "test@example.com",
-        "first_name": "John",
-        "last_name": "Doe",
-    }
+    mock_requests.get.return_value.content = json.dumps(
+        {
+            "id": 1,
+            "username": "testuser",
+            "email": "test@example.com",
+            "first_name": "John",
+            "last_name": "Doe",
+        }
+    ).encode()
     mock_requests.get.return_value.status_code = 200
 
     response = client.get(
@@ -70,9 +78,9 @@ def test_get_profile_proxy(client, mock_requests):
 
 
 def test_update_profile_proxy(client, mock_requests):
-    mock_requests.put.return_value.json.return_value = {
-        "message": "Profile updated successfully"
-    }
+    mock_requests.put.return_value.content = json.dumps(
+        {"message": "Profile updated successfully"}
+    ).encode()
     mock_requests.put.return_value.status_code = 200
 
     response = client.put(
@@ -88,7 +96,7 @@ def test_update_profile_proxy(client, mock_requests):
 
 
 def test_forward_headers(client, mock_requests):
-    mock_requests.get.return_value.json.return_value = {"message": "Success"}
+    mock_requests.get.return_value.content = b'{"message": "Success"}'
     mock_requests.get.return_value.status_code = 200
 
     client.get(
@@ -102,3 +110,42 @@ def test_forward_headers(client, mock_requests):
     assert headers["Authorization"] == "Bearer mock_token"
     assert "Custom-Header" in headers
     assert headers["Custom-Header"] == "Custom-Value"
+
+
+@pytest.mark.parametrize("gateway_mode", ["wsgi"])
+def test_proxy_passes_body_through_and_drops_hop_by_hop_headers(client, mock_requests):
+    mock_requests.post.return_value.content = b'{"message": "Raw body"}'
+    mock_requests.post.return_value.status_code = 200
+
+    response = client.post(
+        "/api/users/login",
+        data=b'{"username": "testuser"}',
+        headers={"Content-Type": "application/json", "Connection": "close"},
+    )
+
+    assert response.data == b'{"message": "Raw body"}'
+    called_kwargs = mock_requests.post.call_args[1]
+    assert called_kwargs["data"] == b'{"username": "testuser"}'
+    assert "Connection" not in called_kwargs["headers"]
+    assert called_kwargs["timeout"] == (2.0, 10.0)
+
+
+@pytest.mark.parametrize("gateway_mode", ["wsgi"])
+def test_proxy_timeout_returns_504(client, mock_requests):
+    import requests
+
+    mock_requests.get.side_effect = requests.Timeout()
+
+    response = client.get(
+        "/api/users/profile", headers={"Authorization": "Bearer mock_token"}
+    )
+
+    assert response.status_code == 504
+
+
+def test_user_service_session_retries_only_get(app):
+    adapter = app.extensions["user_service_session"].get_adapter("http://user-service")
+
+    assert adapter.max_retries.total == app.config["USER_SERVICE_GET_RETRIES"]
+    assert adapter.max_retries.allowed_methods == frozenset(["GET"])
+    assert adapter._pool_maxsize == app.config["USER_SERVICE_POOL_MAXSIZE"]
@@ -0,0 +1,315 @@
+import asyncio
+from concurrent import futures
+from types import SimpleNamespace
+
+import grpc
+import pytest
+
+import post_service_pb2
+import post_service_pb2_grpc
+from utils.channels import ChannelPool
+from utils.resilience import (
+    AsyncPolicyInterceptor,
+    AsyncPolicyStreamInterceptor,
+    CircuitBreaker,
+    CircuitOpenError,
+    PolicyInterceptor,
+    RetryBudget,
+    RpcPolicy,
+    parse_deadlines,
+)
+
+UNAVAILABLE = grpc.StatusCode.UNAVAILABLE
+OK = grpc.StatusCode.OK
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def call_details(method="GetPost", timeout=None):
+    return SimpleNamespace(
+        method=f"/post_service.PostService/{method}",
+        timeout=timeout,
+        metadata=None,
+        credentials=None,
+        wait_for_ready=None,
+        compression=None,
+    )
+
+
+def fake_continuation(codes):
+    calls = []
+    codes = iter(codes)
+
+    def continuation(details, request):
+        calls.append(details)
+        code = next(codes)
+        return SimpleNamespace(code=lambda: code)
+
+    return continuation, calls
+
+
+def make_interceptor(policy=None):
+    policy = policy or RpcPolicy(backoff=0)
+    return PolicyInterceptor(policy, sleep=lambda _: None)
+
+
+def test_parse_deadlines():
+    assert parse_deadlines("GetPost=1.5, ListPosts=3,") == {
+        "GetPost": 1.5,
+        "ListPosts": 3.0,
+    }
+
+
+def test_policy_deadline_applies_unless_timeout_is_explicit():
+    interceptor = make_interceptor(
+        RpcPolicy(default_deadline=5, deadlines={"GetPost": 1})
+    )
+    continuation, calls = fake_continuation([OK, OK, OK])
+
+    interceptor.intercept_unary_unary(continuation, call_details("GetPost"), None)
+    interceptor.intercept_unary_unary(continuation, call_details("LikePost"), None)
+    interceptor.intercept_unary_unary(
+        continuation, call_details("GetPost", timeout=0.2), None
+    )
+
+    assert [details.timeout for details in calls] == [
+        pytest.approx(1, abs=0.1),
+        pytest.approx(5, abs=0.1),
+        pytest.approx(0.2, abs=0.1),
+    ]
+
+
+def test_idempotent_read_is_retried_on_unavailable():
+    interceptor = make_interceptor()
+    continuation, calls = fake_continuation([UNAVAILABLE, OK])
+
+    outcome = interceptor.intercept_unary_unary(
+        continuation, call_details("ListPosts"), None
+    )
+
+    assert outcome.code() == OK
+    assert len(calls) == 2
+    assert interceptor.policy.retry_budget.retries == 1
+
+
+def test_write_is_not_retried():
+    interceptor = make_interceptor()
+    continuation, calls = fake_continuation([UNAVAILABLE, OK])
+
+    outcome = interceptor.intercept_unary_unary(
+        continuation, call_details("CreatePost"), None
+    )
+
+    assert outcome.code() == UNAVAILABLE
+    assert len(calls) == 1
+
+
+def test_retries_stop_when_budget_is_exhausted():
+    budget = RetryBudget(ratio=0, min_per_second=1, clock=FakeClock())
+    interceptor = make_interceptor(RpcPolicy(backoff=0, retry_budget=budget))
+    continuation, calls = fake_continuation([UNAVAILABLE] * 4)
+
+    interceptor.intercept_unary_unary(continuation, call_details(), None)
+    interceptor.intercept_unary_unary(continuation, call_details(), None)
+
+    assert len(calls) == 3
+    assert budget.retries == 1
+    assert budget.exhausted == 2
+
+
+def test_circuit_breaker_opens_fails_fast_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    interceptor = make_interceptor(RpcPolicy(backoff=0, max_retries=0, breaker=breaker))
+    continuation, calls = fake_continuation([UNAVAILABLE, UNAVAILABLE, OK])
+
+    for _ in range(2):
+        interceptor.intercept_unary_unary(continuation, call_details(), None)
+    with pytest.raises(CircuitOpenError) as error:
+        interceptor.intercept_unary_unary(continuation, call_details(), None)
+
+    assert error.value.code() == UNAVAILABLE
+    assert len(calls) == 2
+    assert breaker.state == "open"
+
+    clock.now = 10
+    interceptor.intercept_unary_unary(continuation, call_details(), None)
+
+    assert breaker.state == "closed"
+    assert breaker.stats()["transitions"] == {
+        "closed->open": 1,
+        "open->half_open": 1,
+        "half_open->closed": 1,
+    }
+
+
+def test_half_open_breaker_lets_a_single_probe_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=1, clock=clock)
+    breaker.record(UNAVAILABLE)
+    clock.now = 1
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(UNAVAILABLE)
+    assert breaker.state == "open"
+
+
+class FakeStreamCall:
+    def __init__(self, code):
+        self._code = code
+        self.callbacks = []
+
+    def code(self):
+        return self._code
+
+    def add_done_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def finish(self):
+        for callback in self.callbacks:
+            callback(self)
+
+
+def test_stream_outcome_is_recorded_and_open_breaker_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=FakeClock())
+    interceptor = make_interceptor(RpcPolicy(breaker=breaker))
+    calls = []
+
+    def continuation(details, request):
+        calls.append(FakeStreamCall(UNAVAILABLE))
+        return calls[-1]
+
+    call = interceptor.intercept_unary_stream(
+        continuation, call_details("StreamPosts"), None
+    )
+    # Исход потока известен только после его завершения
+    assert breaker.state == "closed"
+    call.finish()
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        interceptor.intercept_unary_stream(
+            continuation, call_details("StreamPosts"), None
+        )
+    assert len(calls) == 1
+
+
+def test_async_stream_interceptor_respects_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=FakeClock())
+    interceptor = AsyncPolicyStreamInterceptor(RpcPolicy(breaker=breaker))
+
+    async def run():
+        async def get_code():
+            return UNAVAILABLE
+
+        call = SimpleNamespace(code=get_code, callbacks=[])
+        call.add_done_callback = call.callbacks.append
+
+        async def continuation(details, request):
+            return call
+
+        await interceptor.intercept_unary_stream(
+            continuation, call_details("StreamPosts"), None
+        )
+        for callback in call.callbacks:
+            callback(call)
+        await asyncio.sleep(0)
+
+        with pytest.raises(CircuitOpenError):
+            await interceptor.intercept_unary_stream(
+                continuation, call_details("StreamPosts"), None
+            )
+
+    asyncio.run(run())
+    assert breaker.state == "open"
+
+
+def test_async_interceptor_retries_idempotent_reads():
+    async def sleep(_):
+        pass
+
+    codes = iter([UNAVAILABLE, OK])
+    calls = []
+
+    async def continuation(details, request):
+        calls.append(details)
+        code = next(codes)
+
+        async def get_code():
+            return code
+
+        return SimpleNamespace(code=get_code)
+
+    interceptor = AsyncPolicyInterceptor(RpcPolicy(backoff=0), sleep=sleep)
+    call = asyncio.run(
+        interceptor.intercept_unary_unary(continuation, call_details(), None)
+    )
+
+    assert asyncio.run(call.code()) == OK
+    assert len(calls) == 2
+
+
+class FlakyPostService(post_service_pb2_grpc.PostServiceServicer):
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def GetPost(self, request, context):
+        self.calls += 1
+        if self.calls <= self.failures:
+            context.abort(grpc.StatusCode.UNAVAILABLE, "try again")
+        return post_service_pb2.Post(id=request.post_id)
+
+    def StreamPosts(self, request, context):
+        context.abort(grpc.StatusCode.UNAVAILABLE, "overloaded")
+        yield
+
+
+@pytest.fixture
+def flaky_server():
+    servicer = FlakyPostService(failures=1)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    post_service_pb2_grpc.add_PostServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    yield servicer, f"127.0.0.1:{port}"
+    server.stop(None)
+
+
+def test_channel_pool_stubs_apply_policy(flaky_server):
+    servicer, target = flaky_server
+    pool = ChannelPool(target, size=1, policy=RpcPolicy(backoff=0))
+
+    try:
+        post = pool.get_stub().GetPost(post_service_pb2.GetPostRequest(post_id=7))
+    finally:
+        pool.close()
+
+    assert post.id == 7
+    assert servicer.calls == 2
+    assert pool.policy.stats()["retries"] == 1
+
+
+def test_channel_pool_streams_go_through_breaker(flaky_server):
+    servicer, target = flaky_server
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    pool = ChannelPool(target, size=1, policy=RpcPolicy(breaker=breaker))
+    request = post_service_pb2.StreamPostsRequest()
+
+    try:
+        with pytest.raises(grpc.RpcError):
+            list(pool.get_stub().StreamPosts(request))
+        # Ошибку interceptor grpc отдает при чтении потока
+        with pytest.raises(CircuitOpenError):
+            list(pool.get_stub().StreamPosts(request))
+    finally:
+        pool.close()
+
+    assert breaker.state == "open"
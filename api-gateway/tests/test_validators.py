@@ -0,0 +1,62 @@
+import pytest
+
+from utils.validators import (
+    CreatePostSchema,
+    ListPostsSchema,
+    validate_create_post,
+    validate_list_posts,
+)
+
+VALID_POST = {
+    "title": "Valid title",
+    "description": "Valid description",
+    "is_private": False,
+    "tags": ["python", "grpc-api"],
+}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        VALID_POST,
+        {"title": "Valid title", "description": "Valid description"},
+        {**VALID_POST, "title": "ab"},
+        {**VALID_POST, "description": "short"},
+        {**VALID_POST, "tags": ["ok", "b"]},
+        {**VALID_POST, "tags": ["bad tag"]},
+        {**VALID_POST, "tags": ["trailing\n"]},
+        {**VALID_POST, "tags": [f"tag{i}" for i in range(11)]},
+        {**VALID_POST, "tags": "python"},
+        {**VALID_POST, "is_private": "yes"},
+        {**VALID_POST, "is_private": 1},
+        {**VALID_POST, "unknown": 1},
+        {"title": "Valid title"},
+        {"title": 123, "description": "Valid description"},
+        None,
+    ],
+)
+def test_create_post_fast_path_matches_schema(data):
+    assert validate_create_post(data) == CreatePostSchema().validate(data)
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        {},
+        {"page": 2, "per_page": 100, "only_own": True, "tags": ["a", "b"]},
+        {"page": 0},
+        {"per_page": 101},
+        {"per_page": True},
+        {"only_own": "true"},
+        {"tags": "python"},
+        {"cursor": "abc"},
+        {"cursor": ""},
+        {"cursor": 5},
+        {"cursor": "a" * 201},
+        {"after": "abc"},
+        {"count": "estimate"},
+        {"count": "all"},
+    ],
+)
+def test_list_posts_fast_path_matches_schema(args):
+    assert validate_list_posts(args) == ListPostsSchema().validate(args)
@@ -0,0 +1,290 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+
+USER_SERVICE = "user_service"
+POST_SERVICE = "post_service"
+
+BACKEND_PREFIXES = (
+    ("/api/users", USER_SERVICE),
+    ("/api/posts", POST_SERVICE),
+)
+
+
+def backend_for_path(path):
+    for prefix, backend in BACKEND_PREFIXES:
+        if path.startswith(prefix):
+            return backend
+    return None
+
+
+def retry_after_header(seconds):
+    # Retry-After принимает только целое число секунд
+    return str(max(1, math.ceil(seconds)))
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше burst подряд.
+
+    rate <= 0 отключает ограничение
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Возвращает 0, если токен выдан, иначе через сколько секунд он появится"""
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class KeyedTokenBuckets:
+    """Отдельный TokenBucket на каждый ключ (пользователя или адрес клиента).
+
+    Хранится не больше max_keys бакетов: давно не активные вытесняются, а
+    вытесненный бакет при следующем запросе создается заново полным
+    """
+
+    def __init__(self, rate, burst, max_keys=10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key):
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(
+                    self.rate, self.burst, self._clock
+                )
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+
+        return bucket.try_acquire()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class BackendLimiter:
+    """Ограничение числа одновременных запросов к одному бэкенду.
+
+    Сверх max_in_flight запрос ждет в очереди не дольше queue_timeout;
+    если очередь уже длиннее max_queue, запрос отклоняется сразу, не дожидаясь
+    таймаута. max_in_flight <= 0 отключает ограничение
+    """
+
+    def __init__(self, max_in_flight, max_queue, queue_timeout):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max(max_in_flight, 1))
+        self.in_flight = 0
+        self.queued = 0
+
+    def _enqueue(self):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                return False
+            self.queued += 1
+            return True
+
+    def _dequeue(self, acquired):
+        with self._lock:
+            self.queued -= 1
+            if acquired:
+                self.in_flight += 1
+
+    def acquire(self):
+        if self.max_in_flight <= 0:
+            return True
+
+        if self._slots.acquire(blocking=False):
+            with self._lock:
+                self.in_flight += 1
+            return True
+
+        if not self._enqueue():
+            return False
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        self._dequeue(acquired)
+        return acquired
+
+    def release(self):
+        if self.max_in_flight <= 0:
+            return
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+
+class AsyncBackendLimiter(BackendLimiter):
+    """То же, что BackendLimiter, для корутин одного event loop"""
+
+    def __init__(self, max_in_flight, max_queue, queue_timeout):
+        super().__init__(max_in_flight, max_queue, queue_timeout)
+        self._slots = asyncio.Semaphore(max(max_in_flight, 1))
+
+    async def acquire(self):
+        if self.max_in_flight <= 0:
+            return True
+
+        if not self._slots.locked():
+            await self._slots.acquire()
+            self.in_flight += 1
+            return True
+
+        if not self._enqueue():
+            return False
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            acquired = True
+        except asyncio.TimeoutError:
+            acquired = False
+        self._dequeue(acquired)
+        return acquired
+
+
+class Rejection:
+    def __init__(self, status_code, message, retry_after):
+        self.status_code = status_code
+        self.message = message
+        self.retry_after = retry_after
+
+    def headers(self):
+        return {"Retry-After": retry_after_header(self.retry_after)}
+
+
+class AdmissionController:
+    """Допуск запросов в гейтвей: глобальный и пользовательский rate limit
+    (429) и ограничение одновременных запросов к каждому бэкенду (503).
+
+    Отклонение происходит сразу, пока запрос еще не занял поток и соединение
+    с бэкендом, и сопровождается Retry-After
+    """
+
+    def __init__(self, global_bucket, user_buckets, backends):
+        self.global_bucket = global_bucket
+        self.user_buckets = user_buckets
+        self.backends = backends
+        self._counters_lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = {"global_rate": 0, "user_rate": 0, "backend_busy": 0}
+
+    def _reject(self, reason, status_code, message, retry_after):
+        with self._counters_lock:
+            self.rejected[reason] += 1
+        return Rejection(status_code, message, retry_after)
+
+    def _admit(self):
+        with self._counters_lock:
+            self.admitted += 1
+
+    def check_rate(self, client_key):
+        wait = self.global_bucket.try_acquire()
+        if wait:
+            return self._reject("global_rate", 429, "Too many requests", wait)
+        wait = self.user_buckets.try_acquire(client_key)
+        if wait:
+            return self._reject("user_rate", 429, "Too many requests", wait)
+        return None
+
+    def _backend_busy(self, backend):
+        return self._reject(
+            "backend_busy",
+            503,
+            "Service is overloaded, retry later",
+            self.backends[backend].queue_timeout,
+        )
+
+    def admit(self, client_key, backend):
+        """Возвращает Rejection или None; после None нужно вызвать release"""
+        rejection = self.check_rate(client_key)
+        if rejection is not None:
+            return rejection
+        if not self.backends[backend].acquire():
+            return self._backend_busy(backend)
+        self._admit()
+        return None
+
+    async def admit_async(self, client_key, backend):
+        rejection = self.check_rate(client_key)
+        if rejection is not None:
+            return rejection
+        if not await self.backends[backend].acquire():
+            return self._backend_busy(backend)
+        self._admit()
+        return None
+
+    def release(self, backend):
+        self.backends[backend].release()
+
+    def stats(self):
+        return {
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "backends": {
+                name: {"in_flight": limiter.in_flight, "queued": limiter.queued}
+                for name, limiter in self.backends.items()
+            },
+        }
+
+
+def create_admission_controller(config, limiter_class=BackendLimiter):
+    if not config["ADMISSION_ENABLED"]:
+        return AdmissionController(
+            TokenBucket(0, 1),
+            KeyedTokenBuckets(0, 1),
+            {
+                USER_SERVICE: limiter_class(0, 0, 0),
+                POST_SERVICE: limiter_class(0, 0, 0),
+            },
+        )
+
+    def backend_limiter(max_in_flight):
+        return limiter_class(
+            max_in_flight,
+            config["ADMISSION_MAX_QUEUE"],
+            config["ADMISSION_QUEUE_TIMEOUT"],
+        )
+
+    return AdmissionController(
+        TokenBucket(config["ADMISSION_GLOBAL_RATE"], config["ADMISSION_GLOBAL_BURST"]),
+        KeyedTokenBuckets(
+            config["ADMISSION_USER_RATE"],
+            config["ADMISSION_USER_BURST"],
+            config["ADMISSION_USER_BUCKETS_MAX"],
+        ),
+        {
+            USER_SERVICE: backend_limiter(config["USER_SERVICE_MAX_IN_FLIGHT"]),
+            POST_SERVICE: backend_limiter(config["POST_SERVICE_MAX_IN_FLIGHT"]),
+        },
+    )
@@ -0,0 +1,206 @@
+import asyncio
+import itertools
+import socket
+import threading
+
+import grpc
+from grpc_health.v1 import health_pb2
+
+import post_service_pb2
+from utils.resilience import BREAKER_FAILURE_CODES
+
+ROUND_ROBIN = "round_robin"
+LEAST_REQUESTS = "least_requests"
+LB_POLICIES = (ROUND_ROBIN, LEAST_REQUESTS)
+
+DNS_SCHEME = "dns:///"
+HEALTH_SERVICE = post_service_pb2.DESCRIPTOR.services_by_name["PostService"].full_name
+
+
+def resolve_targets(value, resolve=socket.getaddrinfo):
+    """'a:50051,dns:///post-service:50051' -> адреса реплик.
+
+    dns:/// раскрывается во все A/AAAA-записи имени, остальные адреса
+    остаются как есть. Ошибка резолвинга (OSError) пробрасывается
+    """
+    targets = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if not item.startswith(DNS_SCHEME):
+            targets.append(item)
+            continue
+
+        host, port = item[len(DNS_SCHEME) :].rsplit(":", 1)
+        addresses = sorted(
+            {info[4][0] for info in resolve(host, port, type=socket.SOCK_STREAM)}
+        )
+        targets.extend(
+            f"[{address}]:{port}" if ":" in address else f"{address}:{port}"
+            for address in addresses
+        )
+    return list(dict.fromkeys(targets))
+
+
+def fallback_targets(value):
+    # Пока имя не резолвится, каждый dns:/// остается одной репликой:
+    # такой адрес резолвит уже сам gRPC
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class Replica:
+    """Одна реплика Post Service: ее каналы, состояние и нагрузка"""
+
+    def __init__(self, target):
+        self.target = target
+        self.channels = []
+        self.stubs = []
+        self.health_channel = None
+        self.health_stub = None
+        self.healthy = True
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def get_stub(self):
+        return self.stubs[next(self._counter) % len(self.stubs)]
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.calls += 1
+
+    def finished(self, code):
+        with self._lock:
+            self.in_flight -= 1
+            if code in BREAKER_FAILURE_CODES:
+                self.failures += 1
+
+    def stats(self):
+        return {
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "failures": self.failures,
+        }
+
+
+class LoadBalancer:
+    """Выбор реплики для очередного вызова.
+
+    least_requests берет реплику с наименьшим числом незавершенных вызовов
+    (при равенстве - по кругу), round_robin - просто по кругу. Реплики, не
+    прошедшие health check, пропускаются, пока есть здоровые
+    """
+
+    def __init__(self, policy=LEAST_REQUESTS):
+        if policy not in LB_POLICIES:
+            raise ValueError(f"Unknown load balancing policy: {policy}")
+        self.policy = policy
+        self.replicas = []
+        self._counter = itertools.count()
+
+    def pick(self, exclude=None):
+        """exclude - реплика, которую по возможности не выбирать (для хеджирования)"""
+        replicas = self.replicas
+        candidates = [replica for replica in replicas if replica.healthy] or replicas
+        if not candidates:
+            raise RuntimeError("No post service replicas")
+        if exclude is not None and len(candidates) > 1:
+            candidates = [replica for replica in candidates if replica is not exclude]
+
+        start = next(self._counter)
+        count = len(candidates)
+        if self.policy == ROUND_ROBIN:
+            return candidates[start % count]
+        return min(
+            (candidates[(start + i) % count] for i in range(count)),
+            key=lambda replica: replica.in_flight,
+        )
+
+    def stats(self):
+        return {
+            "lb_policy": self.policy,
+            "replicas": {replica.target: replica.stats() for replica in self.replicas},
+        }
+
+
+def health_request():
+    return health_pb2.HealthCheckRequest(service=HEALTH_SERVICE)
+
+
+def is_serving(response=None, error=None):
+    if error is not None:
+        # Реплики без сервиса grpc.health.v1 считаются здоровыми
+        return error.code() == grpc.StatusCode.UNIMPLEMENTED
+    return response.status == health_pb2.HealthCheckResponse.SERVING
+
+
+class ReplicaLoadInterceptor(
+    grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor
+):
+    """Учитывает незавершенные вызовы реплики, в том числе потоковые"""
+
+    def __init__(self, replica):
+        self.replica = replica
+
+    def _intercept(self, continuation, client_call_details, request):
+        self.replica.started()
+        try:
+            call = continuation(client_call_details, request)
+        except grpc.RpcError as e:
+            self.replica.finished(e.code())
+            raise
+        call.add_done_callback(lambda call: self.replica.finished(call.code()))
+        return call
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        return self._intercept(continuation, client_call_details, request)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return self._intercept(continuation, client_call_details, request)
+
+
+class AsyncReplicaLoadInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    """То же, что ReplicaLoadInterceptor, для unary-вызовов grpc.aio"""
+
+    def __init__(self, replica):
+        self.replica = replica
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        self.replica.started()
+        code = grpc.StatusCode.UNKNOWN
+        try:
+            call = await continuation(client_call_details, request)
+            code = await call.code()
+            return call
+        finally:
+            self.replica.finished(code)
+
+
+class AsyncReplicaStreamLoadInterceptor(grpc.aio.UnaryStreamClientInterceptor):
+    """То же для потоковых вызовов grpc.aio (каналу нужен отдельный экземпляр)"""
+
+    def __init__(self, replica):
+        self.replica = replica
+
+    async def _finish(self, call):
+        self.replica.finished(await call.code())
+
+    async def intercept_unary_stream(self, continuation, client_call_details, request):
+        self.replica.started()
+        try:
+            call = await continuation(client_call_details, request)
+        except grpc.RpcError as e:
+            self.replica.finished(e.code())
+            raise
+        # Статус завершенного вызова доступен сразу, но code() - корутина
+        call.add_done_callback(lambda call: asyncio.ensure_future(self._finish(call)))
+        return call
+
+
+def create_load_balancer(config):
+    return LoadBalancer(config["POST_SERVICE_LB_POLICY"])
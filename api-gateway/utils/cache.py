@@ -0,0 +1,191 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+PUBLIC_SCOPE = "public"
+
+
+class TTLCache:
+    """Потокобезопасный LRU-кеш с ограничением размера и временем жизни записей"""
+
+    def __init__(self, max_size=1024, ttl=30.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+
+            value, expires_at = item
+            if expires_at <= self._clock():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        if self.max_size <= 0:
+            return
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (value, self._clock() + ttl)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate):
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class PostReadCache:
+    """Read-through кеш ответов GetPost и ListPosts.
+
+    Публичный пост виден всем, поэтому кешируется в общей области видимости.
+    Приватный пост доступен только создателю и кешируется в его области.
+    ListPosts всегда зависит от запрашивающего (в выдачу попадают его
+    приватные посты), поэтому списки кешируются по requester_id
+    """
+
+    def __init__(self, max_size=1024, ttl=30.0, clock=time.monotonic):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl, clock=clock)
+        self._counters_lock = threading.Lock()
+        self.hits = {"get_post": 0, "list_posts": 0}
+        self.misses = {"get_post": 0, "list_posts": 0}
+
+    def _count(self, endpoint, value):
+        with self._counters_lock:
+            if value is None:
+                self.misses[endpoint] += 1
+            else:
+                self.hits[endpoint] += 1
+        return value
+
+    def get_post(self, post_id, requester_id):
+        value = self._cache.get(("get_post", post_id, PUBLIC_SCOPE))
+        if value is None:
+            value = self._cache.get(("get_post", post_id, requester_id))
+        return self._count("get_post", value)
+
+    def set_post(self, post_id, post_data, is_private, creator_id):
+        scope = creator_id if is_private else PUBLIC_SCOPE
+        self._cache.set(("get_post", post_id, scope), post_data)
+
+    @staticmethod
+    def list_key(args, requester_id):
+        return (
+            "list_posts",
+            args.get("page", 1),
+            args.get("per_page", 10),
+            args.get("only_own", False),
+            tuple(sorted(set(args.get("tags", [])))),
+            args.get("cursor"),
+            args.get("count"),
+            requester_id,
+        )
+
+    def get_list(self, args, requester_id):
+        return self._count(
+            "list_posts", self._cache.get(self.list_key(args, requester_id))
+        )
+
+    def set_list(self, args, requester_id, result):
+        self._cache.set(self.list_key(args, requester_id), result)
+
+    def invalidate_post(self, post_id):
+        self._cache.invalidate(
+            lambda key: key[0] == "list_posts"
+            or (key[0] == "get_post" and key[1] == post_id)
+        )
+
+    def invalidate_lists(self):
+        self._cache.invalidate(lambda key: key[0] == "list_posts")
+
+    def stats(self):
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "size": len(self._cache),
+            "evictions": self._cache.evictions,
+        }
+
+
+class VerifiedTokenCache:
+    """Кеш уже проверенных JWT: sha256(токен) -> (заголовок, claims).
+
+    Запись живет не дольше exp токена, поэтому просроченный токен снова уйдет
+    на полную проверку и будет отклонен. Отзыв токенов (blocklist) в сервисе
+    не используется, иначе кеш пришлось бы сбрасывать при отзыве
+    """
+
+    def __init__(self, max_size=10000, max_ttl=300.0, clock=time.time):
+        self._cache = TTLCache(max_size=max_size, ttl=max_ttl, clock=clock)
+        self._clock = clock
+        self._counters_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        value = self._cache.get(self._digest(token))
+        with self._counters_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, token, jwt_header, jwt_data):
+        exp = jwt_data.get("exp")
+        ttl = None if exp is None else exp - self._clock()
+        self._cache.set(self._digest(token), (jwt_header, jwt_data), ttl=ttl)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._cache),
+        }
+
+
+def create_token_cache(config):
+    if not config["JWT_CACHE_ENABLED"]:
+        return VerifiedTokenCache(max_size=0)
+    return VerifiedTokenCache(
+        max_size=config["JWT_CACHE_MAX_SIZE"], max_ttl=config["JWT_CACHE_MAX_TTL"]
+    )
+
+
+def create_post_cache(config):
+    if not config["POST_CACHE_ENABLED"]:
+        return PostReadCache(max_size=0)
+    return PostReadCache(
+        max_size=config["POST_CACHE_MAX_SIZE"], ttl=config["POST_CACHE_TTL"]
+    )
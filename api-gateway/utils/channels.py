@@ -0,0 +1,361 @@
+import asyncio
+import atexit
+import threading
+from concurrent import futures
+
+import grpc
+from grpc_health.v1 import health_pb2_grpc
+
+import post_service_pb2_grpc
+from utils.balancing import (
+    AsyncReplicaLoadInterceptor,
+    AsyncReplicaStreamLoadInterceptor,
+    LoadBalancer,
+    Replica,
+    ReplicaLoadInterceptor,
+    create_load_balancer,
+    fallback_targets,
+    health_request,
+    is_serving,
+    resolve_targets,
+)
+from utils.hedging import (
+    AsyncHedgedStub,
+    CancelScopeInterceptor,
+    HedgedStub,
+    create_hedging_policy,
+)
+from utils.resilience import (
+    AsyncPolicyInterceptor,
+    AsyncPolicyStreamInterceptor,
+    PolicyInterceptor,
+    RpcPolicy,
+    create_rpc_policy,
+)
+
+GRPC_COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+
+class ChannelPool:
+    """Пул долгоживущих gRPC-каналов к репликам Post Service.
+
+    target - адрес или список адресов через запятую; dns:///имя:порт
+    раскрывается во все адреса имени и перерезолвится вместе с health
+    check. На каждую реплику открывается size каналов, реплику для вызова
+    выбирает LoadBalancer, стаб внутри реплики - по кругу.
+
+    Все каналы пула делят одну RpcPolicy (дедлайны, повторы, circuit breaker);
+    interceptors выполняются внутри нее, то есть для каждой попытки вызова.
+    Повтор идет в ту же реплику. С hedging (HedgingPolicy) get_stub отдает
+    стаб, хеджирующий медленные чтения в другую реплику
+    """
+
+    interceptor_class = PolicyInterceptor
+
+    def __init__(
+        self,
+        target,
+        size=4,
+        keepalive_time_ms=30000,
+        keepalive_timeout_ms=10000,
+        keepalive_permit_without_calls=True,
+        policy=None,
+        compression=None,
+        interceptors=(),
+        balancer=None,
+        health_check_interval=0,
+        health_check_timeout=1.0,
+        hedging=None,
+    ):
+        self.target = target
+        self.compression = compression
+        self.policy = policy or RpcPolicy()
+        self.interceptors = [self.interceptor_class(self.policy), *interceptors]
+        self.balancer = balancer or LoadBalancer()
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.hedging = hedging
+        self._executor = self._create_executor()
+        self.size = max(1, size)
+        self.options = [
+            ("grpc.keepalive_time_ms", keepalive_time_ms),
+            ("grpc.keepalive_timeout_ms", keepalive_timeout_ms),
+            (
+                "grpc.keepalive_permit_without_calls",
+                int(keepalive_permit_without_calls),
+            ),
+            ("grpc.http2.max_pings_without_data", 0),
+            # Без локального пула сабканалов все каналы с одинаковыми
+            # аргументами делят одно TCP-соединение
+            ("grpc.use_local_subchannel_pool", 1),
+        ]
+
+        try:
+            targets = resolve_targets(target) or fallback_targets(target)
+        except OSError:
+            targets = fallback_targets(target)
+        self.balancer.replicas = [self._create_replica(t) for t in targets]
+        # Реплики, пропавшие из DNS: закрываются, когда на них нет вызовов
+        self._retired = []
+        self._stopped = threading.Event()
+        self._closed = False
+
+    def _create_replica(self, target):
+        replica = Replica(target)
+        replica.channels = [self._create_channel(replica) for _ in range(self.size)]
+        replica.stubs = [
+            post_service_pb2_grpc.PostServiceStub(channel)
+            for channel in replica.channels
+        ]
+        # Health check идет мимо политики и метрик вызовов
+        replica.health_channel = self._create_health_channel(target)
+        replica.health_stub = health_pb2_grpc.HealthStub(replica.health_channel)
+        return replica
+
+    def _create_channel(self, replica):
+        channel = grpc.insecure_channel(
+            replica.target, options=self.options, compression=self.compression
+        )
+        interceptors = [*self.interceptors, ReplicaLoadInterceptor(replica)]
+        if self.hedging is not None:
+            interceptors.append(CancelScopeInterceptor())
+        return grpc.intercept_channel(channel, *interceptors)
+
+    def _create_executor(self):
+        if self.hedging is None:
+            return None
+        return futures.ThreadPoolExecutor(
+            max_workers=self.hedging.max_workers,
+            thread_name_prefix="post-service-hedge",
+        )
+
+    def _create_health_channel(self, target):
+        return grpc.insecure_channel(target, options=self.options)
+
+    def get_stub(self):
+        if self._closed:
+            raise RuntimeError("Channel pool is closed")
+        if self.hedging is not None:
+            return HedgedStub(self.balancer, self.hedging, self._executor)
+        return self.balancer.pick().get_stub()
+
+    def _apply_targets(self, targets):
+        """Обновляет список реплик, возвращает выведенные реплики без вызовов"""
+        current = {replica.target: replica for replica in self.balancer.replicas}
+        if targets and set(targets) != set(current):
+            self.balancer.replicas = [
+                current.pop(target, None) or self._create_replica(target)
+                for target in targets
+            ]
+            self._retired.extend(current.values())
+
+        idle = [replica for replica in self._retired if replica.in_flight == 0]
+        self._retired = [replica for replica in self._retired if replica.in_flight]
+        return idle
+
+    def refresh_replicas(self):
+        try:
+            targets = resolve_targets(self.target)
+        except OSError:
+            return
+        for replica in self._apply_targets(targets):
+            self._close_replica(replica)
+
+    def check_health(self, replica, timeout):
+        try:
+            response = replica.health_stub.Check(health_request(), timeout=timeout)
+        except grpc.RpcError as e:
+            replica.healthy = is_serving(error=e)
+        else:
+            replica.healthy = is_serving(response)
+
+    def _health_loop(self):
+        while not self._closed:
+            self.refresh_replicas()
+            for replica in self.balancer.replicas:
+                self.check_health(replica, self.health_check_timeout)
+            if self._stopped.wait(self.health_check_interval):
+                return
+
+    def start_health_checks(self):
+        """Health check и перерезолвинг реплик в фоне раз в health_check_interval
+        секунд; при health_check_interval <= 0 не выполняются
+        """
+        if self.health_check_interval <= 0:
+            return
+        threading.Thread(
+            target=self._health_loop, name="post-service-health", daemon=True
+        ).start()
+
+    def _close_replica(self, replica):
+        for channel in replica.channels:
+            channel.close()
+        replica.health_channel.close()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        for replica in [*self.balancer.replicas, *self._retired]:
+            self._close_replica(replica)
+
+
+class AsyncChannelPool(ChannelPool):
+    """Пул каналов grpc.aio для асинхронного режима гейтвея.
+
+    Каналы привязаны к event loop, поэтому пул создается внутри работающего loop
+    """
+
+    interceptor_class = AsyncPolicyInterceptor
+    _health_task = None
+
+    def _create_channel(self, replica):
+        return grpc.aio.insecure_channel(
+            replica.target,
+            options=self.options,
+            compression=self.compression,
+            interceptors=[
+                *self.interceptors,
+                AsyncPolicyStreamInterceptor(self.policy),
+                AsyncReplicaLoadInterceptor(replica),
+                AsyncReplicaStreamLoadInterceptor(replica),
+            ],
+        )
+
+    def _create_health_channel(self, target):
+        return grpc.aio.insecure_channel(target, options=self.options)
+
+    def _create_executor(self):
+        # Попытки - задачи event loop, отменять их умеет сам grpc.aio
+        return None
+
+    def get_stub(self):
+        if self.hedging is not None and not self._closed:
+            return AsyncHedgedStub(self.balancer, self.hedging)
+        return super().get_stub()
+
+    async def refresh_replicas(self):
+        try:
+            targets = await asyncio.to_thread(resolve_targets, self.target)
+        except OSError:
+            return
+        for replica in self._apply_targets(targets):
+            await self._close_replica(replica)
+
+    async def check_health(self, replica, timeout):
+        try:
+            response = await replica.health_stub.Check(
+                health_request(), timeout=timeout
+            )
+        except grpc.RpcError as e:
+            replica.healthy = is_serving(error=e)
+        else:
+            replica.healthy = is_serving(response)
+
+    async def _health_loop(self):
+        while not self._closed:
+            await self.refresh_replicas()
+            await asyncio.gather(
+                *(
+                    self.check_health(replica, self.health_check_timeout)
+                    for replica in self.balancer.replicas
+                )
+            )
+            await asyncio.sleep(self.health_check_interval)
+
+    def start_health_checks(self):
+        if self.health_check_interval <= 0:
+            return
+        self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+
+    async def _close_replica(self, replica):
+        for channel in replica.channels:
+            await channel.close()
+        await replica.health_channel.close()
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for replica in [*self.balancer.replicas, *self._retired]:
+            await self._close_replica(replica)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def build_channel_pool(
+    config,
+    pool_class=ChannelPool,
+    policy=None,
+    interceptors=(),
+    balancer=None,
+    hedging=None,
+):
+    return pool_class(
+        config["POST_SERVICE_GRPC"],
+        size=config["POST_SERVICE_CHANNEL_POOL_SIZE"],
+        keepalive_time_ms=config["GRPC_KEEPALIVE_TIME_MS"],
+        keepalive_timeout_ms=config["GRPC_KEEPALIVE_TIMEOUT_MS"],
+        keepalive_permit_without_calls=config["GRPC_KEEPALIVE_PERMIT_WITHOUT_CALLS"],
+        policy=policy or create_rpc_policy(config),
+        compression=GRPC_COMPRESSION[config["POST_SERVICE_GRPC_COMPRESSION"]],
+        interceptors=interceptors,
+        balancer=balancer or create_load_balancer(config),
+        health_check_interval=config["POST_SERVICE_HEALTH_CHECK_INTERVAL"],
+        health_check_timeout=config["POST_SERVICE_HEALTH_CHECK_TIMEOUT"],
+        hedging=hedging or create_hedging_policy(config),
+    )
+
+
+def init_channel_pool(config, interceptors=()):
+    """Создает пул каналов процесса по конфигу приложения, закрывая предыдущий"""
+    global _pool
+
+    pool = build_channel_pool(config, interceptors=interceptors)
+    pool.start_health_checks()
+
+    with _pool_lock:
+        previous, _pool = _pool, pool
+
+    if previous is not None:
+        previous.close()
+
+    return pool
+
+
+def get_channel_pool():
+    global _pool
+
+    if _pool is None:
+        from config import Config
+
+        with _pool_lock:
+            if _pool is None:
+                _pool = build_channel_pool(vars(Config))
+                _pool.start_health_checks()
+
+    return _pool
+
+
+def close_channel_pool():
+    global _pool
+
+    with _pool_lock:
+        pool, _pool = _pool, None
+
+    if pool is not None:
+        pool.close()
+
+
+atexit.register(close_channel_pool)
@@ -0,0 +1,97 @@
+import gzip
+import zlib
+
+# Порядок задает предпочтение при одинаковом q
+ENCODINGS = ("gzip", "deflate")
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def parse_route_min_sizes(value):
+    """'list_posts=256,health_check=off' -> {'list_posts': 256, 'health_check': None}"""
+    min_sizes = {}
+    for item in value.split(","):
+        if item.strip():
+            endpoint, min_size = item.split("=", 1)
+            min_size = min_size.strip()
+            min_sizes[endpoint.strip()] = None if min_size == "off" else int(min_size)
+    return min_sizes
+
+
+def negotiate_encoding(accept_encoding):
+    """Лучшее из ENCODINGS по Accept-Encoding с учетом q, None - без сжатия"""
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress_body(body, encoding, level=1):
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    # deflate в HTTP - это zlib-формат (RFC 9110 8.4.1.2)
+    return zlib.compress(body, level)
+
+
+def weak_etag(etag):
+    # Сжатое тело не совпадает побайтно с исходным, поэтому ETag ослабляется
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class ResponseCompressor:
+    """Политика сжатия ответов гейтвея.
+
+    Ответ сжимается, если клиент принимает gzip или deflate, тип содержимого
+    текстовый, а тело не меньше порога. Порог задается глобально и может
+    быть переопределен для отдельных роутов (по имени обработчика); None
+    отключает сжатие роута
+    """
+
+    def __init__(self, min_size=1024, level=1, route_min_sizes=None, enabled=True):
+        self.min_size = min_size
+        self.level = level
+        self.route_min_sizes = route_min_sizes or {}
+        self.enabled = enabled
+
+    def is_compressible(self, endpoint, content_type):
+        return (
+            self.enabled
+            and self.route_min_sizes.get(endpoint, self.min_size) is not None
+            and (content_type or "").startswith(COMPRESSIBLE_TYPES)
+        )
+
+    def choose_encoding(self, endpoint, accept_encoding, content_type, size):
+        if not self.is_compressible(endpoint, content_type):
+            return None
+        if size < self.route_min_sizes.get(endpoint, self.min_size):
+            return None
+        return negotiate_encoding(accept_encoding)
+
+    def compress(self, body, encoding):
+        return compress_body(body, encoding, self.level)
+
+
+def create_response_compressor(config):
+    return ResponseCompressor(
+        min_size=config["RESPONSE_COMPRESSION_MIN_SIZE"],
+        level=config["RESPONSE_COMPRESSION_LEVEL"],
+        route_min_sizes=parse_route_min_sizes(config["RESPONSE_COMPRESSION_ROUTES"]),
+        enabled=config["RESPONSE_COMPRESSION_ENABLED"],
+    )
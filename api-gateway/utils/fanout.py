@@ -0,0 +1,33 @@
+import asyncio
+from concurrent import futures
+
+
+def fan_out(executor, first, *rest):
+    """Выполняет вызовы одновременно: first - в текущем потоке, остальные -
+    в executor. Результаты возвращаются по порядку вызовов; если упало
+    несколько, пробрасывается ошибка самого раннего
+    """
+    pending = [executor.submit(call) for call in rest]
+    try:
+        results = [first()]
+    except Exception:
+        for future in pending:
+            future.cancel()
+        raise
+    return results + [future.result() for future in pending]
+
+
+async def async_fan_out(*awaitables):
+    """То же для корутин и вызовов grpc.aio"""
+    results = await asyncio.gather(*awaitables, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+def create_fanout_executor(config):
+    return futures.ThreadPoolExecutor(
+        max_workers=config["POST_SERVICE_FANOUT_WORKERS"],
+        thread_name_prefix="post-service-fanout",
+    )
@@ -0,0 +1,281 @@
+import asyncio
+import collections
+import contextvars
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+from utils.resilience import BREAKER_FAILURE_CODES, RetryBudget
+
+# Отмена вызовов проигравшей попытки в синхронном режиме, см. CancelScope
+_cancel_scope = contextvars.ContextVar("post_service_cancel_scope", default=None)
+
+
+def parse_rpcs(value):
+    return frozenset(name.strip() for name in value.split(",") if name.strip())
+
+
+class LatencyTracker:
+    """Перцентиль задержки по скользящему окну последних window вызовов.
+
+    Пока вызовов меньше min_samples, перцентиль не считается (None);
+    дальше он пересчитывается раз в window // 10 новых замеров
+    """
+
+    def __init__(self, percentile=95, window=1000, min_samples=100):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._samples = collections.deque(maxlen=window)
+        self._recompute_every = max(1, window // 10)
+        self._since_recompute = 0
+        self._value = None
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._since_recompute += 1
+
+    def value(self):
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            if self._value is None or self._since_recompute >= self._recompute_every:
+                ordered = sorted(self._samples)
+                index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+                self._value = ordered[index]
+                self._since_recompute = 0
+            return self._value
+
+
+class HedgingPolicy:
+    """Хеджирование чтений: если ответ на вызов из rpcs не пришел за
+    перцентиль percentile его обычной задержки (не меньше min_delay, до
+    накопления замеров - initial_delay), тот же запрос отправляется в другую
+    реплику. Берется первый успешный ответ, второй вызов отменяется.
+
+    Дополнительные вызовы ограничены бюджетом: budget_ratio от числа
+    хеджируемых чтений
+    """
+
+    def __init__(
+        self,
+        rpcs,
+        percentile=95,
+        min_delay=0.01,
+        initial_delay=0.05,
+        budget_ratio=0.05,
+        max_workers=32,
+    ):
+        self.rpcs = frozenset(rpcs)
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.max_workers = max_workers
+        self.budget = RetryBudget(ratio=budget_ratio, min_per_second=0)
+        self.trackers = {name: LatencyTracker(percentile) for name in self.rpcs}
+        self.hedged = collections.Counter()
+        self.hedge_wins = collections.Counter()
+
+    def delay_for(self, name):
+        delay = self.trackers[name].value()
+        if delay is None:
+            return self.initial_delay
+        return max(self.min_delay, delay)
+
+    def observe(self, name, seconds):
+        self.trackers[name].observe(seconds)
+
+    def try_hedge(self, name):
+        if not self.budget.try_spend():
+            return False
+        self.hedged[name] += 1
+        return True
+
+    def stats(self):
+        return {
+            "hedged": dict(self.hedged),
+            "hedge_wins": dict(self.hedge_wins),
+            "budget_exhausted": self.budget.exhausted,
+            "delays": {name: self.delay_for(name) for name in sorted(self.rpcs)},
+        }
+
+
+def _is_failure(error):
+    return isinstance(error, grpc.RpcError) and error.code() in BREAKER_FAILURE_CODES
+
+
+class CancelScope:
+    """Вызовы одной попытки в синхронном режиме.
+
+    Блокирующий вызов stub нельзя отменить из другого потока, поэтому
+    CancelScopeInterceptor регистрирует здесь сами RPC, а cancel() отменяет
+    их, в том числе начатые позже (повторы)
+    """
+
+    def __init__(self):
+        self._calls = []
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def register(self, call):
+        with self._lock:
+            if not self._cancelled:
+                self._calls.append(call)
+                return
+        call.cancel()
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            calls, self._calls = self._calls, []
+        for call in calls:
+            call.cancel()
+
+
+class CancelScopeInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """Должен быть самым внутренним: только он видит RPC до его завершения"""
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        call = continuation(client_call_details, request)
+        scope = _cancel_scope.get()
+        if scope is not None:
+            scope.register(call)
+        return call
+
+
+def _call_in_scope(scope, stub, name, request, kwargs):
+    _cancel_scope.set(scope)
+    # .future(): в цепочке interceptors только так нижний RPC отменяем
+    return getattr(stub, name).future(request, **kwargs).result()
+
+
+class HedgedStub:
+    """Стаб Post Service, хеджирующий вызовы из policy.rpcs; остальные
+    вызовы идут в выбранную балансировщиком реплику как обычно
+    """
+
+    def __init__(self, balancer, policy, executor, clock=time.monotonic):
+        self._balancer = balancer
+        self._policy = policy
+        self._executor = executor
+        self._clock = clock
+
+    def __getattr__(self, name):
+        if name in self._policy.rpcs:
+            return lambda request, **kwargs: self._hedged(name, request, kwargs)
+        return getattr(self._balancer.pick().get_stub(), name)
+
+    def _submit(self, replica, name, request, kwargs):
+        scope = CancelScope()
+        future = self._executor.submit(
+            contextvars.Context().run,
+            _call_in_scope,
+            scope,
+            replica.get_stub(),
+            name,
+            request,
+            kwargs,
+        )
+        return future, scope
+
+    def _hedged(self, name, request, kwargs):
+        policy = self._policy
+        policy.budget.record_request()
+        started = self._clock()
+
+        primary = self._balancer.pick()
+        first, first_scope = self._submit(primary, name, request, kwargs)
+        attempts = {first: first_scope}
+        try:
+            futures.wait([first], timeout=policy.delay_for(name))
+            if not first.done() and policy.try_hedge(name):
+                second = self._submit(
+                    self._balancer.pick(exclude=primary), name, request, kwargs
+                )
+                attempts[second[0]] = second[1]
+
+            while True:
+                done, _ = futures.wait(attempts, return_when=futures.FIRST_COMPLETED)
+                winner = done.pop()
+                del attempts[winner]
+                # Недоступность одной реплики не повод отказываться от второй
+                if not attempts or not _is_failure(winner.exception()):
+                    break
+        finally:
+            for scope in attempts.values():
+                scope.cancel()
+
+        policy.observe(name, self._clock() - started)
+        if winner is not first:
+            policy.hedge_wins[name] += 1
+        return winner.result()
+
+
+class AsyncHedgedStub:
+    """То же, что HedgedStub, для каналов grpc.aio: отмена задачи отменяет RPC"""
+
+    def __init__(self, balancer, policy, clock=time.monotonic):
+        self._balancer = balancer
+        self._policy = policy
+        self._clock = clock
+
+    def __getattr__(self, name):
+        if name in self._policy.rpcs:
+            return lambda request, **kwargs: self._hedged(name, request, kwargs)
+        return getattr(self._balancer.pick().get_stub(), name)
+
+    async def _hedged(self, name, request, kwargs):
+        policy = self._policy
+        policy.budget.record_request()
+        started = self._clock()
+
+        primary = self._balancer.pick()
+        first = asyncio.ensure_future(
+            getattr(primary.get_stub(), name)(request, **kwargs)
+        )
+        attempts = {first}
+        try:
+            await asyncio.wait(attempts, timeout=policy.delay_for(name))
+            if not first.done() and policy.try_hedge(name):
+                stub = self._balancer.pick(exclude=primary).get_stub()
+                attempts.add(
+                    asyncio.ensure_future(getattr(stub, name)(request, **kwargs))
+                )
+
+            while True:
+                done, attempts = await asyncio.wait(
+                    attempts, return_when=asyncio.FIRST_COMPLETED
+                )
+                winner = done.pop()
+                attempts |= done
+                if not attempts or not _is_failure(winner.exception()):
+                    break
+        finally:
+            for task in attempts:
+                task.cancel()
+
+        policy.observe(name, self._clock() - started)
+        if winner is not first:
+            policy.hedge_wins[name] += 1
+        return winner.result()
+
+
+def hedging_stats(policy):
+    return policy.stats() if policy is not None else None
+
+
+def create_hedging_policy(config):
+    if not config["POST_SERVICE_HEDGING_ENABLED"]:
+        return None
+    max_in_flight = config["POST_SERVICE_MAX_IN_FLIGHT"]
+    return HedgingPolicy(
+        parse_rpcs(config["POST_SERVICE_HEDGED_RPCS"]),
+        percentile=config["POST_SERVICE_HEDGE_PERCENTILE"],
+        min_delay=config["POST_SERVICE_HEDGE_MIN_DELAY"],
+        initial_delay=config["POST_SERVICE_HEDGE_INITIAL_DELAY"],
+        budget_ratio=config["POST_SERVICE_HEDGE_BUDGET_RATIO"],
+        # По потоку на основную и хеджирующую попытку каждого допущенного запроса
+        max_workers=2 * max_in_flight if max_in_flight > 0 else 32,
+    )
@@ -0,0 +1,48 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Заголовки уровня соединения не проксируем: например, "Connection: close"
+# от клиента закрыл бы сокет из пула
+HOP_BY_HOP_HEADERS = {
+    "host",
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+def create_user_service_session(config):
+    """Сессия с keep-alive пулом соединений к User Service"""
+    retries = Retry(
+        total=config["USER_SERVICE_GET_RETRIES"],
+        connect=config["USER_SERVICE_GET_RETRIES"],
+        read=config["USER_SERVICE_GET_RETRIES"],
+        status=config["USER_SERVICE_GET_RETRIES"],
+        allowed_methods=frozenset(["GET"]),
+        status_forcelist=(502, 503, 504),
+        backoff_factor=config["USER_SERVICE_RETRY_BACKOFF"],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config["USER_SERVICE_POOL_CONNECTIONS"],
+        pool_maxsize=config["USER_SERVICE_POOL_MAXSIZE"],
+        pool_block=config["USER_SERVICE_POOL_BLOCK"],
+        max_retries=retries,
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def forwarded_headers(headers):
+    return {
+        key: value for key, value in headers if key.lower() not in HOP_BY_HOP_HEADERS
+    }
@@ -0,0 +1,338 @@
+import time
+
+import grpc
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from utils.admission import POST_SERVICE
+from utils.resilience import CLOSED, HALF_OPEN, OPEN, rpc_name
+
+# Обработчик запросов, не совпавших ни с одним роутом (404, 405)
+UNMATCHED_HANDLER = "unmatched"
+
+
+class GatewayMetrics:
+    """Метрики гейтвея в отдельном реестре приложения (для /metrics).
+
+    Запросы к гейтвею размечаются именем обработчика, одинаковым в Flask- и
+    ASGI-режимах; вызовы бэкендов - именем upstream и операции (RPC Post
+    Service или метод и путь User Service)
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry or CollectorRegistry()
+
+        self.requests = Counter(
+            "gateway_requests_total",
+            "Requests handled by the gateway",
+            ["handler", "method", "status"],
+            registry=self.registry,
+        )
+        self.errors = Counter(
+            "gateway_request_errors_total",
+            "Requests that ended with a 5xx response",
+            ["handler", "method"],
+            registry=self.registry,
+        )
+        self.latency = Histogram(
+            "gateway_request_duration_seconds",
+            "Time spent handling a request",
+            ["handler", "method"],
+            registry=self.registry,
+        )
+        # Обработчик в ASGI-режиме известен только после маршрутизации,
+        # поэтому число запросов в обработке считается по гейтвею в целом
+        self.in_flight = Gauge(
+            "gateway_requests_in_flight",
+            "Requests being handled right now",
+            registry=self.registry,
+        )
+
+        self.upstream_requests = Counter(
+            "gateway_upstream_requests_total",
+            "Calls from the gateway to backend services",
+            ["upstream", "operation", "status"],
+            registry=self.registry,
+        )
+        self.upstream_latency = Histogram(
+            "gateway_upstream_duration_seconds",
+            "Time spent waiting for a backend service",
+            ["upstream", "operation"],
+            registry=self.registry,
+        )
+        self.upstream_in_flight = Gauge(
+            "gateway_upstream_in_flight",
+            "Backend calls in progress",
+            ["upstream"],
+            registry=self.registry,
+        )
+
+    def request_started(self):
+        self.in_flight.inc()
+        return time.perf_counter()
+
+    def request_finished(self, handler, method, status, started):
+        self.in_flight.dec()
+        self.latency.labels(handler, method).observe(time.perf_counter() - started)
+        self.requests.labels(handler, method, str(status)).inc()
+        if status >= 500:
+            self.errors.labels(handler, method).inc()
+
+    def upstream_started(self, upstream):
+        self.upstream_in_flight.labels(upstream).inc()
+        return time.perf_counter()
+
+    def upstream_finished(self, upstream, operation, status, started):
+        self.upstream_in_flight.labels(upstream).dec()
+        self.upstream_latency.labels(upstream, operation).observe(
+            time.perf_counter() - started
+        )
+        self.upstream_requests.labels(upstream, operation, str(status)).inc()
+
+    def register_stats(self, **sources):
+        """sources: имя -> функция, возвращающая объект со stats()"""
+        self.registry.register(StatsCollector(sources))
+
+
+class StatsCollector:
+    """Отдает в /metrics счетчики, которые компоненты гейтвея уже ведут сами
+    (кеши, допуск запросов, circuit breaker). Значения читаются при каждом
+    запросе /metrics, отдельно их обновлять не нужно
+    """
+
+    def __init__(self, sources):
+        self.sources = sources
+
+    def _stats(self, name):
+        return self.sources[name]().stats()
+
+    def collect(self):
+        if "post_cache" in self.sources:
+            yield from self._post_cache(self._stats("post_cache"))
+        if "token_cache" in self.sources:
+            yield from self._token_cache(self._stats("token_cache"))
+        if "admission" in self.sources:
+            yield from self._admission(self._stats("admission"))
+        if "post_service_policy" in self.sources:
+            yield from self._policy(self._stats("post_service_policy"))
+        if "post_service_balancer" in self.sources:
+            yield from self._replicas(self._stats("post_service_balancer"))
+        if "post_service_hedging" in self.sources:
+            hedging = self.sources["post_service_hedging"]()
+            if hedging is not None:
+                yield from self._hedging(hedging.stats())
+
+    @staticmethod
+    def _post_cache(stats):
+        hits = CounterMetricFamily(
+            "gateway_post_cache_hits", "Post cache hits", labels=["endpoint"]
+        )
+        misses = CounterMetricFamily(
+            "gateway_post_cache_misses", "Post cache misses", labels=["endpoint"]
+        )
+        for endpoint, value in stats["hits"].items():
+            hits.add_metric([endpoint], value)
+        for endpoint, value in stats["misses"].items():
+            misses.add_metric([endpoint], value)
+        yield hits
+        yield misses
+        yield GaugeMetricFamily(
+            "gateway_post_cache_size", "Entries in the post cache", stats["size"]
+        )
+        yield CounterMetricFamily(
+            "gateway_post_cache_evictions",
+            "Entries evicted from the post cache",
+            stats["evictions"],
+        )
+
+    @staticmethod
+    def _token_cache(stats):
+        yield CounterMetricFamily(
+            "gateway_jwt_cache_hits", "Verified JWT cache hits", stats["hits"]
+        )
+        yield CounterMetricFamily(
+            "gateway_jwt_cache_misses", "Verified JWT cache misses", stats["misses"]
+        )
+        yield GaugeMetricFamily(
+            "gateway_jwt_cache_size", "Entries in the verified JWT cache", stats["size"]
+        )
+
+    @staticmethod
+    def _admission(stats):
+        yield CounterMetricFamily(
+            "gateway_admission_admitted", "Admitted requests", stats["admitted"]
+        )
+        rejected = CounterMetricFamily(
+            "gateway_admission_rejected", "Rejected requests", labels=["reason"]
+        )
+        for reason, value in stats["rejected"].items():
+            rejected.add_metric([reason], value)
+        yield rejected
+
+        in_flight = GaugeMetricFamily(
+            "gateway_admission_in_flight",
+            "Admitted requests per backend",
+            labels=["backend"],
+        )
+        queued = GaugeMetricFamily(
+            "gateway_admission_queued",
+            "Requests waiting for a backend slot",
+            labels=["backend"],
+        )
+        for backend, load in stats["backends"].items():
+            in_flight.add_metric([backend], load["in_flight"])
+            queued.add_metric([backend], load["queued"])
+        yield in_flight
+        yield queued
+
+    @staticmethod
+    def _policy(stats):
+        circuit = stats["circuit"]
+        state = GaugeMetricFamily(
+            "gateway_post_service_circuit_state",
+            "1 for the current circuit breaker state",
+            labels=["state"],
+        )
+        for name in (CLOSED, HALF_OPEN, OPEN):
+            state.add_metric([name], int(circuit["state"] == name))
+        yield state
+
+        transitions = CounterMetricFamily(
+            "gateway_post_service_circuit_transitions",
+            "Circuit breaker state transitions",
+            labels=["transition"],
+        )
+        for transition, value in circuit["transitions"].items():
+            transitions.add_metric([transition], value)
+        yield transitions
+        yield CounterMetricFamily(
+            "gateway_post_service_circuit_rejected",
+            "Calls rejected by the open circuit breaker",
+            circuit["rejected"],
+        )
+        yield CounterMetricFamily(
+            "gateway_post_service_retries", "Retried calls", stats["retries"]
+        )
+        yield CounterMetricFamily(
+            "gateway_post_service_retry_budget_exhausted",
+            "Retries skipped because the retry budget was exhausted",
+            stats["retry_budget_exhausted"],
+        )
+
+    @staticmethod
+    def _replicas(stats):
+        healthy = GaugeMetricFamily(
+            "gateway_post_service_replica_healthy",
+            "1 if the replica passed the last health check",
+            labels=["replica"],
+        )
+        in_flight = GaugeMetricFamily(
+            "gateway_post_service_replica_in_flight",
+            "Outstanding calls per replica",
+            labels=["replica"],
+        )
+        calls = CounterMetricFamily(
+            "gateway_post_service_replica_calls",
+            "Calls sent to the replica",
+            labels=["replica"],
+        )
+        failures = CounterMetricFamily(
+            "gateway_post_service_replica_failures",
+            "Calls that failed with UNAVAILABLE or DEADLINE_EXCEEDED",
+            labels=["replica"],
+        )
+        for target, replica in stats["replicas"].items():
+            healthy.add_metric([target], int(replica["healthy"]))
+            in_flight.add_metric([target], replica["in_flight"])
+            calls.add_metric([target], replica["calls"])
+            failures.add_metric([target], replica["failures"])
+        yield healthy
+        yield in_flight
+        yield calls
+        yield failures
+
+    @staticmethod
+    def _hedging(stats):
+        hedged = CounterMetricFamily(
+            "gateway_post_service_hedged",
+            "Reads duplicated to another replica",
+            labels=["rpc"],
+        )
+        wins = CounterMetricFamily(
+            "gateway_post_service_hedge_wins",
+            "Hedged reads answered by the duplicate first",
+            labels=["rpc"],
+        )
+        delay = GaugeMetricFamily(
+            "gateway_post_service_hedge_delay_seconds",
+            "Current delay before a read is hedged",
+            labels=["rpc"],
+        )
+        for rpc, value in stats["hedged"].items():
+            hedged.add_metric([rpc], value)
+        for rpc, value in stats["hedge_wins"].items():
+            wins.add_metric([rpc], value)
+        for rpc, value in stats["delays"].items():
+            delay.add_metric([rpc], value)
+        yield hedged
+        yield wins
+        yield delay
+        yield CounterMetricFamily(
+            "gateway_post_service_hedge_budget_exhausted",
+            "Hedges skipped because the hedge budget was exhausted",
+            stats["budget_exhausted"],
+        )
+
+
+def _status_name(code):
+    return code.name if code is not None else "UNKNOWN"
+
+
+class MetricsInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """Время и статус каждого unary-вызова Post Service, включая повторы"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        started = self.metrics.upstream_started(POST_SERVICE)
+        code = grpc.StatusCode.UNKNOWN
+        try:
+            outcome = continuation(client_call_details, request)
+            code = outcome.code()
+            return outcome
+        except grpc.RpcError as e:
+            code = e.code()
+            raise
+        finally:
+            self.metrics.upstream_finished(
+                POST_SERVICE,
+                rpc_name(client_call_details.method),
+                _status_name(code),
+                started,
+            )
+
+
+class AsyncMetricsInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    """То же, что MetricsInterceptor, для каналов grpc.aio"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        started = self.metrics.upstream_started(POST_SERVICE)
+        code = grpc.StatusCode.UNKNOWN
+        try:
+            call = await continuation(client_call_details, request)
+            code = await call.code()
+            return call
+        except grpc.RpcError as e:
+            code = e.code()
+            raise
+        finally:
+            self.metrics.upstream_finished(
+                POST_SERVICE,
+                rpc_name(client_call_details.method),
+                _status_name(code),
+                started,
+            )
@@ -0,0 +1,379 @@
+import asyncio
+import collections
+import random
+import threading
+import time
+
+import grpc
+
+from utils.admission import TokenBucket
+
+# Чтения без побочных эффектов, их можно безопасно повторять
+IDEMPOTENT_RPCS = frozenset(
+    {
+        "GetPost",
+        "GetPostVersion",
+        "GetPostCounts",
+        "ListPosts",
+        "GetComments",
+        "BatchGetPosts",
+    }
+)
+RETRYABLE_CODES = frozenset({grpc.StatusCode.UNAVAILABLE})
+# Ошибки, говорящие о проблемах самого бэкенда, а не о конкретном запросе
+BREAKER_FAILURE_CODES = frozenset(
+    {grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED}
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def parse_deadlines(value):
+    """'GetPost=1.5,ListPosts=3' -> {'GetPost': 1.5, 'ListPosts': 3.0}"""
+    deadlines = {}
+    for item in value.split(","):
+        if item.strip():
+            name, seconds = item.split("=", 1)
+            deadlines[name.strip()] = float(seconds)
+    return deadlines
+
+
+def rpc_name(method):
+    if isinstance(method, bytes):
+        method = method.decode()
+    return method.rsplit("/", 1)[-1]
+
+
+class CircuitOpenError(grpc.RpcError):
+    """Вызов не отправлялся: circuit breaker разомкнут"""
+
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+    def details(self):
+        return "Post service is unavailable (circuit open)"
+
+
+class RetryBudget:
+    """Бюджет повторов: каждый исходный вызов добавляет ratio повтора
+    (не больше max_balance), а min_per_second повторов в секунду доступны
+    всегда (0 - без такого запаса). Так повторы не умножают нагрузку на и
+    без того упавший бэкенд
+    """
+
+    def __init__(
+        self, ratio=0.2, min_per_second=5, max_balance=10, clock=time.monotonic
+    ):
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self._balance = 0.0
+        self._reserve = (
+            TokenBucket(min_per_second, max(1, int(min_per_second)), clock)
+            if min_per_second > 0
+            else None
+        )
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.exhausted = 0
+
+    def record_request(self):
+        with self._lock:
+            self._balance = min(self.max_balance, self._balance + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._balance >= 1:
+                self._balance -= 1
+                self.retries += 1
+                return True
+
+        if self._reserve is not None and self._reserve.try_acquire() == 0:
+            with self._lock:
+                self.retries += 1
+            return True
+
+        with self._lock:
+            self.exhausted += 1
+        return False
+
+
+class CircuitBreaker:
+    """Размыкается после failure_threshold неудач подряд и reset_timeout секунд
+    отклоняет вызовы сразу. Затем пропускает один пробный вызов (half-open):
+    успех замыкает цепь, неудача снова размыкает
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+        self.transitions = collections.Counter()
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.transitions[f"{self.state}->{state}"] += 1
+            self.state = state
+
+    def allow(self):
+        if self.failure_threshold <= 0:
+            return True
+
+        with self._lock:
+            if (
+                self.state == OPEN
+                and self._clock() - self._opened_at >= self.reset_timeout
+            ):
+                self._set_state(HALF_OPEN)
+
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record(self, code):
+        if self.failure_threshold <= 0:
+            return
+
+        with self._lock:
+            self._probe_in_flight = False
+            if code == grpc.StatusCode.CANCELLED:
+                # Вызов отменил сам гейтвей (проигравший хедж, ушедший клиент),
+                # о состоянии бэкенда это ничего не говорит
+                return
+            if code not in BREAKER_FAILURE_CODES:
+                self._failures = 0
+                self._set_state(CLOSED)
+                return
+
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                self._set_state(OPEN)
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+        }
+
+
+class RpcPolicy:
+    """Дедлайны, повторы и circuit breaker для вызовов одного бэкенда"""
+
+    def __init__(
+        self,
+        default_deadline=5.0,
+        deadlines=None,
+        max_retries=2,
+        backoff=0.05,
+        retry_budget=None,
+        breaker=None,
+    ):
+        self.default_deadline = default_deadline
+        self.deadlines = deadlines or {}
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.retry_budget = retry_budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+
+    def deadline_for(self, name):
+        return self.deadlines.get(name, self.default_deadline)
+
+    def backoff_delay(self, attempt):
+        # Экспоненциальная задержка с полным джиттером
+        return random.uniform(0, self.backoff * 2**attempt)
+
+    def should_retry(self, name, code, attempt, remaining):
+        return (
+            name in IDEMPOTENT_RPCS
+            and code in RETRYABLE_CODES
+            and attempt < self.max_retries
+            and remaining > 0
+            and self.retry_budget.try_spend()
+        )
+
+    def stats(self):
+        return {
+            "circuit": self.breaker.stats(),
+            "retries": self.retry_budget.retries,
+            "retry_budget_exhausted": self.retry_budget.exhausted,
+        }
+
+
+class _ClientCallDetails(
+    collections.namedtuple(
+        "_ClientCallDetails",
+        (
+            "method",
+            "timeout",
+            "metadata",
+            "credentials",
+            "wait_for_ready",
+            "compression",
+        ),
+    ),
+    grpc.ClientCallDetails,
+):
+    pass
+
+
+def _with_timeout(details, timeout):
+    return _ClientCallDetails(
+        details.method,
+        timeout,
+        details.metadata,
+        details.credentials,
+        getattr(details, "wait_for_ready", None),
+        getattr(details, "compression", None),
+    )
+
+
+class PolicyInterceptor(
+    grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor
+):
+    """Применяет RpcPolicy ко всем unary-вызовам канала.
+
+    Явно переданный в stub timeout имеет приоритет над дедлайном из политики;
+    повторы укладываются в исходный дедлайн вызова. Потоковые вызовы не
+    повторяются (часть ответа могла уйти клиенту), но проходят через circuit
+    breaker
+    """
+
+    def __init__(self, policy, clock=time.monotonic, sleep=time.sleep):
+        self.policy = policy
+        self._clock = clock
+        self._sleep = sleep
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        policy = self.policy
+        name = rpc_name(client_call_details.method)
+        timeout = client_call_details.timeout or policy.deadline_for(name)
+        deadline = self._clock() + timeout
+        policy.retry_budget.record_request()
+
+        attempt, outcome = 0, None
+        while True:
+            if not policy.breaker.allow():
+                if outcome is None:
+                    raise CircuitOpenError()
+                return outcome
+
+            remaining = deadline - self._clock()
+            outcome = continuation(
+                _with_timeout(client_call_details, remaining), request
+            )
+            code = outcome.code()
+            policy.breaker.record(code)
+
+            delay = policy.backoff_delay(attempt)
+            remaining = deadline - self._clock() - delay
+            if not policy.should_retry(name, code, attempt, remaining):
+                return outcome
+
+            self._sleep(delay)
+            attempt += 1
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        breaker = self.policy.breaker
+        if not breaker.allow():
+            raise CircuitOpenError()
+        try:
+            call = continuation(client_call_details, request)
+        except grpc.RpcError as e:
+            breaker.record(e.code())
+            raise
+        call.add_done_callback(lambda call: breaker.record(call.code()))
+        return call
+
+
+class AsyncPolicyInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    """То же, что PolicyInterceptor, для каналов grpc.aio"""
+
+    def __init__(self, policy, clock=time.monotonic, sleep=asyncio.sleep):
+        self.policy = policy
+        self._clock = clock
+        self._sleep = sleep
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        policy = self.policy
+        name = rpc_name(client_call_details.method)
+        timeout = client_call_details.timeout or policy.deadline_for(name)
+        deadline = self._clock() + timeout
+        policy.retry_budget.record_request()
+
+        attempt, call = 0, None
+        while True:
+            if not policy.breaker.allow():
+                if call is None:
+                    raise CircuitOpenError()
+                return call
+
+            remaining = deadline - self._clock()
+            call = await continuation(
+                _with_timeout(client_call_details, remaining), request
+            )
+            code = await call.code()
+            policy.breaker.record(code)
+
+            delay = policy.backoff_delay(attempt)
+            remaining = deadline - self._clock() - delay
+            if not policy.should_retry(name, code, attempt, remaining):
+                return call
+
+            await self._sleep(delay)
+            attempt += 1
+
+
+class AsyncPolicyStreamInterceptor(grpc.aio.UnaryStreamClientInterceptor):
+    """Circuit breaker для потоковых вызовов grpc.aio (каналу нужен отдельный
+    от AsyncPolicyInterceptor экземпляр)
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+
+    async def _record(self, call):
+        self.policy.breaker.record(await call.code())
+
+    async def intercept_unary_stream(self, continuation, client_call_details, request):
+        breaker = self.policy.breaker
+        if not breaker.allow():
+            raise CircuitOpenError()
+        try:
+            call = await continuation(client_call_details, request)
+        except grpc.RpcError as e:
+            breaker.record(e.code())
+            raise
+        # Статус завершенного вызова доступен сразу, но code() - корутина
+        call.add_done_callback(lambda call: asyncio.ensure_future(self._record(call)))
+        return call
+
+
+def create_rpc_policy(config):
+    return RpcPolicy(
+        default_deadline=config["POST_SERVICE_DEADLINE"],
+        deadlines=parse_deadlines(config["POST_SERVICE_DEADLINES"]),
+        max_retries=config["POST_SERVICE_READ_RETRIES"],
+        backoff=config["POST_SERVICE_RETRY_BACKOFF"],
+        retry_budget=RetryBudget(
+            ratio=config["POST_SERVICE_RETRY_BUDGET_RATIO"],
+            min_per_second=config["POST_SERVICE_RETRY_MIN_PER_SECOND"],
+        ),
+        breaker=CircuitBreaker(
+            failure_threshold=config["POST_SERVICE_CIRCUIT_FAILURE_THRESHOLD"],
+            reset_timeout=config["POST_SERVICE_CIRCUIT_RESET_TIMEOUT"],
+        ),
+    )
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+import grpc
+
+import post_service_pb2
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Схлопывает одновременные вызовы с одинаковым ключом в один вызов fn.
+
+    Первый поток (лидер) выполняет fn, остальные ждут и получают тот же
+    результат или то же исключение
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class AsyncSingleFlight:
+    """То же, что SingleFlight, для корутин одного event loop.
+
+    Вызов выполняется отдельной задачей: отмена лидера (например, клиент
+    оборвал соединение) не отменяет запрос для остальных ждущих
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.shared = 0
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.shared += 1
+
+        return await asyncio.shield(task)
+
+
+def _load_post(stub, post_id, requester_id):
+    request = post_service_pb2.GetPostRequest(
+        post_id=post_id, requester_id=requester_id
+    )
+    try:
+        return requester_id, stub.GetPost(request), None
+    except grpc.RpcError as e:
+        return requester_id, None, e
+
+
+def _shared_result_applies(fetched_by, post, error, requester_id):
+    # Ответ Post Service зависит от запрашивающего только для приватных постов:
+    # чужой ответ подходит, если он совпал бы с ответом на наш собственный запрос
+    if fetched_by == requester_id:
+        return True
+    if error is not None:
+        return error.code() != grpc.StatusCode.PERMISSION_DENIED
+    return not post.is_private or post.creator_id == requester_id
+
+
+def get_post_coalesced(flights, stub, post_id, requester_id):
+    fetched_by, post, error = flights.do(
+        post_id, lambda: _load_post(stub, post_id, requester_id)
+    )
+
+    if not _shared_result_applies(fetched_by, post, error, requester_id):
+        fetched_by, post, error = _load_post(stub, post_id, requester_id)
+
+    if error is not None:
+        raise error
+    return post
+
+
+async def get_post_coalesced_async(flights, stub, post_id, requester_id):
+    async def load():
+        request = post_service_pb2.GetPostRequest(
+            post_id=post_id, requester_id=requester_id
+        )
+        try:
+            return requester_id, await stub.GetPost(request), None
+        except grpc.RpcError as e:
+            return requester_id, None, e
+
+    fetched_by, post, error = await flights.do(post_id, load)
+
+    if not _shared_result_applies(fetched_by, post, error, requester_id):
+        fetched_by, post, error = await load()
+
+    if error is not None:
+        raise error
+    return post
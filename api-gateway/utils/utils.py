@@ -1,16 +1,53 @@
-import grpc
 from functools import wraps
-from flask import jsonify
-from flask_jwt_extended import verify_jwt_in_request
-from google.protobuf.json_format import MessageToDict
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from functools import lru_cache
 import datetime
+import hashlib
+import grpc
+
+from utils.channels import get_channel_pool
+
+import post_service_pb2
+
+
+def get_bearer_token():
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        return auth_header[len("Bearer ") :]
+    return None
+
+
+def verify_jwt_cached():
+    """verify_jwt_in_request(), пропускающий повторную проверку уже виденного токена"""
+    if g.get("_jwt_extended_jwt"):
+        # Токен уже проверен в этом запросе, например при допуске запроса
+        return
+
+    token_cache = current_app.extensions.get("jwt_token_cache")
+    token = get_bearer_token()
+    if token_cache is None or token is None:
+        verify_jwt_in_request()
+        return
+
+    cached = token_cache.get(token)
+    if cached is not None:
+        # Те же поля, что заполняет verify_jwt_in_request, их читает get_jwt_identity
+        g._jwt_extended_jwt_header, g._jwt_extended_jwt = cached
+        g._jwt_extended_jwt_user = {"loaded_user": None}
+        g._jwt_extended_jwt_location = "headers"
+        return
+
+    verified = verify_jwt_in_request()
+    if verified is not None:
+        token_cache.set(token, *verified)
 
 
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         try:
-            verify_jwt_in_request()
+            verify_jwt_cached()
             return f(*args, **kwargs)
         except Exception as e:
             return jsonify({"message": "Authentication required", "error": str(e)}), 401
@@ -18,28 +55,221 @@ def token_required(f):
     return decorated
 
 
-def get_post_service_stub():
-    from config import Config
-    import post_service_pb2_grpc
+def get_client_key():
+    """Ключ пользовательского rate limit: проверенный пользователь или адрес клиента"""
+    if get_bearer_token() is not None:
+        try:
+            verify_jwt_cached()
+            return f"user:{get_jwt_identity()}"
+        except Exception:
+            pass
+    return f"ip:{request.remote_addr}"
 
-    channel = grpc.insecure_channel(Config.POST_SERVICE_GRPC)
 
-    return post_service_pb2_grpc.PostServiceStub(channel)
+def get_post_service_stub():
+    return get_channel_pool().get_stub()
 
 
-def proto_timestamp_to_datetime(timestamp):
+@lru_cache(maxsize=4096)
+def _timestamp_isoformat(seconds, nanos):
     dt = datetime.datetime.fromtimestamp(
-        timestamp.seconds + timestamp.nanos / 1e9, tz=datetime.timezone.utc
+        seconds + nanos / 1e9, tz=datetime.timezone.utc
     )
     return dt.isoformat()
 
 
+def proto_timestamp_to_datetime(timestamp):
+    # created_at и updated_at часто совпадают, а посты в лентах повторяются,
+    # поэтому строки для уже встречавшихся таймстемпов берем из кеша
+    return _timestamp_isoformat(timestamp.seconds, timestamp.nanos)
+
+
 def proto_post_to_dict(post):
-    post_dict = MessageToDict(post, preserving_proto_field_name=True)
+    """Post -> dict той же формы, что MessageToDict(preserving_proto_field_name=True).
+
+    Как и MessageToDict, поля со значением по умолчанию в результат не попадают.
+    Счетчики (views_count и др.) не отдаются: версия поста (ETag, кеш) от них
+    не зависит, свежие значения есть в /full и ответах на лайк и просмотр
+    """
+    post_dict = {}
 
-    if "created_at" in post_dict:
+    if post.id:
+        post_dict["id"] = post.id
+    if post.title:
+        post_dict["title"] = post.title
+    if post.description:
+        post_dict["description"] = post.description
+    if post.creator_id:
+        post_dict["creator_id"] = post.creator_id
+    if post.HasField("created_at"):
         post_dict["created_at"] = proto_timestamp_to_datetime(post.created_at)
-    if "updated_at" in post_dict:
+    if post.HasField("updated_at"):
         post_dict["updated_at"] = proto_timestamp_to_datetime(post.updated_at)
+    if post.is_private:
+        post_dict["is_private"] = post.is_private
+    if post.tags:
+        post_dict["tags"] = list(post.tags)
 
     return post_dict
+
+
+def proto_posts_to_dicts(posts):
+    return [proto_post_to_dict(post) for post in posts]
+
+
+def proto_comment_to_dict(comment):
+    return {
+        "id": comment.id,
+        "post_id": comment.post_id,
+        "user_id": comment.user_id,
+        "text": comment.text,
+        "created_at": proto_timestamp_to_datetime(comment.created_at),
+    }
+
+
+def proto_comments_to_dicts(comments):
+    return [proto_comment_to_dict(comment) for comment in comments]
+
+
+COUNT_MODES = {
+    "exact": post_service_pb2.COUNT_EXACT,
+    "cached": post_service_pb2.COUNT_CACHED,
+    "estimate": post_service_pb2.COUNT_ESTIMATE,
+    "none": post_service_pb2.COUNT_NONE,
+}
+
+
+def _totals(response, counted):
+    # При count=none Post Service не считает строки, остается только has_more
+    if not counted:
+        return {"total_count": None, "total_pages": None}
+    return {"total_count": response.total_count, "total_pages": response.total_pages}
+
+
+def list_posts_to_dict(response, args, counted=True):
+    """Ответ GET /api/posts; в режиме курсора номера страницы нет"""
+    result = {
+        "posts": proto_posts_to_dicts(response.posts),
+        **_totals(response, counted),
+        "has_more": response.has_more,
+        "per_page": args.get("per_page", 10),
+        "next_cursor": response.next_cursor or None,
+    }
+    if "cursor" not in args:
+        result["page"] = args.get("page", 1)
+    return result
+
+
+def comments_page_to_dict(response, page, per_page, counted=True):
+    return {
+        "comments": proto_comments_to_dicts(response.comments),
+        **_totals(response, counted),
+        "has_more": response.has_more,
+        "page": page,
+        "per_page": per_page,
+    }
+
+
+def post_details_to_dict(post_data, comments, counts, per_page):
+    """Ответ GET /api/posts/<id>/full: пост, первая страница комментариев и счетчики.
+
+    Комментарии запрашиваются без подсчета: их число уже есть в counts
+    """
+    comments_page = comments_page_to_dict(comments, 1, per_page, counted=False)
+    comments_page["total_count"] = counts.comments_count
+    comments_page["total_pages"] = -(-counts.comments_count // per_page)
+    return {
+        "post": post_data,
+        "comments": comments_page,
+        "likes_count": counts.likes_count,
+        "views_count": counts.views_count,
+        "comments_count": counts.comments_count,
+    }
+
+
+BATCH_RESULT_STATUSES = {
+    post_service_pb2.BatchGetPostsResult.OK: "ok",
+    post_service_pb2.BatchGetPostsResult.NOT_FOUND: "not_found",
+    post_service_pb2.BatchGetPostsResult.PERMISSION_DENIED: "forbidden",
+}
+
+
+def batch_result_to_dict(result):
+    result_dict = {
+        "id": result.post_id,
+        "status": BATCH_RESULT_STATUSES[result.status],
+    }
+    if result.HasField("post"):
+        result_dict["post"] = proto_post_to_dict(result.post)
+    return result_dict
+
+
+VIEW_RESULT_STATUSES = {
+    post_service_pb2.RecordViewsResult.OK: "ok",
+    post_service_pb2.RecordViewsResult.NOT_FOUND: "not_found",
+    post_service_pb2.RecordViewsResult.PERMISSION_DENIED: "forbidden",
+}
+
+
+def view_result_to_dict(result):
+    result_dict = {"id": result.post_id, "status": VIEW_RESULT_STATUSES[result.status]}
+    if result.status == post_service_pb2.RecordViewsResult.OK:
+        result_dict["views_count"] = result.views_count
+        result_dict["recorded"] = result.recorded
+    return result_dict
+
+
+def split_ids_arg(values):
+    # ?ids=1,2&ids=3 -> ["1", "2", "3"]
+    return [part for value in values for part in value.split(",") if part]
+
+
+def post_etag(post_id, updated_at):
+    """Сильный ETag поста по id и updated_at (строка в isoformat, как в ответе).
+
+    Post Service обновляет updated_at при любом изменении поста, включая теги
+    """
+    digest = hashlib.sha1(f"{post_id}:{updated_at}".encode()).hexdigest()
+    return f'"p{post_id}-{digest[:16]}"'
+
+
+def comments_etag(post_id, page, per_page, response):
+    """ETag страницы комментариев: комментарии не редактируются, поэтому
+    страницу однозначно определяют id и created_at ее комментариев и total_count
+    """
+    digest = hashlib.sha1(
+        f"{post_id}:{page}:{per_page}:{response.total_count}:{response.has_more}".encode()
+    )
+    for comment in response.comments:
+        created_at = comment.created_at
+        digest.update(f":{comment.id}:{created_at.seconds}.{created_at.nanos}".encode())
+    return f'"c{post_id}-{digest.hexdigest()[:16]}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Проверка If-None-Match (слабое сравнение, RFC 7232 3.2)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def posts_to_ndjson(first, posts, dumps):
+    """Строки NDJSON по мере чтения server-streaming ответа StreamPosts.
+
+    Статус ответа уже отправлен, поэтому ошибка посреди потока передается
+    последней строкой {"error": ...}. Поток gRPC отменяется, если клиент
+    отключился раньше
+    """
+    try:
+        if first is not None:
+            yield dumps(proto_post_to_dict(first)) + "\n"
+        for post in posts:
+            yield dumps(proto_post_to_dict(post)) + "\n"
+    except grpc.RpcError as e:
+        yield dumps({"error": e.details()}) + "\n"
+    finally:
+        posts.cancel()
@@ -1,6 +1,12 @@
 from marshmallow import Schema, fields, validates, ValidationError
 import re
 
+TAG_PATTERN = re.compile(r"^[a-zA-Z0-9_\-]+$")
+# Курсор ListPosts непрозрачен для гейтвея, проверяется только длина
+MAX_CURSOR_LENGTH = 200
+# Способы подсчета total_count (параметр count), см. CountMode в proto
+COUNT_MODE_NAMES = ("exact", "cached", "estimate", "none")
+
 
 class CreatePostSchema(Schema):
     title = fields.String(required=True)
@@ -26,7 +32,7 @@ class CreatePostSchema(Schema):
         for tag in value:
             if len(tag) < 2 or len(tag) > 50:
                 raise ValidationError("Tag must be between 2 and 50 characters")
-            if not re.match(r"^[a-zA-Z0-9_\-]+$", tag):
+            if not TAG_PATTERN.match(tag):
                 raise ValidationError(
                     "Tag can only contain letters, numbers, underscores and hyphens"
                 )
@@ -57,7 +63,7 @@ class UpdatePostSchema(Schema):
             for tag in value:
                 if len(tag) < 2 or len(tag) > 50:
                     raise ValidationError("Tag must be between 2 and 50 characters")
-                if not re.match(r"^[a-zA-Z0-9_\-]+$", tag):
+                if not TAG_PATTERN.match(tag):
                     raise ValidationError(
                         "Tag can only contain letters, numbers, underscores and hyphens"
                     )
@@ -68,6 +74,22 @@ class ListPostsSchema(Schema):
     per_page = fields.Integer(dump_default=10)
     only_own = fields.Boolean(dump_default=False)
     tags = fields.List(fields.String(), dump_default=[])
+    cursor = fields.String()
+    count = fields.String()
+
+    @validates("count")
+    def validate_count(self, value):
+        if value not in COUNT_MODE_NAMES:
+            raise ValidationError(
+                f"count must be one of: {', '.join(COUNT_MODE_NAMES)}"
+            )
+
+    @validates("cursor")
+    def validate_cursor(self, value):
+        if not 1 <= len(value) <= MAX_CURSOR_LENGTH:
+            raise ValidationError(
+                f"cursor must be between 1 and {MAX_CURSOR_LENGTH} characters"
+            )
 
     @validates("page")
     def validate_page(self, value):
@@ -78,3 +100,119 @@ class ListPostsSchema(Schema):
     def validate_per_page(self, value):
         if value < 1 or value > 100:
             raise ValidationError("per_page must be between 1 and 100")
+
+
+class StreamPostsSchema(Schema):
+    only_own = fields.Boolean(dump_default=False)
+    tags = fields.List(fields.String(), dump_default=[])
+    limit = fields.Integer(dump_default=0)
+
+    @validates("limit")
+    def validate_limit(self, value):
+        if value < 0:
+            raise ValidationError("limit must be a non-negative integer")
+
+
+class BatchGetPostsSchema(Schema):
+    ids = fields.List(fields.Integer(), required=True)
+
+    @validates("ids")
+    def validate_ids(self, value):
+        if len(value) < 1 or len(value) > 100:
+            raise ValidationError("Between 1 and 100 post IDs are allowed")
+
+
+class RecordViewsSchema(Schema):
+    post_ids = fields.List(fields.Integer(), required=True)
+
+    @validates("post_ids")
+    def validate_post_ids(self, value):
+        if len(value) < 1 or len(value) > 100:
+            raise ValidationError("Between 1 and 100 post IDs are allowed")
+
+
+# Схемы не хранят состояния между вызовами validate(), поэтому создаются
+# один раз при импорте, а не на каждый запрос
+create_post_schema = CreatePostSchema()
+update_post_schema = UpdatePostSchema()
+list_posts_schema = ListPostsSchema()
+batch_get_posts_schema = BatchGetPostsSchema()
+stream_posts_schema = StreamPostsSchema()
+record_views_schema = RecordViewsSchema()
+
+CREATE_POST_FIELDS = frozenset(["title", "description", "is_private", "tags"])
+LIST_POSTS_FIELDS = frozenset(
+    ["page", "per_page", "only_own", "tags", "cursor", "count"]
+)
+
+
+def _tags_are_valid(tags):
+    if type(tags) is not list or len(tags) > 10:
+        return False
+    for tag in tags:
+        if type(tag) is not str or not 2 <= len(tag) <= 50:
+            return False
+        if not TAG_PATTERN.match(tag):
+            return False
+    return True
+
+
+def _create_post_is_valid(data):
+    if type(data) is not dict or not data.keys() <= CREATE_POST_FIELDS:
+        return False
+
+    title = data.get("title")
+    description = data.get("description")
+    if type(title) is not str or not 3 <= len(title) <= 255:
+        return False
+    if type(description) is not str or not 10 <= len(description) <= 2000:
+        return False
+    if "is_private" in data and type(data["is_private"]) is not bool:
+        return False
+    if "tags" in data and not _tags_are_valid(data["tags"]):
+        return False
+    return True
+
+
+def _list_posts_is_valid(args):
+    if not args.keys() <= LIST_POSTS_FIELDS:
+        return False
+
+    page = args.get("page", 1)
+    per_page = args.get("per_page", 10)
+    if type(page) is not int or page < 1:
+        return False
+    if type(per_page) is not int or not 1 <= per_page <= 100:
+        return False
+    if "only_own" in args and type(args["only_own"]) is not bool:
+        return False
+    if "count" in args and args["count"] not in COUNT_MODE_NAMES:
+        return False
+    if "cursor" in args and (
+        type(args["cursor"]) is not str
+        or not 1 <= len(args["cursor"]) <= MAX_CURSOR_LENGTH
+    ):
+        return False
+    if "tags" in args and (
+        type(args["tags"]) is not list
+        or any(type(tag) is not str for tag in args["tags"])
+    ):
+        return False
+    return True
+
+
+def validate_create_post(data):
+    """Быстрая проверка типичного корректного запроса.
+
+    Fast path принимает только то, что приняла бы и схема, а при любом
+    сомнении отдает данные схеме, поэтому тексты ошибок не меняются
+    """
+    if _create_post_is_valid(data):
+        return {}
+    return create_post_schema.validate(data)
+
+
+def validate_list_posts(args):
+    if _list_posts_is_valid(args):
+        return {}
+    return list_posts_schema.validate(args)
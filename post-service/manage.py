@@ -0,0 +1,34 @@
+"""Служебные команды Post Service: python manage.py <команда>"""
+
+import argparse
+
+from models.post import Session
+from models.schema import upgrade_database
+from utils.counters import reconcile_counters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="apply schema migrations")
+    reconcile = commands.add_parser(
+        "reconcile-counters",
+        help="recompute views, likes and comments counters from the raw tables",
+    )
+    reconcile.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        upgrade_database()
+        return
+
+    session = Session()
+    try:
+        fixed = reconcile_counters(session, args.batch_size)
+    finally:
+        session.close()
+    print(f"Counters fixed for {fixed} posts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+from alembic import context
+
+from models.post import Base, engine
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    """SQL миграций без подключения к БД (alembic upgrade --sql)"""
+    context.configure(
+        url=engine.url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations(connection):
+    # Каждая ревизия в своей транзакции: ревизии с CREATE INDEX CONCURRENTLY
+    # коммитят все, что было до них
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+    with engine.connect() as connection:
+        run_migrations(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
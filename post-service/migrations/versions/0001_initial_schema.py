@@ -0,0 +1,71 @@
+"""Схема, которую создавал create_all() до появления миграций
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "tags",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(50), nullable=False, unique=True),
+    )
+    op.create_table(
+        "posts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(255), nullable=False),
+        sa.Column("description", sa.String(2000), nullable=False),
+        sa.Column("creator_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+        sa.Column("is_private", sa.Boolean()),
+    )
+    op.create_table(
+        "post_tags",
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id")),
+        sa.Column("tag_id", sa.Integer(), sa.ForeignKey("tags.id")),
+    )
+    op.create_table(
+        "post_views",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("viewed_at", sa.DateTime()),
+    )
+    op.create_table(
+        "post_likes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("liked_at", sa.DateTime()),
+    )
+    op.create_table(
+        "comments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("text", sa.String(1000), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+
+
+def downgrade():
+    for table in (
+        "comments",
+        "post_likes",
+        "post_views",
+        "post_tags",
+        "posts",
+        "tags",
+    ):
+        op.drop_table(table)
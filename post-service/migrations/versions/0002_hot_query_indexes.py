@@ -0,0 +1,78 @@
+"""Индексы горячих запросов и уникальность просмотров и лайков
+
+Индексы строятся CONCURRENTLY (на PostgreSQL), чтобы не блокировать запись
+в таблицы на время построения. Такие команды не выполняются в транзакции,
+поэтому идут в autocommit-блоке; прерванное построение оставляет
+невалидный индекс, он удаляется при повторном запуске миграции.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (имя, таблица, колонки, unique)
+INDEXES = [
+    ("ix_posts_created_at_id", "posts", ["created_at", "id"], False),
+    (
+        "ix_posts_creator_id_created_at_id",
+        "posts",
+        ["creator_id", "created_at", "id"],
+        False,
+    ),
+    ("ix_post_tags_tag_id_post_id", "post_tags", ["tag_id", "post_id"], False),
+    ("ix_post_tags_post_id", "post_tags", ["post_id"], False),
+    ("uq_post_views_post_id_user_id", "post_views", ["post_id", "user_id"], True),
+    ("uq_post_likes_post_id_user_id", "post_likes", ["post_id", "user_id"], True),
+    ("ix_comments_post_id_created_at", "comments", ["post_id", "created_at"], False),
+]
+
+
+def _drop_invalid_index(name):
+    if op.get_context().dialect.name != "postgresql" or op.get_context().as_sql:
+        return
+    invalid = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    )
+    if invalid.first() is not None:
+        op.drop_index(name, postgresql_concurrently=True)
+
+
+def upgrade():
+    # Повторы, которые могли появиться при гонке проверки и вставки, иначе
+    # уникальный индекс не построится. Оставляется самая ранняя запись
+    for table in ("post_views", "post_likes"):
+        op.execute(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT MIN(id) FROM {table} GROUP BY post_id, user_id)"
+        )
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            _drop_invalid_index(name)
+            # ix_posts_created_at_id мог создать create_all() до миграций
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,44 @@
+"""Денормализованные счетчики просмотров, лайков и комментариев в posts
+
+Колонки добавляются со значением по умолчанию 0 и заполняются по текущим
+строкам. Если сервис со старым кодом успеет записать что-то между миграцией
+и перезапуском, счетчики выравнивает python manage.py reconcile-counters
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+COUNTERS = {
+    "views_count": "post_views",
+    "likes_count": "post_likes",
+    "comments_count": "comments",
+}
+
+
+def upgrade():
+    for counter in COUNTERS:
+        op.add_column(
+            "posts",
+            sa.Column(counter, sa.Integer(), nullable=False, server_default="0"),
+        )
+
+    assignments = ", ".join(
+        f"{counter} = (SELECT COUNT(*) FROM {table} WHERE {table}.post_id = posts.id)"
+        for counter, table in COUNTERS.items()
+    )
+    op.execute(f"UPDATE posts SET {assignments}")
+
+
+def downgrade():
+    with op.batch_alter_table("posts") as batch:
+        for counter in COUNTERS:
+            batch.drop_column(counter)
@@ -6,8 +6,8 @@ from sqlalchemy import (
     DateTime,
     Table,
     ForeignKey,
+    Index,
     create_engine,
-    UniqueConstraint
 )
 from sqlalchemy.orm import relationship, sessionmaker, declarative_base
 from datetime import datetime
@@ -25,6 +25,9 @@ post_tags = Table(
     Base.metadata,
     Column("post_id", Integer, ForeignKey("posts.id")),
     Column("tag_id", Integer, ForeignKey("tags.id")),
+    # Фильтр по тегам (EXISTS по tag_id) и подгрузка тегов страницы по post_id
+    Index("ix_post_tags_tag_id_post_id", "tag_id", "post_id"),
+    Index("ix_post_tags_post_id", "post_id"),
 )
 
 
@@ -45,9 +48,21 @@ class Post(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     is_private = Column(Boolean, default=False)
+    # Меняются в одной транзакции с записью в post_views, post_likes и
+    # comments; пересчет с нуля - python manage.py reconcile-counters
+    views_count = Column(Integer, nullable=False, default=0, server_default="0")
+    likes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comments_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     tags = relationship("Tag", secondary=post_tags, backref="posts")
 
+    __table_args__ = (
+        # Порядок лент (created_at DESC, id DESC) и keyset-пагинация ListPosts
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        # Лента only_own: creator_id = ? в том же порядке
+        Index("ix_posts_creator_id_created_at_id", "creator_id", "created_at", "id"),
+    )
+
 
 class PostView(Base):
     __tablename__ = "post_views"
@@ -59,6 +74,12 @@ class PostView(Base):
 
     post = relationship("Post")
 
+    __table_args__ = (
+        # Один просмотр на пользователя; индекс же обслуживает проверку
+        # существования и COUNT по post_id
+        Index("uq_post_views_post_id_user_id", "post_id", "user_id", unique=True),
+    )
+
 
 class PostLike(Base):
     __tablename__ = "post_likes"
@@ -70,6 +91,10 @@ class PostLike(Base):
 
     post = relationship("Post")
 
+    __table_args__ = (
+        Index("uq_post_likes_post_id_user_id", "post_id", "user_id", unique=True),
+    )
+
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -82,6 +107,7 @@ class Comment(Base):
 
     post = relationship("Post")
 
-
-def create_tables():
-    Base.metadata.create_all(engine)
+    __table_args__ = (
+        # Страница комментариев поста в порядке created_at и их COUNT
+        Index("ix_comments_post_id_created_at", "post_id", "created_at"),
+    )
@@ -0,0 +1,56 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+from models.post import engine as default_engine
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+
+# Схема, которую создавал create_all() до появления миграций
+BASELINE_REVISION = "0001"
+
+# Ключ pg_advisory_lock: реплики, стартующие одновременно, мигрируют по очереди
+MIGRATION_LOCK_ID = 7_310_001
+
+
+def alembic_config(connection=None):
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.attributes["connection"] = connection
+    return config
+
+
+def upgrade_database(engine=default_engine, revision="head"):
+    """Доводит схему БД до revision.
+
+    База, созданная create_all() без миграций, сначала помечается базовой
+    ревизией, чтобы миграции не пытались создать ее таблицы заново
+    """
+    locked = engine.dialect.name == "postgresql"
+    with engine.connect() as connection:
+        if locked:
+            connection.execute(
+                text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_ID}
+            )
+        try:
+            inspector = inspect(connection)
+            unversioned = not inspector.has_table(
+                "alembic_version"
+            ) and inspector.has_table("posts")
+            # Блокировка сессионная и переживает commit; миграции с
+            # CONCURRENTLY должны начинаться вне транзакции
+            connection.commit()
+
+            config = alembic_config(connection)
+            if unversioned:
+                command.stamp(config, BASELINE_REVISION)
+            command.upgrade(config, revision)
+        finally:
+            if locked:
+                connection.execute(
+                    text("SELECT pg_advisory_unlock(:key)"),
+                    {"key": MIGRATION_LOCK_ID},
+                )
+                connection.commit()
@@ -2,17 +2,26 @@ from datetime import datetime
 import grpc
 import logging
 import sys
+import os
 import json
 
 from concurrent import futures
-from sqlalchemy.exc import SQLAlchemyError
-from google.protobuf.timestamp_pb2 import Timestamp
+from sqlalchemy import insert, tuple_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import selectinload
 from google.protobuf.empty_pb2 import Empty
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
 
 import post_service_pb2
 import post_service_pb2_grpc
 
-from models.post import Post, Tag, Session, create_tables, PostView, PostLike, Comment
+from models.post import Post, Tag, Session, PostView, PostLike, Comment
+from models.schema import upgrade_database
+from utils.single_flight import SingleFlight
+from utils.pagination import decode_cursor, encode_cursor
+from utils.counting import CountCache, count_rows
+from utils.counters import bump_counter
+from utils.seen_views import SEEN, UNKNOWN, SeenViews
 
 from kafka import KafkaProducer
 
@@ -22,6 +31,34 @@ producer = KafkaProducer(
 )
 
 MAX_WORKERS = 10
+HEALTH_SERVICE = post_service_pb2.DESCRIPTOR.services_by_name["PostService"].full_name
+MAX_BATCH_SIZE = 100
+# Сколько строк StreamPosts читает из БД за один раз
+STREAM_BATCH_SIZE = 200
+# Сколько секунд живет total_count для count_mode=COUNT_CACHED
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", 30))
+# Фильтр уже записанных просмотров: сколько пар (post_id, viewer_id) помнит
+# фильтр Блума (и сколько последних просмотров читается при старте), доля
+# ложных "возможно" и размер LRU точно известных пар
+SEEN_VIEWS_CAPACITY = int(os.getenv("SEEN_VIEWS_CAPACITY", 1_000_000))
+SEEN_VIEWS_FP_RATE = float(os.getenv("SEEN_VIEWS_FP_RATE", 0.01))
+SEEN_VIEWS_RECENT_SIZE = int(os.getenv("SEEN_VIEWS_RECENT_SIZE", 100_000))
+
+# Сжатие ответов по умолчанию: none, gzip или deflate. Гейтвей выбирает
+# сжатие своих запросов отдельно (POST_SERVICE_GRPC_COMPRESSION)
+GRPC_COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}[os.getenv("GRPC_COMPRESSION", "none")]
+
+# Разрешаем keepalive-пинги от пула каналов гейтвея, иначе сервер
+# закрывает простаивающие соединения с GOAWAY (too_many_pings)
+SERVER_OPTIONS = [
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.min_ping_interval_without_data_ms", 10000),
+    ("grpc.http2.max_ping_strikes", 0),
+]
 
 logging.basicConfig(
     level=logging.INFO,
@@ -32,9 +69,108 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def post_to_proto(post, message=None):
+    """Заполняет proto-сообщение Post из ORM-объекта.
+
+    message - уже добавленный элемент ответа (response.posts.add()), чтобы
+    не копировать собранное сообщение еще раз. Для списков постов теги
+    загружаются заранее (selectinload), иначе каждый пост - отдельный запрос
+    """
+    if message is None:
+        message = post_service_pb2.Post()
+    message.id = post.id
+    message.title = post.title
+    message.description = post.description
+    message.creator_id = post.creator_id
+    message.is_private = post.is_private
+    message.tags.extend(tag.name for tag in post.tags)
+    message.created_at.FromDatetime(post.created_at)
+    message.updated_at.FromDatetime(post.updated_at)
+    message.views_count = post.views_count
+    message.likes_count = post.likes_count
+    message.comments_count = post.comments_count
+    return message
+
+
+def comment_to_proto(comment, message=None):
+    if message is None:
+        message = post_service_pb2.Comment()
+    message.id = comment.id
+    message.post_id = comment.post_id
+    message.user_id = comment.user_id
+    message.text = comment.text
+    message.created_at.FromDatetime(comment.created_at)
+    return message
+
+
+def add_unique(session, row, counter):
+    """Вставляет просмотр или лайк и в той же транзакции увеличивает счетчик
+    поста. Возвращает новое значение счетчика; None, если такую же запись
+    (уникальный индекс post_id, user_id) уже вставил параллельный запрос
+    """
+    session.add(row)
+    try:
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        return None
+    value = bump_counter(session, counter, [row.post_id])[row.post_id]
+    session.commit()
+    return value
+
+
 class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
     """Реализация gRPC сервиса для работы с постами"""
 
+    def __init__(self):
+        self._post_reads = SingleFlight()
+        self._counts = CountCache(ttl=COUNT_CACHE_TTL)
+        self._seen_views = SeenViews(
+            capacity=SEEN_VIEWS_CAPACITY,
+            fp_rate=SEEN_VIEWS_FP_RATE,
+            recent_size=SEEN_VIEWS_RECENT_SIZE,
+        )
+
+    def warm_seen_views(self):
+        """Заполняет фильтр просмотров последними записями post_views"""
+        session = Session()
+        try:
+            pairs = (
+                session.query(PostView.post_id, PostView.user_id)
+                .order_by(PostView.id.desc())
+                .limit(SEEN_VIEWS_CAPACITY)
+                .yield_per(STREAM_BATCH_SIZE)
+            )
+            warmed = self._seen_views.warm(pairs)
+            logger.info(f"Seen views filter warmed with {warmed} views")
+        except SQLAlchemyError as e:
+            # Без прогрева фильтр чаще отвечает NEW, повторы отсекает
+            # уникальный индекс
+            logger.warning(f"Seen views filter warm-up failed: {e}")
+        finally:
+            session.close()
+
+    def _seen_post_ids(self, session, post_ids, viewer_id):
+        """Посты из post_ids, уже просмотренные viewer_id. В БД проверяются
+        только пары, про которые фильтр просмотров не знает точно
+        """
+        seen, unknown = set(), []
+        for post_id in post_ids:
+            state = self._seen_views.check(post_id, viewer_id)
+            if state == SEEN:
+                seen.add(post_id)
+            elif state == UNKNOWN:
+                unknown.append(post_id)
+
+        if unknown:
+            seen.update(
+                post_id
+                for (post_id,) in session.query(PostView.post_id).filter(
+                    PostView.user_id == viewer_id, PostView.post_id.in_(unknown)
+                )
+            )
+        return seen
+
     def CreatePost(self, request, context):
         """Создание нового поста"""
         session = Session()
@@ -56,24 +192,7 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
             session.add(post)
             session.commit()
 
-            response = post_service_pb2.Post(
-                id=post.id,
-                title=post.title,
-                description=post.description,
-                creator_id=post.creator_id,
-                is_private=post.is_private,
-                tags=[tag.name for tag in post.tags],
-            )
-
-            created_at = Timestamp()
-            created_at.FromDatetime(post.created_at)
-            response.created_at.CopyFrom(created_at)
-
-            updated_at = Timestamp()
-            updated_at.FromDatetime(post.updated_at)
-            response.updated_at.CopyFrom(updated_at)
-
-            return response
+            return post_to_proto(post)
         except SQLAlchemyError as e:
             session.rollback()
             context.set_code(grpc.StatusCode.INTERNAL)
@@ -82,13 +201,28 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
         finally:
             session.close()
 
+    def _load_post(self, post_id):
+        """Загружает пост с тегами в proto-снимок, не зависящий от сессии"""
+        session = Session()
+        try:
+            post = session.query(Post).get(post_id)
+            if not post:
+                return None
+
+            return post_to_proto(post)
+        finally:
+            session.close()
+
     def GetPost(self, request, context):
         """Получение поста по ID"""
-        session = Session()
         try:
-            post = session.query(Post).get(request.post_id)
+            # Одновременные чтения одного поста делят один запрос в БД,
+            # права доступа проверяются для каждого запрашивающего отдельно
+            post = self._post_reads.do(
+                request.post_id, lambda: self._load_post(request.post_id)
+            )
 
-            if not post:
+            if post is None:
                 context.set_code(grpc.StatusCode.NOT_FOUND)
                 context.set_details(f"Post with ID {request.post_id} not found")
                 return post_service_pb2.Post()
@@ -98,42 +232,110 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
                 context.set_details("Access denied to private post")
                 return post_service_pb2.Post()
 
-            response = post_service_pb2.Post(
-                id=post.id,
-                title=post.title,
-                description=post.description,
-                creator_id=post.creator_id,
-                is_private=post.is_private,
-                tags=[tag.name for tag in post.tags],
+            return post
+        except SQLAlchemyError as e:
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(f"Database error: {str(e)}")
+            return post_service_pb2.Post()
+
+    def GetPostVersion(self, request, context):
+        """Версия поста для условных запросов: только updated_at, без тегов"""
+        session = Session()
+        try:
+            row = (
+                session.query(
+                    Post.id, Post.updated_at, Post.is_private, Post.creator_id
+                )
+                .filter(Post.id == request.post_id)
+                .first()
             )
 
-            created_at = Timestamp()
-            created_at.FromDatetime(post.created_at)
-            response.created_at.CopyFrom(created_at)
+            if row is None:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details(f"Post with ID {request.post_id} not found")
+                return post_service_pb2.PostVersion()
 
-            updated_at = Timestamp()
-            updated_at.FromDatetime(post.updated_at)
-            response.updated_at.CopyFrom(updated_at)
+            if row.is_private and row.creator_id != request.requester_id:
+                context.set_code(grpc.StatusCode.PERMISSION_DENIED)
+                context.set_details("Access denied to private post")
+                return post_service_pb2.PostVersion()
 
-            return response
+            version = post_service_pb2.PostVersion(post_id=row.id)
+            version.updated_at.FromDatetime(row.updated_at)
+            return version
         except SQLAlchemyError as e:
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(f"Database error: {str(e)}")
-            return post_service_pb2.Post()
+            return post_service_pb2.PostVersion()
         finally:
             session.close()
 
-    def ListPosts(self, request, context):
-        """Получение списка постов с пагинацией"""
+    def GetPostCounts(self, request, context):
+        """Счетчики поста вместе с правами доступа - одна строка posts"""
         session = Session()
         try:
-            page = max(1, request.page)
-            per_page = min(max(1, request.per_page), 100)
+            row = (
+                session.query(
+                    Post.is_private,
+                    Post.creator_id,
+                    Post.likes_count,
+                    Post.views_count,
+                    Post.comments_count,
+                )
+                .filter(Post.id == request.post_id)
+                .first()
+            )
+
+            if row is None:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details(f"Post with ID {request.post_id} not found")
+                return post_service_pb2.PostCounts()
+
+            if row.is_private and row.creator_id != request.requester_id:
+                context.set_code(grpc.StatusCode.PERMISSION_DENIED)
+                context.set_details("Access denied to private post")
+                return post_service_pb2.PostCounts()
+
+            return post_service_pb2.PostCounts(
+                post_id=request.post_id,
+                likes_count=row.likes_count,
+                views_count=row.views_count,
+                comments_count=row.comments_count,
+            )
+        except SQLAlchemyError as e:
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(f"Database error: {str(e)}")
+            return post_service_pb2.PostCounts()
+        finally:
+            session.close()
+
+    def ListPosts(self, request, context):
+        """Получение списка постов с пагинацией.
+
+        С cursor страница начинается сразу после позиции курсора (keyset по
+        индексу created_at, id), поэтому ее стоимость не зависит от глубины,
+        а новые посты не сдвигают следующие страницы. Без cursor работает
+        прежний режим page/per_page; next_cursor возвращается в обоих
+        """
+        page = max(1, request.page)
+        per_page = min(max(1, request.per_page), 100)
+        after = None
+        if request.cursor:
+            try:
+                after = decode_cursor(request.cursor)
+            except ValueError:
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                context.set_details("Invalid cursor")
+                return post_service_pb2.ListPostsResponse()
 
+        session = Session()
+        try:
             query = session.query(Post)
 
             if request.tags:
-                query = query.join(Post.tags).filter(Tag.name.in_(request.tags))
+                # EXISTS, а не JOIN: пост с несколькими подходящими тегами
+                # не должен повторяться в выдаче и в total_count
+                query = query.filter(Post.tags.any(Tag.name.in_(request.tags)))
 
             if request.only_own:
                 query = query.filter(Post.creator_id == request.requester_id)
@@ -146,39 +348,41 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
                     )
                 )
 
-            total_count = query.count()
-            total_pages = (total_count + per_page - 1) // per_page
+            count_key = (
+                "posts",
+                request.only_own,
+                request.requester_id,
+                tuple(sorted(set(request.tags))),
+            )
+            total_count = count_rows(
+                request.count_mode, session, query, count_key, self._counts
+            )
 
-            posts = (
-                query.order_by(Post.created_at.desc())
-                .offset((page - 1) * per_page)
-                .limit(per_page)
-                .all()
+            # Теги всей страницы - одним IN-запросом, а не по запросу на пост
+            page_query = query.options(selectinload(Post.tags)).order_by(
+                Post.created_at.desc(), Post.id.desc()
             )
+            if after is not None:
+                page_query = page_query.filter(
+                    tuple_(Post.created_at, Post.id) < tuple_(*after)
+                )
+            else:
+                page_query = page_query.offset((page - 1) * per_page)
+            # Лишняя строка показывает, есть ли следующая страница
+            posts = page_query.limit(per_page + 1).all()
 
             response = post_service_pb2.ListPostsResponse(
-                total_count=total_count, total_pages=total_pages
+                has_more=len(posts) > per_page
             )
+            if total_count is not None:
+                response.total_count = total_count
+                response.total_pages = (total_count + per_page - 1) // per_page
+            if response.has_more:
+                posts = posts[:per_page]
+                response.next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
 
             for post in posts:
-                post_proto = post_service_pb2.Post(
-                    id=post.id,
-                    title=post.title,
-                    description=post.description,
-                    creator_id=post.creator_id,
-                    is_private=post.is_private,
-                    tags=[tag.name for tag in post.tags],
-                )
-
-                created_at = Timestamp()
-                created_at.FromDatetime(post.created_at)
-                post_proto.created_at.CopyFrom(created_at)
-
-                updated_at = Timestamp()
-                updated_at.FromDatetime(post.updated_at)
-                post_proto.updated_at.CopyFrom(updated_at)
-
-                response.posts.append(post_proto)
+                post_to_proto(post, response.posts.add())
 
             return response
         except SQLAlchemyError as e:
@@ -221,26 +425,12 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
                         session.add(tag)
                     post.tags.append(tag)
 
+            # onupdate не срабатывает, если изменились только теги или ничего,
+            # а updated_at служит версией поста для ETag
+            post.updated_at = datetime.now()
             session.commit()
 
-            response = post_service_pb2.Post(
-                id=post.id,
-                title=post.title,
-                description=post.description,
-                creator_id=post.creator_id,
-                is_private=post.is_private,
-                tags=[tag.name for tag in post.tags],
-            )
-
-            created_at = Timestamp()
-            created_at.FromDatetime(post.created_at)
-            response.created_at.CopyFrom(created_at)
-
-            updated_at = Timestamp()
-            updated_at.FromDatetime(post.updated_at)
-            response.updated_at.CopyFrom(updated_at)
-
-            return response
+            return post_to_proto(post)
         except SQLAlchemyError as e:
             session.rollback()
             context.set_code(grpc.StatusCode.INTERNAL)
@@ -295,17 +485,16 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
                 return post_service_pb2.Comment()
 
             # Если юзер уже посмотрел - я решил не отправлять еще раз
-            existing_view = (
-                session.query(PostView)
-                .filter_by(post_id=request.post_id, user_id=request.viewer_id)
-                .first()
-            )
-
-            if not existing_view:
-                view = PostView(post_id=request.post_id, user_id=request.viewer_id)
-                session.add(view)
-                session.commit()
-
+            views_count = None
+            if not self._seen_post_ids(session, [request.post_id], request.viewer_id):
+                views_count = add_unique(
+                    session,
+                    PostView(post_id=request.post_id, user_id=request.viewer_id),
+                    "views_count",
+                )
+            # Новый или нет, теперь просмотр точно записан
+            self._seen_views.add(request.post_id, request.viewer_id)
+            if views_count is not None:
                 event = {
                     "event_type": "post_viewed",
                     "post_id": request.post_id,
@@ -313,10 +502,8 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
                     "timestamp": datetime.now().isoformat(),
                 }
                 producer.send("post-views", event)
-
-            views_count = (
-                session.query(PostView).filter_by(post_id=request.post_id).count()
-            )
+            else:
+                views_count = post.views_count
 
             return post_service_pb2.ViewPostResponse(
                 success=True, views_count=views_count
@@ -330,6 +517,116 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
         finally:
             session.close()
 
+    def RecordViews(self, request, context):
+        """Просмотры нескольких постов фиксированным числом запросов в БД:
+        посты, уже записанные просмотры, вставка новых и увеличение их
+        счетчиков по IN-спискам
+        """
+        post_ids = list(dict.fromkeys(request.post_ids))
+        if len(post_ids) > MAX_BATCH_SIZE:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"At most {MAX_BATCH_SIZE} posts per batch")
+            return post_service_pb2.RecordViewsResponse()
+
+        viewer_id = request.viewer_id
+        session = Session()
+        try:
+            posts = {}
+            if post_ids:
+                posts = {
+                    row.id: row
+                    for row in session.query(
+                        Post.id, Post.is_private, Post.creator_id, Post.views_count
+                    ).filter(Post.id.in_(post_ids))
+                }
+            visible = [
+                post_id
+                for post_id, row in posts.items()
+                if not row.is_private or row.creator_id == viewer_id
+            ]
+
+            new_views = []
+            counts = {post_id: posts[post_id].views_count for post_id in visible}
+            if visible:
+                seen = self._seen_post_ids(session, visible, viewer_id)
+                new_views = [post_id for post_id in visible if post_id not in seen]
+                if new_views:
+                    try:
+                        session.execute(
+                            insert(PostView),
+                            [
+                                {"post_id": post_id, "user_id": viewer_id}
+                                for post_id in new_views
+                            ],
+                        )
+                        counts.update(bump_counter(session, "views_count", new_views))
+                        session.commit()
+                    except IntegrityError:
+                        # Часть просмотров уже есть в БД: их записал
+                        # параллельный запрос или они старше прогрева фильтра.
+                        # Остальные записываются по одному
+                        session.rollback()
+                        recorded = {
+                            post_id: add_unique(
+                                session,
+                                PostView(post_id=post_id, user_id=viewer_id),
+                                "views_count",
+                            )
+                            for post_id in new_views
+                        }
+                        new_views = [
+                            post_id
+                            for post_id, count in recorded.items()
+                            if count is not None
+                        ]
+                        counts.update(
+                            (post_id, recorded[post_id]) for post_id in new_views
+                        )
+
+                for post_id in visible:
+                    self._seen_views.add(post_id, viewer_id)
+
+            timestamp = datetime.now().isoformat()
+            for post_id in new_views:
+                producer.send(
+                    "post-views",
+                    {
+                        "event_type": "post_viewed",
+                        "post_id": post_id,
+                        "user_id": viewer_id,
+                        "timestamp": timestamp,
+                    },
+                )
+
+            response = post_service_pb2.RecordViewsResponse()
+            Result = post_service_pb2.RecordViewsResult
+            new_views = set(new_views)
+
+            for post_id in post_ids:
+                row = posts.get(post_id)
+                if row is None:
+                    response.results.add(post_id=post_id, status=Result.NOT_FOUND)
+                elif row.is_private and row.creator_id != viewer_id:
+                    response.results.add(
+                        post_id=post_id, status=Result.PERMISSION_DENIED
+                    )
+                else:
+                    response.results.add(
+                        post_id=post_id,
+                        status=Result.OK,
+                        views_count=counts[post_id],
+                        recorded=post_id in new_views,
+                    )
+
+            return response
+        except SQLAlchemyError as e:
+            session.rollback()
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(f"Database error: {str(e)}")
+            return post_service_pb2.RecordViewsResponse()
+        finally:
+            session.close()
+
     def LikePost(self, request, context):
         """Обрабатывает лайки постов и отправляет событие в Kafka"""
         session = Session()
@@ -356,23 +653,26 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
             if existing_like:
                 # Если уже поставил лайк - удаляем, как например в tg
                 session.delete(existing_like)
+                session.flush()
+                counts = bump_counter(session, "likes_count", [post.id], -1)
+                likes_count = counts[post.id]
                 session.commit()
             else:
-                like = PostLike(post_id=request.post_id, user_id=request.user_id)
-                session.add(like)
-                session.commit()
-
-                event = {
-                    "event_type": "post_liked",
-                    "post_id": request.post_id,
-                    "user_id": request.user_id,
-                    "timestamp": datetime.now().isoformat(),
-                }
-                producer.send("post-interactions", event)
-
-            likes_count = (
-                session.query(PostLike).filter_by(post_id=request.post_id).count()
-            )
+                likes_count = add_unique(
+                    session,
+                    PostLike(post_id=request.post_id, user_id=request.user_id),
+                    "likes_count",
+                )
+                if likes_count is None:
+                    likes_count = post.likes_count
+                else:
+                    event = {
+                        "event_type": "post_liked",
+                        "post_id": request.post_id,
+                        "user_id": request.user_id,
+                        "timestamp": datetime.now().isoformat(),
+                    }
+                    producer.send("post-interactions", event)
 
             return post_service_pb2.LikePostResponse(
                 success=True, likes_count=likes_count
@@ -407,6 +707,8 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
                 post_id=request.post_id, user_id=request.user_id, text=request.text
             )
             session.add(comment)
+            session.flush()
+            bump_counter(session, "comments_count", [post.id])
             session.commit()
 
             event = {
@@ -418,18 +720,7 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
             }
             producer.send("post-comments", event)
 
-            response = post_service_pb2.Comment(
-                id=comment.id,
-                post_id=comment.post_id,
-                user_id=comment.user_id,
-                text=comment.text,
-            )
-
-            created_at = Timestamp()
-            created_at.FromDatetime(comment.created_at)
-            response.created_at.CopyFrom(created_at)
-
-            return response
+            return comment_to_proto(comment)
 
         except SQLAlchemyError as e:
             session.rollback()
@@ -458,33 +749,27 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
             per_page = min(max(1, request.per_page), 100)
 
             query = session.query(Comment).filter_by(post_id=request.post_id)
-            total_count = query.count()
-            total_pages = (total_count + per_page - 1) // per_page
+            # Число комментариев уже есть в счетчике поста, COUNT не нужен
+            total_count = None
+            if request.count_mode != post_service_pb2.COUNT_NONE:
+                total_count = post.comments_count
 
             comments = (
                 query.order_by(Comment.created_at.asc())
                 .offset((page - 1) * per_page)
-                .limit(per_page)
+                .limit(per_page + 1)
                 .all()
             )
 
             response = post_service_pb2.GetCommentsResponse(
-                total_count=total_count, total_pages=total_pages
+                has_more=len(comments) > per_page
             )
+            if total_count is not None:
+                response.total_count = total_count
+                response.total_pages = (total_count + per_page - 1) // per_page
 
-            for comment in comments:
-                comment_proto = post_service_pb2.Comment(
-                    id=comment.id,
-                    post_id=comment.post_id,
-                    user_id=comment.user_id,
-                    text=comment.text,
-                )
-
-                created_at = Timestamp()
-                created_at.FromDatetime(comment.created_at)
-                comment_proto.created_at.CopyFrom(created_at)
-
-                response.comments.append(comment_proto)
+            for comment in comments[:per_page]:
+                comment_to_proto(comment, response.comments.add())
 
             return response
 
@@ -495,15 +780,109 @@ class PostServiceServicer(post_service_pb2_grpc.PostServiceServicer):
         finally:
             session.close()
 
+    def BatchGetPosts(self, request, context):
+        """Получение нескольких постов одним запросом с per-item статусом"""
+        post_ids = list(dict.fromkeys(request.post_ids))
+        if len(post_ids) > MAX_BATCH_SIZE:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"At most {MAX_BATCH_SIZE} posts per batch")
+            return post_service_pb2.BatchGetPostsResponse()
 
-def serve():
-    create_tables()
+        session = Session()
+        try:
+            posts = {}
+            if post_ids:
+                # Один IN-запрос за постами и один за их тегами (selectin)
+                query = (
+                    session.query(Post)
+                    .options(selectinload(Post.tags))
+                    .filter(Post.id.in_(post_ids))
+                )
+                posts = {post.id: post for post in query}
+
+            response = post_service_pb2.BatchGetPostsResponse()
+            Result = post_service_pb2.BatchGetPostsResult
+
+            for post_id in post_ids:
+                post = posts.get(post_id)
+                if post is None:
+                    response.results.add(post_id=post_id, status=Result.NOT_FOUND)
+                elif post.is_private and post.creator_id != request.requester_id:
+                    response.results.add(
+                        post_id=post_id, status=Result.PERMISSION_DENIED
+                    )
+                else:
+                    result = response.results.add(post_id=post_id, status=Result.OK)
+                    post_to_proto(post, result.post)
+
+            return response
+        except SQLAlchemyError as e:
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(f"Database error: {str(e)}")
+            return post_service_pb2.BatchGetPostsResponse()
+        finally:
+            session.close()
+
+    def StreamPosts(self, request, context):
+        """Потоковая выдача всех видимых постов, новые первыми.
+
+        Строки читаются из БД пачками по STREAM_BATCH_SIZE и отправляются по
+        мере чтения, поэтому память не зависит от размера выборки
+        """
+        session = Session()
+        try:
+            query = session.query(Post).options(selectinload(Post.tags))
+
+            if request.tags:
+                query = query.filter(Post.tags.any(Tag.name.in_(request.tags)))
+
+            if request.only_own:
+                query = query.filter(Post.creator_id == request.requester_id)
+            else:
+                query = query.filter(
+                    (Post.is_private == False)
+                    | (Post.creator_id == request.requester_id)
+                )
+
+            query = query.order_by(Post.created_at.desc(), Post.id.desc())
+            if request.limit > 0:
+                query = query.limit(request.limit)
+
+            for post in query.yield_per(STREAM_BATCH_SIZE):
+                yield post_to_proto(post)
+        except SQLAlchemyError as e:
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(f"Database error: {str(e)}")
+        finally:
+            session.close()
 
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=MAX_WORKERS))
+
+def create_server(servicer=None):
+    """gRPC-сервер с PostService и стандартным grpc.health.v1, по которому
+    гейтвей исключает недоступные реплики из балансировки"""
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=MAX_WORKERS),
+        options=SERVER_OPTIONS,
+        compression=GRPC_COMPRESSION,
+    )
     post_service_pb2_grpc.add_PostServiceServicer_to_server(
-        PostServiceServicer(), server
+        servicer or PostServiceServicer(), server
     )
 
+    health_servicer = health.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
+    for service in ("", HEALTH_SERVICE):
+        health_servicer.set(service, health_pb2.HealthCheckResponse.SERVING)
+
+    return server
+
+
+def serve():
+    upgrade_database()
+
+    servicer = PostServiceServicer()
+    servicer.warm_seen_views()
+    server = create_server(servicer)
     server.add_insecure_port("[::]:50051")
     server.start()
     logger.info("Post service started on port 50051")
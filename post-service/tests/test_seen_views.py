@@ -0,0 +1,57 @@
+import unittest
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.seen_views import NEW, SEEN, UNKNOWN, BloomFilter, SeenViews
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_has_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(capacity=1000, fp_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"added {i}".encode())
+
+        self.assertTrue(all(f"added {i}".encode() in bloom for i in range(1000)))
+        false_positives = sum(f"other {i}".encode() in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class TestSeenViews(unittest.TestCase):
+    def test_answers_seen_new_and_unknown(self):
+        views = SeenViews(capacity=100, fp_rate=0.01, recent_size=1)
+        views.add(1, 10)
+        views.add(2, 10)
+
+        # (1, 10) вытеснен из LRU, но остался в фильтре Блума
+        self.assertEqual(views.check(2, 10), SEEN)
+        self.assertEqual(views.check(1, 10), UNKNOWN)
+        self.assertEqual(views.check(1, 11), NEW)
+        self.assertEqual(views.stats()["checks"], {SEEN: 1, NEW: 1, UNKNOWN: 1})
+
+    def test_warm_fills_recent_views_first(self):
+        views = SeenViews(capacity=100, recent_size=3)
+
+        self.assertEqual(views.warm([(4, 1), (3, 1), (2, 1), (1, 1)]), 4)
+        # Новый просмотр вытесняет самую старую из прогретых пар
+        views.add(9, 1)
+        self.assertEqual(
+            [views.check(post_id, 1) for post_id in (9, 4, 3, 2, 1)],
+            [SEEN, SEEN, SEEN, UNKNOWN, UNKNOWN],
+        )
+
+    def test_full_filter_rotates_and_keeps_previous_generation(self):
+        views = SeenViews(capacity=10, recent_size=0)
+        for post_id in range(25):
+            views.add(post_id, 1)
+
+        # Проверяются текущее и предыдущее поколения, самое старое забыто
+        self.assertEqual(views.check(24, 1), UNKNOWN)
+        self.assertEqual(views.check(15, 1), UNKNOWN)
+        self.assertLessEqual(views.stats()["filtered"], 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,784 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+sys.modules.setdefault("kafka", MagicMock())
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, event
+
+import post_service_pb2
+import server
+from models.post import Base, Comment, Post, PostLike, PostView, Tag, Session, engine
+from models.schema import BASELINE_REVISION, alembic_config, upgrade_database
+from utils.counters import reconcile_counters
+from utils.seen_views import SEEN, UNKNOWN
+
+
+class ServerTestCase(unittest.TestCase):
+    """Тесты настоящего PostServiceServicer на SQLite в памяти"""
+
+    def setUp(self):
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.service = server.PostServiceServicer()
+        self.context = MagicMock()
+
+    def tearDown(self):
+        self.session.close()
+        Base.metadata.drop_all(engine)
+
+    def add_post(self, creator_id=1, is_private=False, tags=()):
+        post = Post(
+            title="Test post",
+            description="Test post description",
+            creator_id=creator_id,
+            is_private=is_private,
+            tags=[Tag(name=name) for name in tags],
+        )
+        self.session.add(post)
+        self.session.commit()
+        return post.id
+
+    def capture_statements(self, call):
+        """SQL-запросы (с параметрами), выполненные за call()"""
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, *args):
+            statements.append((statement, parameters))
+
+        event.listen(engine, "before_cursor_execute", before_execute)
+        try:
+            call()
+        finally:
+            event.remove(engine, "before_cursor_execute", before_execute)
+        return statements
+
+    def count_statements(self, call):
+        """Число SQL-запросов, выполненных за call()"""
+        return len(self.capture_statements(call))
+
+
+class TestBatchGetPosts(ServerTestCase):
+    def test_batch_returns_per_item_status_in_request_order(self):
+        public_id = self.add_post(tags=["news", "tech"])
+        private_id = self.add_post(creator_id=1, is_private=True)
+
+        request = post_service_pb2.BatchGetPostsRequest(
+            post_ids=[private_id, 999, public_id, public_id], requester_id=2
+        )
+        response = self.service.BatchGetPosts(request, self.context)
+
+        Result = post_service_pb2.BatchGetPostsResult
+        self.assertEqual(
+            [(result.post_id, result.status) for result in response.results],
+            [
+                (private_id, Result.PERMISSION_DENIED),
+                (999, Result.NOT_FOUND),
+                (public_id, Result.OK),
+            ],
+        )
+        self.assertEqual(list(response.results[2].post.tags), ["news", "tech"])
+        self.assertFalse(response.results[0].HasField("post"))
+
+    def test_batch_returns_private_post_to_creator(self):
+        private_id = self.add_post(creator_id=1, is_private=True)
+
+        request = post_service_pb2.BatchGetPostsRequest(
+            post_ids=[private_id], requester_id=1
+        )
+        response = self.service.BatchGetPosts(request, self.context)
+
+        self.assertEqual(
+            response.results[0].status, post_service_pb2.BatchGetPostsResult.OK
+        )
+        self.assertEqual(response.results[0].post.id, private_id)
+
+    def test_batch_rejects_too_many_ids(self):
+        request = post_service_pb2.BatchGetPostsRequest(
+            post_ids=range(1, server.MAX_BATCH_SIZE + 2), requester_id=1
+        )
+        self.service.BatchGetPosts(request, self.context)
+
+        self.context.set_code.assert_called_with(
+            server.grpc.StatusCode.INVALID_ARGUMENT
+        )
+
+
+class TestListPosts(ServerTestCase):
+    def list_posts(self, **kwargs):
+        request = post_service_pb2.ListPostsRequest(**kwargs)
+        return self.service.ListPosts(request, self.context)
+
+    def add_tagged_posts(self, count):
+        tags = [Tag(name=f"tag{i}") for i in range(3)]
+        for _ in range(count):
+            self.session.add(
+                Post(
+                    title="Test post",
+                    description="Test post description",
+                    creator_id=1,
+                    tags=tags,
+                )
+            )
+        self.session.commit()
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.add_tagged_posts(20)
+
+        small = self.count_statements(lambda: self.list_posts(per_page=2))
+        large = self.count_statements(lambda: self.list_posts(per_page=20))
+
+        # total_count, страница постов и теги страницы
+        self.assertEqual(small, 3)
+        self.assertEqual(large, small)
+
+    def test_page_carries_tags_and_timestamps(self):
+        self.add_tagged_posts(2)
+
+        response = self.list_posts(per_page=10)
+
+        self.assertEqual(response.total_count, 2)
+        for post in response.posts:
+            self.assertEqual(sorted(post.tags), ["tag0", "tag1", "tag2"])
+            self.assertGreater(post.created_at.seconds, 0)
+            self.assertGreaterEqual(
+                post.updated_at.ToDatetime(), post.created_at.ToDatetime()
+            )
+
+    def test_post_matching_several_tags_is_listed_once(self):
+        self.add_tagged_posts(1)
+
+        response = self.list_posts(tags=["tag0", "tag1"], per_page=10)
+
+        self.assertEqual(response.total_count, 1)
+        self.assertEqual(len(response.posts), 1)
+
+
+class TestListPostsCursor(ServerTestCase):
+    def list_posts(self, **kwargs):
+        request = post_service_pb2.ListPostsRequest(requester_id=1, **kwargs)
+        return self.service.ListPosts(request, self.context)
+
+    def test_cursor_pages_are_not_shifted_by_new_posts(self):
+        ids = [self.add_post() for _ in range(5)]
+
+        first = self.list_posts(per_page=2)
+        self.add_post()
+        second = self.list_posts(per_page=2, cursor=first.next_cursor)
+        third = self.list_posts(per_page=2, cursor=second.next_cursor)
+
+        pages = [[post.id for post in r.posts] for r in (first, second, third)]
+        self.assertEqual(pages, [ids[4:2:-1], ids[2:0:-1], ids[:1]])
+        self.assertEqual(third.next_cursor, "")
+
+    def test_same_created_at_is_ordered_by_id(self):
+        created_at = datetime(2024, 1, 1)
+        for _ in range(3):
+            self.session.add(
+                Post(
+                    title="Test post",
+                    description="Test post description",
+                    creator_id=1,
+                    created_at=created_at,
+                )
+            )
+        self.session.commit()
+
+        first = self.list_posts(per_page=2)
+        second = self.list_posts(per_page=2, cursor=first.next_cursor)
+
+        self.assertEqual(
+            [post.id for post in first.posts] + [post.id for post in second.posts],
+            [3, 2, 1],
+        )
+
+    def test_page_mode_still_returns_next_cursor(self):
+        for _ in range(3):
+            self.add_post()
+
+        response = self.list_posts(page=2, per_page=1)
+
+        self.assertEqual([post.id for post in response.posts], [2])
+        self.assertEqual(
+            [post.id for post in self.list_posts(cursor=response.next_cursor).posts],
+            [1],
+        )
+
+    def test_invalid_cursor_is_rejected(self):
+        self.list_posts(cursor="not a cursor")
+
+        self.context.set_code.assert_called_with(
+            server.grpc.StatusCode.INVALID_ARGUMENT
+        )
+
+
+class TestCountModes(ServerTestCase):
+    def list_posts(self, count_mode, **kwargs):
+        request = post_service_pb2.ListPostsRequest(
+            requester_id=1, per_page=2, count_mode=count_mode, **kwargs
+        )
+        return self.service.ListPosts(request, self.context)
+
+    def test_count_none_skips_count_and_reports_has_more(self):
+        for _ in range(3):
+            self.add_post()
+
+        exact = self.count_statements(
+            lambda: self.list_posts(post_service_pb2.COUNT_EXACT)
+        )
+        skipped = self.count_statements(
+            lambda: self.list_posts(post_service_pb2.COUNT_NONE)
+        )
+
+        self.assertEqual(skipped, exact - 1)
+        response = self.list_posts(post_service_pb2.COUNT_NONE)
+        self.assertTrue(response.has_more)
+        self.assertEqual(response.total_count, 0)
+        self.assertFalse(self.list_posts(post_service_pb2.COUNT_NONE, page=2).has_more)
+
+    def test_cached_count_is_reused_per_filter(self):
+        self.add_post()
+        self.list_posts(post_service_pb2.COUNT_CACHED)
+        self.add_post()
+
+        cached = self.list_posts(post_service_pb2.COUNT_CACHED)
+        other_filter = self.list_posts(post_service_pb2.COUNT_CACHED, only_own=True)
+
+        self.assertEqual(cached.total_count, 1)
+        self.assertEqual(other_filter.total_count, 2)
+
+    def test_comments_support_count_modes(self):
+        post_id = self.add_post()
+        self.session.add_all(
+            [Comment(post_id=post_id, user_id=1, text="Hi") for _ in range(3)]
+        )
+        self.session.commit()
+
+        request = post_service_pb2.GetCommentsRequest(
+            post_id=post_id, page=1, per_page=2, count_mode=post_service_pb2.COUNT_NONE
+        )
+        response = self.service.GetComments(request, self.context)
+
+        self.assertEqual(len(response.comments), 2)
+        self.assertTrue(response.has_more)
+        self.assertEqual(response.total_pages, 0)
+
+    def test_estimate_asks_postgres_planner(self):
+        from sqlalchemy.dialects import postgresql
+        from utils.counting import estimate_count
+
+        pg_session = MagicMock()
+        pg_session.get_bind.return_value.dialect = postgresql.dialect()
+        execute = pg_session.connection.return_value.exec_driver_sql
+        execute.return_value.scalar.return_value = [{"Plan": {"Plan Rows": 42}}]
+        query = self.session.query(Post).filter(Post.tags.any(Tag.name.in_(["a", "b"])))
+
+        self.assertEqual(estimate_count(pg_session, query), 42)
+        sql, params = execute.call_args[0]
+        self.assertTrue(sql.startswith("EXPLAIN (FORMAT JSON) SELECT"))
+        self.assertEqual(sorted(v for v in params.values()), ["a", "b"])
+
+
+class TestStreamPosts(ServerTestCase):
+    def stream(self, **kwargs):
+        request = post_service_pb2.StreamPostsRequest(**kwargs)
+        return list(self.service.StreamPosts(request, self.context))
+
+    def test_stream_yields_visible_posts_newest_first(self):
+        first_id = self.add_post(creator_id=1, tags=["news"])
+        private_id = self.add_post(creator_id=1, is_private=True)
+        last_id = self.add_post(creator_id=2)
+
+        self.assertEqual(
+            [post.id for post in self.stream(requester_id=2)], [last_id, first_id]
+        )
+        self.assertEqual(
+            [post.id for post in self.stream(requester_id=1)],
+            [last_id, private_id, first_id],
+        )
+
+    def test_stream_filters_by_tags_and_owner_and_respects_limit(self):
+        self.add_post(creator_id=1, tags=["news", "tech"])
+        self.add_post(creator_id=2)
+        own_id = self.add_post(creator_id=2)
+
+        tagged = self.stream(requester_id=2, tags=["news", "tech"])
+        self.assertEqual([list(post.tags) for post in tagged], [["news", "tech"]])
+
+        own = self.stream(requester_id=2, only_own=True, limit=1)
+        self.assertEqual([post.id for post in own], [own_id])
+
+    def test_stream_reads_rows_in_batches(self):
+        for _ in range(5):
+            self.add_post()
+
+        original = server.STREAM_BATCH_SIZE
+        server.STREAM_BATCH_SIZE = 2
+        try:
+            posts = self.stream(requester_id=1)
+        finally:
+            server.STREAM_BATCH_SIZE = original
+
+        self.assertEqual(len(posts), 5)
+
+
+class TestGetPostVersion(ServerTestCase):
+    def get_version(self, post_id, requester_id):
+        request = post_service_pb2.GetPostRequest(
+            post_id=post_id, requester_id=requester_id
+        )
+        return self.service.GetPostVersion(request, self.context)
+
+    def test_version_matches_post_updated_at(self):
+        post_id = self.add_post(tags=["news"])
+
+        version = self.get_version(post_id, 2)
+        post = self.service.GetPost(
+            post_service_pb2.GetPostRequest(post_id=post_id, requester_id=2),
+            self.context,
+        )
+
+        self.assertEqual(version.post_id, post_id)
+        self.assertEqual(version.updated_at, post.updated_at)
+
+    def test_version_checks_access_and_existence(self):
+        private_id = self.add_post(creator_id=1, is_private=True)
+
+        self.get_version(private_id, 2)
+        self.context.set_code.assert_called_with(
+            server.grpc.StatusCode.PERMISSION_DENIED
+        )
+        self.get_version(999, 1)
+        self.context.set_code.assert_called_with(server.grpc.StatusCode.NOT_FOUND)
+
+    def test_tags_only_update_changes_version(self):
+        post_id = self.add_post(creator_id=1, tags=["news"])
+        before = self.get_version(post_id, 1).updated_at.ToDatetime()
+
+        self.service.UpdatePost(
+            post_service_pb2.UpdatePostRequest(
+                post_id=post_id, updater_id=1, tags=["tech"]
+            ),
+            self.context,
+        )
+
+        self.assertGreater(self.get_version(post_id, 1).updated_at.ToDatetime(), before)
+
+
+class TestGetPostCounts(ServerTestCase):
+    def get_counts(self, post_id, requester_id):
+        request = post_service_pb2.GetPostRequest(
+            post_id=post_id, requester_id=requester_id
+        )
+        return self.service.GetPostCounts(request, self.context)
+
+    def test_counts_likes_views_and_comments_of_one_post(self):
+        post_id = self.add_post()
+        other_id = self.add_post()
+        for user_id in (1, 2, 3):
+            self.service.LikePost(
+                post_service_pb2.LikePostRequest(post_id=post_id, user_id=user_id),
+                self.context,
+            )
+        # Повторный лайк снимает лайк
+        self.service.LikePost(
+            post_service_pb2.LikePostRequest(post_id=post_id, user_id=3),
+            self.context,
+        )
+        self.service.ViewPost(
+            post_service_pb2.ViewPostRequest(post_id=post_id, viewer_id=3),
+            self.context,
+        )
+        for target_id in (post_id, other_id):
+            self.service.AddComment(
+                post_service_pb2.AddCommentRequest(
+                    post_id=target_id, user_id=1, text="First"
+                ),
+                self.context,
+            )
+
+        counts = self.get_counts(post_id, 2)
+
+        self.assertEqual(counts.post_id, post_id)
+        self.assertEqual(
+            (counts.likes_count, counts.views_count, counts.comments_count),
+            (2, 1, 1),
+        )
+        self.assertEqual(self.get_counts(other_id, 2).likes_count, 0)
+
+    def test_counts_check_access_and_existence(self):
+        private_id = self.add_post(creator_id=1, is_private=True)
+
+        self.get_counts(private_id, 2)
+        self.context.set_code.assert_called_with(
+            server.grpc.StatusCode.PERMISSION_DENIED
+        )
+        self.get_counts(999, 1)
+        self.context.set_code.assert_called_with(server.grpc.StatusCode.NOT_FOUND)
+
+
+class TestRecordViews(ServerTestCase):
+    def record(self, post_ids, viewer_id=2):
+        request = post_service_pb2.RecordViewsRequest(
+            post_ids=post_ids, viewer_id=viewer_id
+        )
+        return self.service.RecordViews(request, self.context)
+
+    def test_records_new_views_and_returns_counts_in_request_order(self):
+        seen_id = self.add_post()
+        new_id = self.add_post()
+        private_id = self.add_post(creator_id=1, is_private=True)
+        self.session.add(PostView(post_id=seen_id, user_id=2))
+        self.session.add(PostView(post_id=seen_id, user_id=3))
+        self.session.commit()
+        reconcile_counters(self.session)
+        server.producer.send.reset_mock()
+
+        response = self.record([new_id, 999, seen_id, private_id, new_id])
+
+        Result = post_service_pb2.RecordViewsResult
+        self.assertEqual(
+            [
+                (r.post_id, r.status, r.views_count, r.recorded)
+                for r in response.results
+            ],
+            [
+                (new_id, Result.OK, 1, True),
+                (999, Result.NOT_FOUND, 0, False),
+                (seen_id, Result.OK, 2, False),
+                (private_id, Result.PERMISSION_DENIED, 0, False),
+            ],
+        )
+        server.producer.send.assert_called_once()
+        self.assertEqual(server.producer.send.call_args[0][1]["post_id"], new_id)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        one = [self.add_post()]
+        many = [self.add_post() for _ in range(10)]
+
+        self.assertEqual(
+            self.count_statements(lambda: self.record(one)),
+            self.count_statements(lambda: self.record(many)),
+        )
+
+    def test_rejects_too_many_ids(self):
+        self.record(list(range(1, server.MAX_BATCH_SIZE + 2)))
+
+        self.context.set_code.assert_called_with(
+            server.grpc.StatusCode.INVALID_ARGUMENT
+        )
+
+
+class TestCounters(ServerTestCase):
+    def test_view_and_like_return_counters_without_count_queries(self):
+        post_id = self.add_post()
+        updated_at = self.session.get(Post, post_id).updated_at
+
+        statements = self.capture_statements(
+            lambda: (
+                self.service.ViewPost(
+                    post_service_pb2.ViewPostRequest(post_id=post_id, viewer_id=2),
+                    self.context,
+                ),
+                self.service.LikePost(
+                    post_service_pb2.LikePostRequest(post_id=post_id, user_id=2),
+                    self.context,
+                ),
+            )
+        )
+        view = self.service.ViewPost(
+            post_service_pb2.ViewPostRequest(post_id=post_id, viewer_id=3),
+            self.context,
+        )
+
+        self.assertFalse([s for s, _ in statements if "count(" in s.lower()])
+        self.assertEqual(view.views_count, 2)
+        post = self.service.GetPost(
+            post_service_pb2.GetPostRequest(post_id=post_id, requester_id=1),
+            self.context,
+        )
+        self.assertEqual((post.views_count, post.likes_count), (2, 1))
+        # Счетчики не меняют версию поста
+        self.assertEqual(post.updated_at.ToDatetime(), updated_at)
+
+    def test_reconcile_recomputes_counters_from_raw_tables(self):
+        first_id = self.add_post()
+        second_id = self.add_post()
+        self.session.add_all(
+            [
+                PostView(post_id=first_id, user_id=1),
+                PostView(post_id=first_id, user_id=2),
+                PostLike(post_id=second_id, user_id=1),
+                Comment(post_id=second_id, user_id=1, text="Hi"),
+            ]
+        )
+        third = self.session.get(Post, self.add_post())
+        third.likes_count = 5
+        self.session.commit()
+
+        self.assertEqual(reconcile_counters(self.session, batch_size=2), 3)
+        self.assertEqual(reconcile_counters(self.session), 0)
+
+        counters = [
+            (post.views_count, post.likes_count, post.comments_count)
+            for post in self.session.query(Post).order_by(Post.id)
+        ]
+        self.assertEqual(counters, [(2, 0, 0), (0, 1, 1), (0, 0, 0)])
+
+
+class TestSeenViewsFilter(ServerTestCase):
+    def view(self, post_id, viewer_id=2):
+        request = post_service_pb2.ViewPostRequest(post_id=post_id, viewer_id=viewer_id)
+        return self.service.ViewPost(request, self.context)
+
+    def view_queries(self, call):
+        return [
+            statement
+            for statement, _ in self.capture_statements(call)
+            if "FROM post_views" in statement
+        ]
+
+    def test_repeat_view_is_answered_without_existence_query(self):
+        post_id = self.add_post()
+        server.producer.send.reset_mock()
+
+        self.assertEqual(self.view_queries(lambda: self.view(post_id)), [])
+        self.assertEqual(self.view_queries(lambda: self.view(post_id)), [])
+
+        self.assertEqual(self.view(post_id).views_count, 1)
+        server.producer.send.assert_called_once()
+
+    def test_uncertain_answer_is_checked_in_db(self):
+        post_id = self.add_post()
+        self.service._seen_views.check = lambda post_id, viewer_id: UNKNOWN
+
+        queries = self.view_queries(lambda: self.view(post_id))
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.session.query(PostView).count(), 1)
+
+    def test_view_missing_from_filter_is_not_recorded_twice(self):
+        # Просмотр записан до старта (или другой репликой), фильтр о нем не знает
+        post_id = self.add_post()
+        self.session.add_all(
+            [
+                PostView(post_id=post_id, user_id=2),
+                PostView(post_id=post_id, user_id=3),
+            ]
+        )
+        self.session.commit()
+        reconcile_counters(self.session)
+        server.producer.send.reset_mock()
+
+        response = self.view(post_id, viewer_id=2)
+        results = self.service.RecordViews(
+            post_service_pb2.RecordViewsRequest(post_ids=[post_id], viewer_id=3),
+            self.context,
+        ).results
+
+        self.assertEqual(response.views_count, 2)
+        self.assertEqual((results[0].views_count, results[0].recorded), (2, False))
+        self.assertEqual(self.session.query(PostView).count(), 2)
+        server.producer.send.assert_not_called()
+        self.context.set_code.assert_not_called()
+
+    def test_warm_up_reads_recorded_views(self):
+        post_id = self.add_post()
+        self.session.add(PostView(post_id=post_id, user_id=2))
+        self.session.commit()
+
+        self.service.warm_seen_views()
+
+        self.assertEqual(self.service._seen_views.check(post_id, 2), SEEN)
+
+
+class TestQueryPlans(ServerTestCase):
+    """Горячие запросы RPC идут по индексам, а не полным просмотром таблиц"""
+
+    def setUp(self):
+        super().setUp()
+        self.post_id = self.add_post(tags=["python"])
+
+    def query_plans(self, call):
+        """EXPLAIN QUERY PLAN каждого SELECT, выполненного за call()"""
+        selects = [
+            (statement, parameters)
+            for statement, parameters in self.capture_statements(call)
+            if statement.lstrip().upper().startswith("SELECT")
+        ]
+        self.assertTrue(selects)
+        with engine.connect() as connection:
+            plans = [
+                "\n".join(
+                    row[-1]
+                    for row in connection.exec_driver_sql(
+                        "EXPLAIN QUERY PLAN " + statement, parameters
+                    )
+                )
+                for statement, parameters in selects
+            ]
+        for plan in plans:
+            # SCAN без индекса - полный просмотр таблицы, TEMP B-TREE - сортировка
+            self.assertNotRegex(plan, r"SCAN \w+$|SCAN \w+\n|TEMP B-TREE")
+        return "\n".join(plans)
+
+    def test_view_and_like_use_unique_indexes(self):
+        # Фильтр просмотров не уверен - проверка уходит в БД
+        self.service._seen_views.check = lambda post_id, viewer_id: UNKNOWN
+        plans = self.query_plans(
+            lambda: (
+                self.service.ViewPost(
+                    post_service_pb2.ViewPostRequest(post_id=self.post_id, viewer_id=2),
+                    self.context,
+                ),
+                self.service.LikePost(
+                    post_service_pb2.LikePostRequest(post_id=self.post_id, user_id=2),
+                    self.context,
+                ),
+            )
+        )
+
+        self.assertIn("uq_post_views_post_id_user_id (post_id=? AND user_id=?)", plans)
+        self.assertIn("uq_post_likes_post_id_user_id (post_id=? AND user_id=?)", plans)
+
+    def test_comments_page_and_count_use_index(self):
+        plans = self.query_plans(
+            lambda: self.service.GetComments(
+                post_service_pb2.GetCommentsRequest(
+                    post_id=self.post_id, requester_id=1, page=2, per_page=5
+                ),
+                self.context,
+            )
+        )
+
+        # total_count берется из счетчика поста, отдельного COUNT нет
+        self.assertEqual(plans.count("ix_comments_post_id_created_at (post_id=?)"), 1)
+
+    def test_own_feed_and_tag_filter_use_indexes(self):
+        plans = self.query_plans(
+            lambda: (
+                self.service.ListPosts(
+                    post_service_pb2.ListPostsRequest(
+                        requester_id=1, only_own=True, page=1, per_page=5
+                    ),
+                    self.context,
+                ),
+                self.service.ListPosts(
+                    post_service_pb2.ListPostsRequest(
+                        requester_id=1,
+                        tags=["python"],
+                        page=1,
+                        per_page=5,
+                        count_mode=post_service_pb2.COUNT_NONE,
+                    ),
+                    self.context,
+                ),
+            )
+        )
+
+        self.assertIn("ix_posts_creator_id_created_at_id (creator_id=?)", plans)
+        self.assertIn("ix_post_tags_tag_id_post_id (tag_id=? AND post_id=?)", plans)
+        self.assertIn("ix_post_tags_post_id (post_id=?)", plans)
+        self.assertIn("SCAN posts USING INDEX ix_posts_created_at_id", plans)
+
+    def test_post_counts_read_one_row(self):
+        plans = self.query_plans(
+            lambda: self.service.GetPostCounts(
+                post_service_pb2.GetPostRequest(post_id=self.post_id, requester_id=1),
+                self.context,
+            )
+        )
+
+        self.assertEqual(plans, "SEARCH posts USING INTEGER PRIMARY KEY (rowid=?)")
+
+    def test_duplicate_view_is_rejected_by_unique_index(self):
+        def add_view():
+            return server.add_unique(
+                self.session, PostView(post_id=self.post_id, user_id=2), "views_count"
+            )
+
+        self.assertEqual(add_view(), 1)
+        self.assertIsNone(add_view())
+        self.assertEqual(self.session.query(PostView).count(), 1)
+        self.assertEqual(self.session.get(Post, self.post_id).views_count, 1)
+
+
+class TestMigrations(unittest.TestCase):
+    """Миграции на отдельной SQLite в памяти"""
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_migrations_build_schema_of_models(self):
+        upgrade_database(self.engine)
+
+        with self.engine.connect() as connection:
+            diff = compare_metadata(
+                MigrationContext.configure(connection), Base.metadata
+            )
+        self.assertEqual(diff, [])
+
+    def test_unversioned_database_is_stamped_and_deduplicated(self):
+        # База, созданная create_all() до миграций, с повторным просмотром
+        with self.engine.connect() as connection:
+            command.upgrade(alembic_config(connection), BASELINE_REVISION)
+            connection.exec_driver_sql("DROP TABLE alembic_version")
+            connection.exec_driver_sql(
+                "INSERT INTO posts (id, title, description, creator_id) "
+                "VALUES (1, 'title', 'description', 1)"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO post_views (post_id, user_id) VALUES (1, 2), (1, 2), (1, 3)"
+            )
+            connection.commit()
+
+        upgrade_database(self.engine)
+
+        with self.engine.connect() as connection:
+            views = connection.exec_driver_sql(
+                "SELECT id, user_id FROM post_views ORDER BY id"
+            ).all()
+            version = connection.exec_driver_sql(
+                "SELECT version_num FROM alembic_version"
+            ).scalar()
+        self.assertEqual(views, [(1, 2), (3, 3)])
+        self.assertEqual(
+            version, ScriptDirectory.from_config(alembic_config()).get_current_head()
+        )
+
+
+class TestHealth(unittest.TestCase):
+    def test_server_reports_serving_over_grpc_health(self):
+        from grpc_health.v1 import health_pb2, health_pb2_grpc
+
+        grpc_server = server.create_server()
+        port = grpc_server.add_insecure_port("127.0.0.1:0")
+        grpc_server.start()
+        try:
+            with server.grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+                response = health_pb2_grpc.HealthStub(channel).Check(
+                    health_pb2.HealthCheckRequest(service=server.HEALTH_SERVICE),
+                    timeout=5,
+                )
+        finally:
+            grpc_server.stop(None)
+
+        self.assertEqual(response.status, health_pb2.HealthCheckResponse.SERVING)
+        self.assertEqual(server.HEALTH_SERVICE, "post.PostService")
+
+
+if __name__ == "__main__":
+    unittest.main()
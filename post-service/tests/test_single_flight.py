@@ -0,0 +1,84 @@
+import threading
+import time
+import unittest
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def slow_load(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(timeout=1)
+        return {"id": 1}
+
+    def run_concurrently(self, count, fn):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.flights.do(1, fn)))
+            for _ in range(count)
+        ]
+        threads[0].start()
+        self.started.wait(timeout=1)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        self.release.set()
+        for thread in threads:
+            thread.join(timeout=1)
+        return results
+
+    def test_concurrent_calls_share_one_load(self):
+        results = self.run_concurrently(5, self.slow_load)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_sequential_calls_are_not_cached(self):
+        self.release.set()
+        self.flights.do(1, self.slow_load)
+        self.flights.do(1, self.slow_load)
+
+        self.assertEqual(self.calls, 2)
+
+    def test_error_is_raised_to_every_waiter(self):
+        def failing_load():
+            self.slow_load()
+            raise RuntimeError("db is down")
+
+        errors = []
+
+        def call():
+            try:
+                self.flights.do(1, failing_load)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        threads[0].start()
+        self.started.wait(timeout=1)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        self.release.set()
+        for thread in threads:
+            thread.join(timeout=1)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(errors), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+from sqlalchemy import func, or_, select, update
+
+from models.post import Comment, Post, PostLike, PostView
+
+# Счетчик поста -> таблица, строки которой он считает
+COUNTERS = {
+    "views_count": PostView,
+    "likes_count": PostLike,
+    "comments_count": Comment,
+}
+
+
+def bump_counter(session, counter, post_ids, delta=1):
+    """Атомарно меняет счетчик постов на delta (SET c = c + delta) в текущей
+    транзакции и возвращает {post_id: новое значение}.
+
+    updated_at остается прежним: от него зависят версия поста, ETag и кеши
+    гейтвея, а просмотр или лайк пост не меняют
+    """
+    column = getattr(Post, counter)
+    rows = session.execute(
+        update(Post)
+        .where(Post.id.in_(post_ids))
+        .values({column: column + delta, Post.updated_at: Post.updated_at})
+        .returning(Post.id, column)
+        .execution_options(synchronize_session=False)
+    )
+    return dict(rows.all())
+
+
+def reconcile_counters(session, batch_size=1000):
+    """Пересчитывает счетчики по post_views, post_likes и comments.
+
+    Посты обходятся пачками по id, каждая пачка - своя транзакция, чтобы не
+    держать блокировку всей таблицы. Возвращает число исправленных постов
+    """
+    actual = {
+        getattr(Post, counter): select(func.count(model.id))
+        .where(model.post_id == Post.id)
+        .scalar_subquery()
+        for counter, model in COUNTERS.items()
+    }
+    differs = or_(*(column != value for column, value in actual.items()))
+
+    fixed = 0
+    last_id = 0
+    while True:
+        ids = session.scalars(
+            select(Post.id).where(Post.id > last_id).order_by(Post.id).limit(batch_size)
+        ).all()
+        if not ids:
+            return fixed
+
+        result = session.execute(
+            update(Post)
+            .where(Post.id.in_(ids), differs)
+            .values({**actual, Post.updated_at: Post.updated_at})
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        fixed += result.rowcount
+        last_id = ids[-1]
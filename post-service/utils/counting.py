@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+import post_service_pb2
+
+
+class CountCache:
+    """total_count по ключу фильтра: значение живет ttl секунд, хранится
+    не больше max_size ключей (вытесняются давно не читавшиеся)
+    """
+
+    def __init__(self, ttl=30.0, max_size=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_count(self, key, count):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        value = count()
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+
+def estimate_count(session, query):
+    """Оценка числа строк планировщиком PostgreSQL (EXPLAIN без выполнения).
+
+    Точность зависит от свежести статистики (ANALYZE), зато стоимость не
+    растет с размером таблицы. На других БД - точный COUNT
+    """
+    dialect = session.get_bind().dialect
+    if dialect.name != "postgresql":
+        return query.count()
+
+    compiled = query.statement.compile(
+        dialect=dialect, compile_kwargs={"render_postcompile": True}
+    )
+    plan = (
+        session.connection()
+        .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+        .scalar()
+    )
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_rows(mode, session, query, key, cache):
+    """total_count выборки query по count_mode запроса; None для COUNT_NONE"""
+    if mode == post_service_pb2.COUNT_NONE:
+        return None
+    if mode == post_service_pb2.COUNT_ESTIMATE:
+        return estimate_count(session, query)
+    if mode == post_service_pb2.COUNT_CACHED:
+        return cache.get_or_count(key, query.count)
+    return query.count()
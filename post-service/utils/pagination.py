@@ -0,0 +1,21 @@
+import base64
+from datetime import datetime
+
+
+def encode_cursor(created_at, row_id):
+    """Непрозрачный курсор keyset-пагинации: позиция последней строки страницы
+    в порядке (created_at DESC, id DESC)
+    """
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Курсор -> (created_at, id); ValueError, если курсор испорчен"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError as e:
+        # binascii.Error и UnicodeDecodeError - тоже ValueError
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
@@ -0,0 +1,126 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+# Ответы SeenViews.check
+SEEN = "seen"
+NEW = "new"
+UNKNOWN = "unknown"
+
+
+class BloomFilter:
+    """Множество без ложноотрицательных ответов: add(x) -> x in filter"""
+
+    def __init__(self, capacity, fp_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        # Двойное хеширование: k позиций из двух 64-битных половин
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class SeenViews:
+    """Недавно записанные просмотры (post_id, viewer_id) в памяти процесса.
+
+    check() отвечает без запроса в БД:
+    - SEEN - пара есть в LRU точно записанных просмотров;
+    - NEW - фильтра Блума пары нет, просмотр новый (если его не записала
+      другая реплика или он не старше прогрева - тогда вставку отклонит
+      уникальный индекс);
+    - UNKNOWN - фильтр отвечает "возможно" (с вероятностью до fp_rate
+      ложно), нужна проверка в БД.
+
+    Фильтр держит до capacity пар; заполненный уходит в предыдущее поколение,
+    и проверяются оба, поэтому доля ложных "возможно" не выше 2 * fp_rate
+    """
+
+    def __init__(self, capacity=1_000_000, fp_rate=0.01, recent_size=100_000):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.recent_size = recent_size
+        self._current = BloomFilter(capacity, fp_rate)
+        self._previous = None
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self._checks = {SEEN: 0, NEW: 0, UNKNOWN: 0}
+
+    @staticmethod
+    def _key(post_id, viewer_id):
+        return f"{post_id}:{viewer_id}".encode()
+
+    def check(self, post_id, viewer_id):
+        key = self._key(post_id, viewer_id)
+        with self._lock:
+            if key in self._recent:
+                self._recent.move_to_end(key)
+                state = SEEN
+            elif key in self._current or (
+                self._previous is not None and key in self._previous
+            ):
+                state = UNKNOWN
+            else:
+                state = NEW
+            self._checks[state] += 1
+        return state
+
+    def add(self, post_id, viewer_id):
+        """Пара точно записана в БД"""
+        key = self._key(post_id, viewer_id)
+        with self._lock:
+            self._remember(key)
+            self._recent[key] = None
+            self._recent.move_to_end(key)
+            if len(self._recent) > self.recent_size:
+                self._recent.popitem(last=False)
+
+    def warm(self, pairs):
+        """Заполняет фильтр просмотрами из БД, самые свежие первыми; в LRU
+        попадают первые recent_size. Возвращает число пар
+        """
+        warmed = 0
+        with self._lock:
+            for post_id, viewer_id in pairs:
+                key = self._key(post_id, viewer_id)
+                self._remember(key)
+                if len(self._recent) < self.recent_size:
+                    # Пары идут от новых к старым: старые ближе к вытеснению
+                    self._recent[key] = None
+                    self._recent.move_to_end(key, last=False)
+                warmed += 1
+        return warmed
+
+    def _remember(self, key):
+        if key in self._current:
+            return
+        if self._current.count >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.fp_rate)
+        self._current.add(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checks": dict(self._checks),
+                "recent": len(self._recent),
+                "filtered": self._current.count
+                + (self._previous.count if self._previous else 0),
+            }
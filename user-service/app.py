@@ -1,10 +1,28 @@
+import os
+
 from flask import Flask
-from flask_migrate import Migrate
+from flask_migrate import Migrate, stamp, upgrade
 from flask_jwt_extended import JWTManager
 
 from config import Config
 from models.user import db, bcrypt
 from routes.user_routes import user_bp
+from utils.auth import VerifiedTokenCache
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+# Схема, которую создавал db.create_all() до появления миграций
+BASELINE_REVISION = "0001"
+
+
+def upgrade_database():
+    """Доводит схему БД до последней миграции. База, созданная create_all()
+    без миграций, сначала помечается базовой ревизией
+    """
+    inspector = db.inspect(db.engine)
+    if not inspector.has_table("alembic_version") and inspector.has_table("users"):
+        stamp(revision=BASELINE_REVISION)
+    upgrade()
 
 
 def create_app(config_class=Config):
@@ -14,12 +32,18 @@ def create_app(config_class=Config):
     db.init_app(app)
     bcrypt.init_app(app)
     jwt = JWTManager(app)
-    migrate = Migrate(app, db)
+    migrate = Migrate(app, db, directory=MIGRATIONS_DIR)
+    app.extensions["jwt_token_cache"] = VerifiedTokenCache(
+        max_size=(
+            app.config["JWT_CACHE_MAX_SIZE"] if app.config["JWT_CACHE_ENABLED"] else 0
+        ),
+        max_ttl=app.config["JWT_CACHE_MAX_TTL"],
+    )
 
     app.register_blueprint(user_bp)
 
     with app.app_context():
-        db.create_all()
+        upgrade_database()
 
     return app
 
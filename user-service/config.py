@@ -9,4 +9,7 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt-secret-key")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
-    JWT_VERIFY_SUB = False
\ No newline at end of file
+    JWT_VERIFY_SUB = False
+    JWT_CACHE_ENABLED = os.getenv("JWT_CACHE_ENABLED", "true").lower() == "true"
+    JWT_CACHE_MAX_SIZE = int(os.getenv("JWT_CACHE_MAX_SIZE", 10000))
+    JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL", 300))
\ No newline at end of file
@@ -0,0 +1,37 @@
+from alembic import context
+from flask import current_app
+
+config = context.config
+db = current_app.extensions["migrate"].db
+target_metadata = db.metadata
+
+
+def run_migrations_offline():
+    """SQL миграций без подключения к БД (flask db upgrade --sql)"""
+    context.configure(
+        url=db.engine.url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # Каждая ревизия в своей транзакции: ревизии с CREATE INDEX CONCURRENTLY
+    # коммитят все, что было до них
+    with db.engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,53 @@
+"""Схема, которую создавал db.create_all() до появления миграций
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(80), nullable=False, unique=True),
+        sa.Column("email", sa.String(120), nullable=False, unique=True),
+        sa.Column("password_hash", sa.String(128), nullable=False),
+        sa.Column("phone_number", sa.String(20), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_table(
+        "user_profiles",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("first_name", sa.String(50), nullable=True),
+        sa.Column("last_name", sa.String(50), nullable=True),
+        sa.Column("birthdate", sa.Date(), nullable=True),
+        sa.Column("bio", sa.Text(), nullable=True),
+        sa.Column("location", sa.String(100), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_table(
+        "user_roles",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("role", sa.String(50), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("assigned_at", sa.DateTime()),
+    )
+
+
+def downgrade():
+    op.drop_table("user_roles")
+    op.drop_table("user_profiles")
+    op.drop_table("users")
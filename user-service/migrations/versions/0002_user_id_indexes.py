@@ -0,0 +1,39 @@
+"""Индексы внешних ключей user_id: профиль и роли пользователя
+
+Профиль и роли подгружаются по user_id при каждом чтении пользователя.
+Индексы строятся CONCURRENTLY (на PostgreSQL) вне транзакции
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_user_profiles_user_id", "user_profiles"),
+    ("ix_user_roles_user_id", "user_roles"),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.create_index(
+                name,
+                table,
+                ["user_id"],
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
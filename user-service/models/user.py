@@ -34,7 +34,9 @@ class UserProfile(db.Model):
     __tablename__ = "user_profiles"
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False, index=True
+    )
     first_name = db.Column(db.String(50), nullable=True)
     last_name = db.Column(db.String(50), nullable=True)
     birthdate = db.Column(db.Date, nullable=True)
@@ -48,7 +50,9 @@ class UserRole(db.Model):
     __tablename__ = "user_roles"
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False, index=True
+    )
     role = db.Column(db.String(50), nullable=False, default="user")
     description = db.Column(db.Text, nullable=True)
     assigned_at = db.Column(db.DateTime, default=datetime.now)
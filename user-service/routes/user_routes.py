@@ -1,18 +1,32 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import create_access_token, get_jwt_identity
 
 from services.user_service import UserService
-from utils.validators import RegisterSchema, LoginSchema, ProfileUpdateSchema
+from utils.validators import register_schema, profile_update_schema, validate_login
 from utils.auth import token_required
 
 user_bp = Blueprint("user", __name__)
 
 
+@user_bp.route("/health", methods=["GET"])
+def health_check():
+    return (
+        jsonify(
+            {
+                "status": "healthy",
+                "message": "User Service is up",
+                "jwt_cache": current_app.extensions["jwt_token_cache"].stats(),
+            }
+        ),
+        200,
+    )
+
+
 @user_bp.route("/api/users/register", methods=["POST"])
 def register():
     try:
         data = request.get_json()
-        errors = RegisterSchema().validate(data)
+        errors = register_schema.validate(data)
         if errors:
             return jsonify({"message": "Validation error", "errors": errors}), 400
 
@@ -48,7 +62,7 @@ def register():
 def login():
     try:
         data = request.get_json()
-        errors = LoginSchema().validate(data)
+        errors = validate_login(data)
         if errors:
             return jsonify({"message": "Validation error", "errors": errors}), 400
 
@@ -121,7 +135,7 @@ def update_profile():
         user_id = get_jwt_identity()
 
         data = request.get_json()
-        errors = ProfileUpdateSchema().validate(data)
+        errors = profile_update_schema.validate(data)
         if errors:
             return jsonify({"message": "Validation error", "errors": errors}), 400
 
@@ -82,3 +82,57 @@ def test_token_required_get_identity(app, token_header):
         assert response.status_code == 200
         data = response.get_json()
         assert data["user_id"] == 1
+
+
+def test_token_required_reuses_verified_token(app, token_header):
+    from unittest.mock import patch
+    from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+    @app.route("/test-cached")
+    @token_required
+    def test_endpoint():
+        return jsonify({"user_id": get_jwt_identity()}), 200
+
+    with patch(
+        "utils.auth.verify_jwt_in_request", wraps=verify_jwt_in_request
+    ) as verify:
+        with app.test_client() as client:
+            first = client.get("/test-cached", headers=token_header)
+            second = client.get("/test-cached", headers=token_header)
+
+    assert first.get_json() == second.get_json() == {"user_id": 1}
+    verify.assert_called_once()
+    assert app.extensions["jwt_token_cache"].stats()["hits"] == 1
+
+
+def test_verified_token_cache_respects_exp():
+    from utils.auth import VerifiedTokenCache
+
+    now = [1000.0]
+    cache = VerifiedTokenCache(max_size=1, clock=lambda: now[0])
+
+    cache.set("token", {}, {"sub": 1, "exp": 1010})
+    assert cache.get("token") == ({}, {"sub": 1, "exp": 1010})
+
+    now[0] = 1010
+    assert cache.get("token") is None
+
+
+def test_health_exposes_token_cache_stats(app, token_header):
+    from flask_jwt_extended import get_jwt_identity
+
+    @app.route("/test-cached-health")
+    @token_required
+    def test_endpoint():
+        return jsonify({"user_id": get_jwt_identity()}), 200
+
+    with app.test_client() as client:
+        client.get("/test-cached-health", headers=token_header)
+        client.get("/test-cached-health", headers=token_header)
+        response = client.get("/health")
+
+    assert response.status_code == 200
+    stats = response.get_json()["jwt_cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
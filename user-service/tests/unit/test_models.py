@@ -1,6 +1,10 @@
-from models.user import User
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from models.user import User, db
 from flask_bcrypt import Bcrypt
 
+from app import create_app
+
 
 def test_user_set_password():
     bcrypt = Bcrypt()
@@ -20,3 +24,20 @@ def test_user_check_password():
 
     assert user.check_password("password123") is True
     assert user.check_password("wrongpassword") is False
+
+
+def test_migrations_build_schema_of_models():
+    app = create_app()
+
+    with app.app_context(), db.engine.connect() as connection:
+        diff = compare_metadata(MigrationContext.configure(connection), db.metadata)
+        version = connection.exec_driver_sql(
+            "SELECT version_num FROM alembic_version"
+        ).scalar()
+        plan = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM user_profiles WHERE user_id = 1"
+        ).all()
+
+    assert diff == []
+    assert version == "0002"
+    assert "ix_user_profiles_user_id" in plan[0][-1]
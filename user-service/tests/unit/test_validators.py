@@ -1,7 +1,12 @@
 import pytest
 from marshmallow import ValidationError
 from datetime import datetime, timedelta
-from utils.validators import RegisterSchema, LoginSchema, ProfileUpdateSchema
+from utils.validators import (
+    RegisterSchema,
+    LoginSchema,
+    ProfileUpdateSchema,
+    validate_login,
+)
 
 
 class TestRegisterSchema:
@@ -172,3 +177,20 @@ class TestRegisterSchemaEdgeCases:
         assert RegisterSchema().validate(
             {"username": "user-name!", "email": "u@mail.com", "password": "Valid1234"}
         )["username"]
+
+
+class TestValidateLogin:
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            {"username": "user", "password": "pass"},
+            {"username": "user"},
+            {"username": 1, "password": "pass"},
+            {"username": "user", "password": None},
+            {"username": "user", "password": "pass", "extra": 1},
+            [],
+        ],
+    )
+    def test_matches_schema(self, data):
+        assert validate_login(data) == LoginSchema().validate(data)
@@ -1,13 +1,100 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
-from flask import jsonify
+from flask import current_app, g, jsonify, request
 from flask_jwt_extended import verify_jwt_in_request
 
+
+class VerifiedTokenCache:
+    """
+    Ограниченный LRU-кеш уже проверенных JWT: sha256(токен) -> (заголовок, claims).
+    Запись живет не дольше exp токена, поэтому просроченный токен снова проходит
+    полную проверку и отклоняется.
+    """
+
+    def __init__(self, max_size=10000, max_ttl=300.0, clock=time.time):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        key = self._digest(token)
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] <= self._clock():
+                del self._data[key]
+                item = None
+
+            if item is None:
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, token, jwt_header, jwt_data):
+        if self.max_size <= 0:
+            return
+
+        expires_at = self._clock() + self.max_ttl
+        if jwt_data.get('exp') is not None:
+            expires_at = min(expires_at, jwt_data['exp'])
+
+        key = self._digest(token)
+        with self._lock:
+            self._data[key] = ((jwt_header, jwt_data), expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._data),
+        }
+
+
+def verify_jwt_cached():
+    token_cache = current_app.extensions.get('jwt_token_cache')
+    auth_header = request.headers.get('Authorization', '')
+    if token_cache is None or not auth_header.startswith('Bearer '):
+        verify_jwt_in_request()
+        return
+
+    token = auth_header[len('Bearer '):]
+    cached = token_cache.get(token)
+    if cached is not None:
+        # Те же поля, что заполняет verify_jwt_in_request, их читает get_jwt_identity
+        g._jwt_extended_jwt_header, g._jwt_extended_jwt = cached
+        g._jwt_extended_jwt_user = {'loaded_user': None}
+        g._jwt_extended_jwt_location = 'headers'
+        return
+
+    verified = verify_jwt_in_request()
+    if verified is not None:
+        token_cache.set(token, *verified)
+
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         try:
-            verify_jwt_in_request()
+            verify_jwt_cached()
             return f(*args, **kwargs)
         except Exception as e:
             return jsonify({'message': 'Authentication required', 'error': str(e)}), 401
-    return decorated
\ No newline at end of file
+    return decorated
@@ -2,6 +2,12 @@ import re
 from marshmallow import Schema, fields, validates, ValidationError
 from datetime import datetime
 
+USERNAME_PATTERN = re.compile(r'^[a-zA-Z0-9_]+$')
+PHONE_PATTERN = re.compile(r'^\+?[0-9]{10,15}$')
+UPPERCASE_PATTERN = re.compile(r'[A-Z]')
+LOWERCASE_PATTERN = re.compile(r'[a-z]')
+DIGIT_PATTERN = re.compile(r'[0-9]')
+
 class RegisterSchema(Schema):
     username = fields.String(required=True)
     email = fields.Email(required=True)
@@ -12,23 +18,23 @@ class RegisterSchema(Schema):
     def validate_username(self, value):
         if len(value) < 4:
             raise ValidationError('Username must be at least 4 characters long')
-        if not re.match(r'^[a-zA-Z0-9_]+$', value):
+        if not USERNAME_PATTERN.match(value):
             raise ValidationError('Username can only contain letters, numbers, and underscores')
 
     @validates('password')
     def validate_password(self, value):
         if len(value) < 8:
             raise ValidationError('Password must be at least 8 characters long')
-        if not re.search(r'[A-Z]', value):
+        if not UPPERCASE_PATTERN.search(value):
             raise ValidationError('Password must contain at least one uppercase letter')
-        if not re.search(r'[a-z]', value):
+        if not LOWERCASE_PATTERN.search(value):
             raise ValidationError('Password must contain at least one lowercase letter')
-        if not re.search(r'[0-9]', value):
+        if not DIGIT_PATTERN.search(value):
             raise ValidationError('Password must contain at least one number')
 
     @validates('phone_number')
     def validate_phone(self, value):
-        if value and not re.match(r'^\+?[0-9]{10,15}$', value):
+        if value and not PHONE_PATTERN.match(value):
             raise ValidationError('Invalid phone number format')
 
 class LoginSchema(Schema):
@@ -51,5 +57,23 @@ class ProfileUpdateSchema(Schema):
 
     @validates('phone_number')
     def validate_phone(self, value):
-        if value and not re.match(r'^\+?[0-9]{10,15}$', value):
-            raise ValidationError('Invalid phone number format')
\ No newline at end of file
+        if value and not PHONE_PATTERN.match(value):
+            raise ValidationError('Invalid phone number format')
+
+
+# Схемы не хранят состояния между вызовами validate, поэтому создаются один раз
+register_schema = RegisterSchema()
+login_schema = LoginSchema()
+profile_update_schema = ProfileUpdateSchema()
+
+
+def validate_login(data):
+    # Быстрая проверка самого частого запроса; при ошибке тексты берутся из схемы
+    if (
+        type(data) is dict
+        and data.keys() == {'username', 'password'}
+        and type(data['username']) is str
+        and type(data['password']) is str
+    ):
+        return {}
+    return login_schema.validate(data)